@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from decimal import Decimal
 from datetime import date, datetime
-from .models import KppPosel, NpDelStavbe, KppDelStavbe, KppDelStavbeDeduplicated, NpDelStavbeDeduplicated, NpPosel
+from .models import KppPosel, NpDelStavbe, KppDelStavbe, KppDelStavbeDeduplicated, NpDelStavbeDeduplicated, NpPosel, NpDelStavbePosel, KppDelStavbePosel, NpStavba, KppStavba
 
 
 def calculate_cluster_resolution(zoom_level: float) -> float:
@@ -36,6 +36,18 @@ def get_deduplicated_del_stavbe_model(data_source: str):
     else:
         return NpDelStavbeDeduplicated
 
+def get_del_stavbe_posel_model(data_source: str):
+    if data_source.lower() == "kpp":
+        return KppDelStavbePosel
+    else:
+        return NpDelStavbePosel
+
+def get_stavba_model(data_source: str):
+    if data_source.lower() == "kpp":
+        return KppStavba
+    else:
+        return NpStavba
+
 
 def serialize_to_json(obj):
     """
@@ -85,6 +97,17 @@ def serialize_list_to_json(objects):
         return []
     
 
+# Privzeto najmanjše leto zadnjega posla, če filter_leto ni podan
+DEFAULT_FILTER_LETO = 2025
+
+
+def has_unit_filters(filters: dict) -> bool:
+    """Ali filtri vsebujejo pogoje po ceni ali površini posameznih delov stavb (ne samo filter_leto)"""
+    if not filters:
+        return False
+    return any(filters.get(key) for key in ('min_cena', 'max_cena', 'min_povrsina', 'max_povrsina'))
+
+
 def apply_del_stavbe_filters(query, DeduplicatedModel, filters: dict, data_source: str):
     """
     Dodaj filtre queryju
@@ -93,7 +116,7 @@ def apply_del_stavbe_filters(query, DeduplicatedModel, filters: dict, data_sourc
         filters = {}
     
     # Nastavi privzeto leto če ni podano
-    filter_leto = filters.get('filter_leto', 2025)
+    filter_leto = filters.get('filter_leto', DEFAULT_FILTER_LETO)
     query = query.filter(DeduplicatedModel.zadnje_leto >= filter_leto)
     
     if data_source.lower() == "np":
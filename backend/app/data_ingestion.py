@@ -1,4 +1,7 @@
 import asyncio
+import csv
+import io
+import math
 import os
 import pandas as pd
 import tempfile
@@ -8,17 +11,27 @@ import aiohttp
 import aiofiles
 
 from sqlalchemy import text
-from typing import Dict, Any
+from typing import Dict, Any, List
 from concurrent.futures import ThreadPoolExecutor
 
 from .database import get_engine
-from .sql_utils import get_sql_query, execute_sql_count
-from .logging_utils import YearTypeFilter, setup_logger
+from .sql_utils import get_sql_query, record_row_count, adjust_row_count, get_row_count, get_index_definitions, get_constraint_definitions, clone_index_definition
+from .logging_utils import YearTypeFilter, setup_logger, timed_phase
 
 year_filter = YearTypeFilter()
 
 logger = setup_logger("data_ingestion", "data_ingestion.log", "INGEST", year_filter)
 
+# replace: zamenjava particije leta, merge: zapis samo sprememb
+TRANSFORM_MODES = ["replace", "merge"]
+
+# Indeksi, ki ostanejo med množičnim vnosom (PK/unique omejitve se nikoli ne brišejo);
+# posel_id indeks potrebuje FK preverjanje ob odstranjevanju posel particij
+BULK_KEEP_INDEXES = {
+    "np": ["idx_np_del_stavbe_posel_id"],
+    "kpp": ["idx_kpp_del_stavbe_posel_id"]
+}
+
 
 class DataIngestionService:
     
@@ -168,8 +181,14 @@ class DataIngestionService:
             raise
     
 
-    def import_to_staging(self, csv_files: Dict[str, str]):
-        """Uvozi CSV podatke v staging tabele."""
+    def import_to_staging(self, csv_files: Dict[str, str], bulk: bool = False) -> Dict[str, int]:
+        """
+        Uvozi CSV podatke v staging tabele in vrne število naloženih vrstic po tabelah.
+
+        Pri bulk=True se podatki naložijo s COPY namesto z večvrstičnimi INSERT stavki,
+        staging tabele pa se po nalaganju analizirajo.
+        """
+        row_counts = {}
         try:
             # Uvoz CSV datotek v ustrezne staging tabele
             for table_name, file_path in csv_files.items():
@@ -199,16 +218,25 @@ class DataIngestionService:
                         con=self.engine,
                         if_exists="append",
                         index=False,
-                        chunksize=1000,
-                        method='multi'
+                        chunksize=50000 if bulk else 1000,
+                        method=self._copy_into_table if bulk else 'multi'
                     )
+
+                    if bulk:
+                        self._analyze_tables([f"staging.{table_name}"])
                     
-                    row_count = execute_sql_count(self.engine, 'staging', table_name)
+                    row_count = len(df)
+                    with self.engine.connect() as conn:
+                        record_row_count(conn, 'staging', table_name, row_count)
+                        conn.commit()
+                    row_counts[table_name] = row_count
                     logger.info(f"Uspešno naloženih {row_count} vrstic v staging.{table_name}")
                     
                 except Exception as e:
                     logger.error(f"Napaka pri uvozu datoteke {file_path}: {str(e)}")
                     raise
+
+            return row_counts
                     
         except Exception as e:
             logger.error(f"Napaka pri uvozu v staging: {str(e)}")
@@ -216,24 +244,31 @@ class DataIngestionService:
 
 
 
-    def transform_to_core(self, filter_year: str, data_type: str):
-        """Pretvori podatke iz staging v core tabele."""
+    def transform_to_core(self, filter_year: str, data_type: str, mode: str = "replace") -> Dict[str, Any]:
+        """
+        Pretvori podatke iz staging v core tabele.
+
+        Načini:
+        - replace: zgradi nove particije leta in z njimi zamenja obstoječe
+        - merge: zapiše samo vstavljene, posodobljene in izbrisane vrstice (v eni transakciji)
+
+        Vrne število sprememb za posel in del_stavbe tabelo.
+        """
         try:
+            if mode not in TRANSFORM_MODES:
+                raise ValueError(f"Neznan način transformacije: {mode}")
+
             # Preverjanje, ali so staging tabele napolnjene
-            if data_type == "np":
-                staging_del_stavbe_count = execute_sql_count(self.engine, 'staging', 'np_del_stavbe')
-                staging_posel_count = execute_sql_count(self.engine, 'staging', 'np_posel')
-                table_prefix = "np"
-            else:
-                staging_del_stavbe_count = execute_sql_count(self.engine, 'staging', 'kpp_del_stavbe')
-                staging_posel_count = execute_sql_count(self.engine, 'staging', 'kpp_posel')
-                table_prefix = "kpp"
+            table_prefix = "np" if data_type == "np" else "kpp"
+            with self.engine.connect() as conn:
+                staging_del_stavbe_count = get_row_count(conn, 'staging', f'{table_prefix}_del_stavbe')
+                staging_posel_count = get_row_count(conn, 'staging', f'{table_prefix}_posel')
             
             logger.info(f"Podatki v staging: {table_prefix}_del_stavbe={staging_del_stavbe_count}, {table_prefix}_posel={staging_posel_count}")
             
             if staging_del_stavbe_count == 0 or staging_posel_count == 0:
                 logger.warning("Staging tabele so prazne! Ne morem nadaljevati s transformacijo.")
-                return
+                return None
                         
             # Preveri ali so vsi id_posla v staging.del_stavbe povezani s posel tabelo
             with self.engine.connect() as conn:
@@ -269,77 +304,493 @@ class DataIngestionService:
                 except Exception as e:
                     logger.warning(f"Napaka pri štetju filtriranih zapisov: {str(e)}")
             
-            # Najprej izbrišemo obstoječe podatke samo za to leto (če obstajajo)
-            try:
-                with self.engine.connect() as conn:
-                    trans = conn.begin()
-                    try:
-                        del_result = conn.execute(text(f"DELETE FROM core.{table_prefix}_del_stavbe WHERE leto = {filter_year}"))
-                        posel_result = conn.execute(text(f"DELETE FROM core.{table_prefix}_posel WHERE leto = {filter_year}"))
-                        trans.commit()
-                        logger.info(f"Obstoječi podatki so bili izbrisani iz core tabel. Izbrisanih {table_prefix}_del_stavbe: {del_result.rowcount}, {table_prefix}_posel: {posel_result.rowcount}")
-                    except Exception as e:
-                        trans.rollback()
-                        logger.error(f"Napaka pri brisanju obstoječih podatkov: {str(e)}")
-                        raise
-            except Exception as e:
-                logger.error(f"Napaka povezave pri brisanju obstoječih podatkov: {str(e)}")
-                raise
-
-            # Pretvorba podatkov za posel
-            logger.info(f"Pretvarjanje podatkov v core.{table_prefix}_posel")
-            try:
-                with self.engine.connect() as conn:
-                    trans = conn.begin()
-                    try:
-                        sql_query = get_sql_query(f'{table_prefix}_posel_transform.sql')
-                        result = conn.execute(text(sql_query))
-                        logger.info(f"Transformacija {table_prefix}_posel: vplivala na {result.rowcount} vrstic")
-                        trans.commit()
-                    except Exception as e:
-                        trans.rollback()
-                        logger.error(f"Napaka pri transformaciji {table_prefix}_posel: {str(e)}")
-                        raise
-            except Exception as e:
-                logger.error(f"Napaka povezave pri transformaciji {table_prefix}_posel: {str(e)}")
-                raise
-            
-
-            # Pretvorba podatkov za del_stavbe
-            logger.info(f"Pretvarjanje podatkov v core.{table_prefix}_del_stavbe")
-            try:
-                with self.engine.connect() as conn:
-                    trans = conn.begin()
-                    try:
-                        sql_query = get_sql_query(f'{table_prefix}_del_stavbe_transform.sql')
-                        result = conn.execute(text(sql_query))
-                        logger.info(f"Transformacija {table_prefix}_del_stavbe: vplivala na {result.rowcount} vrstic")
-                        trans.commit()
-                    except Exception as e:
-                        trans.rollback()
-                        logger.error(f"Napaka pri transformaciji {table_prefix}_del_stavbe: {str(e)}")
-                        raise
-            except Exception as e:
-                logger.error(f"Napaka povezave pri transformaciji {table_prefix}_del_stavbe: {str(e)}")
-                raise
-            
+            if mode == "merge":
+                changes = self._merge_to_core(filter_year, table_prefix)
+            else:
+                changes = self._replace_in_core(filter_year, table_prefix)
             
             # Preverjanje števila vnosov v core tabelah
-            del_stavbe_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_del_stavbe')
-            posel_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_posel')
+            with self.engine.connect() as conn:
+                del_stavbe_count = get_row_count(conn, 'core', f'{table_prefix}_del_stavbe')
+                posel_count = get_row_count(conn, 'core', f'{table_prefix}_posel')
             
             logger.info(f"Pretvorba podatkov zaključena. Število vrstic: core.{table_prefix}_del_stavbe: {del_stavbe_count}, core.{table_prefix}_posel: {posel_count}")
             
             if del_stavbe_count == 0 or posel_count == 0:
                 logger.warning("Transformacija je bila izvedena brez napak, vendar podatki niso bili vstavljeni!")
+
+            return changes
             
         except Exception as e:
             logger.error(f"Napaka pri pretvorbi v core: {str(e)}")
             raise
+
+
+    def _ensure_partition(self, conn, table: str, leto: int):
+        """Ustvari particijo core tabele za leto, če še ne obstaja."""
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS core.{table}_{leto} PARTITION OF core.{table} FOR VALUES IN ({leto})"
+        ))
+
+
+    def _replace_in_core(self, filter_year: str, table_prefix: str) -> Dict[str, Any]:
+        """
+        Nadomesti podatke leta v core tabelah z zamenjavo particij.
+
+        Nove particije se zgradijo kot samostojne tabele (core.X_<leto>_novo) z vsemi indeksi
+        in CHECK omejitvijo na leto, nato se v kratki transakciji stare particije odstranijo,
+        nove pa priključijo (ATTACH PARTITION). Branje core tabel med gradnjo ni moteno.
+        """
+        leto = int(filter_year)
+        tables = ("posel", "del_stavbe")  # del_stavbe ima FK na posel
+        changes = {
+            "mode": "replace",
+            "posel": {"inserted": 0, "updated": 0, "deleted": 0},
+            "del_stavbe": {"inserted": 0, "updated": 0, "deleted": 0}
+        }
+
+        # 1. Gradnja novih particij
+        try:
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    for table in tables:
+                        parent = f"{table_prefix}_{table}"
+                        novo = f"core.{parent}_{leto}_novo"
+                        logger.info(f"Pretvarjanje podatkov v {novo}")
+
+                        conn.execute(text(f"DROP TABLE IF EXISTS {novo}"))
+                        conn.execute(text(f"CREATE TABLE {novo} (LIKE core.{parent} INCLUDING DEFAULTS)"))
+
+                        # rowcount zadnjega stavka skripte: pri del_stavbe UPDATE tip_rabe zajame vse nove vrstice
+                        result = conn.execute(text(get_sql_query(f'{parent}_transform.sql', target_table=novo)))
+                        changes[table]["inserted"] = result.rowcount
+
+                        # CHECK omejitev omogoči ATTACH PARTITION brez pregledovanja vrstic
+                        conn.execute(text(f"ALTER TABLE {novo} ADD CONSTRAINT {parent}_{leto}_novo_leto CHECK (leto = {leto})"))
+
+                        # Indeksi in omejitve kot na starševski tabeli, da jih ATTACH ne gradi pod zaklepom
+                        for constraint in get_constraint_definitions(conn, 'core', parent):
+                            conn.execute(text(f"ALTER TABLE {novo} ADD {constraint['definition']}"))
+                        for index in get_index_definitions(conn, 'core', parent):
+                            conn.execute(text(clone_index_definition(index["definition"], novo)))
+
+                        conn.execute(text(f"ANALYZE {novo}"))
+                        logger.info(f"Zgrajena particija {novo}: {changes[table]['inserted']} vrstic")
+
+                    trans.commit()
+                except Exception as e:
+                    trans.rollback()
+                    logger.error(f"Napaka pri gradnji novih particij za leto {leto}: {str(e)}")
+                    raise
+        except Exception as e:
+            logger.error(f"Napaka povezave pri gradnji novih particij: {str(e)}")
+            raise
+
+        # 2. Zamenjava particij v kratki transakciji
+        try:
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    # Novi del_stavbe_id-ji -> vse nepremičnine stare in nove particije je treba ponovno deduplicirati
+                    stara_particija = f"core.{table_prefix}_del_stavbe_{leto}"
+                    nova_particija = f"core.{table_prefix}_del_stavbe_{leto}_novo"
+                    if conn.execute(text("SELECT to_regclass(:particija)"), {"particija": stara_particija}).scalar():
+                        source = f"(SELECT sifra_ko, stevilka_stavbe, stevilka_dela_stavbe FROM {stara_particija} UNION SELECT sifra_ko, stevilka_stavbe, stevilka_dela_stavbe FROM {nova_particija})"
+                    else:
+                        source = nova_particija
+                    self._record_changed_properties(conn, table_prefix, source)
+
+                    stari_posli = f"core.{table_prefix}_posel_{leto}"
+                    novi_posli = f"core.{table_prefix}_posel_{leto}_novo"
+                    if conn.execute(text("SELECT to_regclass(:particija)"), {"particija": stari_posli}).scalar():
+                        posli_source = f"(SELECT * FROM {stari_posli} UNION ALL SELECT * FROM {novi_posli})"
+                    else:
+                        posli_source = novi_posli
+                    self._record_changed_statistics_years(conn, table_prefix, posli_source)
+
+                    for table in reversed(tables):
+                        particija = f"core.{table_prefix}_{table}_{leto}"
+                        if conn.execute(text("SELECT to_regclass(:particija)"), {"particija": particija}).scalar():
+                            changes[table]["deleted"] = get_row_count(conn, 'core', f"{table_prefix}_{table}_{leto}")
+                            conn.execute(text(f"ALTER TABLE core.{table_prefix}_{table} DETACH PARTITION {particija}"))
+                            conn.execute(text(f"DROP TABLE {particija}"))
+
+                    for table in tables:
+                        parent = f"{table_prefix}_{table}"
+                        conn.execute(text(f"ALTER TABLE core.{parent}_{leto}_novo RENAME TO {parent}_{leto}"))
+                        conn.execute(text(f"ALTER TABLE core.{parent} ATTACH PARTITION core.{parent}_{leto} FOR VALUES IN ({leto})"))
+                        conn.execute(text(f"ALTER TABLE core.{parent}_{leto} DROP CONSTRAINT {parent}_{leto}_novo_leto"))
+                        record_row_count(conn, 'core', f"{parent}_{leto}", changes[table]["inserted"])
+
+                    trans.commit()
+                    logger.info(f"Particije za leto {leto} zamenjane. Izbrisanih {table_prefix}_del_stavbe: {changes['del_stavbe']['deleted']}, {table_prefix}_posel: {changes['posel']['deleted']}")
+                except Exception as e:
+                    trans.rollback()
+                    logger.error(f"Napaka pri zamenjavi particij za leto {leto}: {str(e)}")
+                    raise
+        except Exception as e:
+            logger.error(f"Napaka povezave pri zamenjavi particij: {str(e)}")
+            raise
+
+        return changes
+
+
+    def _merge_to_core(self, filter_year: str, table_prefix: str) -> Dict[str, Any]:
+        """
+        Primerja nove podatke iz staging tabel s core tabelami in zapiše samo razlike.
+
+        Staging podatki se najprej pretvorijo v začasne tabele z istimi transform skriptami kot pri
+        polnem vnosu. Nato se v eni transakciji:
+        - posel: posodobijo spremenjeni posli (po posel_id in leto, da se uporabi samo particija leta), vstavijo novi
+          in izbrišejo manjkajoči,
+        - del_stavbe: po naravnem ključu (posel_id, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
+          posodobijo spremenjene vrstice, izbrišejo vrstice brez ujemanja in vstavijo nove.
+        Nespremenjene vrstice (in njihov del_stavbe_id) ostanejo nedotaknjene.
+        """
+        leto = int(filter_year)
+        posel_table = f"core.{table_prefix}_posel"
+        del_stavbe_table = f"core.{table_prefix}_del_stavbe"
+        novi_posel = f"novi_{table_prefix}_posel"
+        novi_del_stavbe = f"novi_{table_prefix}_del_stavbe"
+        spremenjeni_kljuci = f"spremenjeni_{table_prefix}_kljuci"
+        spremenjeni_posli = f"spremenjeni_{table_prefix}_posli"
+        spremenjene_vrednosti = f"spremenjene_{table_prefix}_vrednosti"
+        kljuc = ["posel_id", "sifra_ko", "stevilka_stavbe", "stevilka_dela_stavbe"]
+
+        logger.info(f"Združevanje (merge) staging podatkov v core.{table_prefix}_* za leto {leto}")
+
+        try:
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    for table in ("posel", "del_stavbe"):
+                        self._ensure_partition(conn, f"{table_prefix}_{table}", leto)
+
+                    # Začasne tabele z enako strukturo kot core (brez ključev in privzetih vrednosti)
+                    conn.execute(text(f"CREATE TEMP TABLE {novi_posel} (LIKE {posel_table}) ON COMMIT DROP"))
+                    conn.execute(text(f"CREATE TEMP TABLE {novi_del_stavbe} (LIKE {del_stavbe_table}) ON COMMIT DROP"))
+                    conn.execute(text(f"ALTER TABLE {novi_del_stavbe} ALTER COLUMN del_stavbe_id DROP NOT NULL"))
+
+                    # Ključi spremenjenih del_stavbe vrstic in id-ji spremenjenih poslov (za inkrementalno dedupliciranje)
+                    conn.execute(text(f"CREATE TEMP TABLE {spremenjeni_kljuci} (sifra_ko SMALLINT, stevilka_stavbe INTEGER, stevilka_dela_stavbe INTEGER, posel_id INTEGER) ON COMMIT DROP"))
+                    conn.execute(text(f"CREATE TEMP TABLE {spremenjeni_posli} (posel_id INTEGER) ON COMMIT DROP"))
+                    # Stare in nove vrstice spremenjenih poslov (za leta statistik)
+                    conn.execute(text(f"CREATE TEMP TABLE {spremenjene_vrednosti} (LIKE {posel_table}) ON COMMIT DROP"))
+
+                    conn.execute(text(get_sql_query(f'{table_prefix}_posel_transform.sql', target_table=novi_posel)))
+                    conn.execute(text(get_sql_query(f'{table_prefix}_del_stavbe_transform.sql', target_table=novi_del_stavbe)))
+
+                    # Staging tabele so skupne za vsa leta - pred brisanjem preveri, da vsebujejo podatke tega leta
+                    stevilo_poslov, tuja_leta = conn.execute(text(f"""
+                        SELECT COUNT(*), COUNT(*) FILTER (WHERE leto IS DISTINCT FROM :leto) FROM {novi_posel}
+                    """), {"leto": leto}).one()
+                    if stevilo_poslov == 0 or tuja_leta > 0:
+                        raise ValueError(
+                            f"Staging podatki ne pripadajo letu {leto} (poslov: {stevilo_poslov}, iz drugih let: {tuja_leta})"
+                        )
+
+                    posel_cols = self._get_table_columns(conn, 'core', f'{table_prefix}_posel')
+                    del_stavbe_cols = self._get_table_columns(conn, 'core', f'{table_prefix}_del_stavbe', exclude=("del_stavbe_id",))
+
+                    def cols(alias, columns):
+                        return ", ".join(f"{alias}.{c}" for c in columns)
+
+                    def key_match(left, right):
+                        return " AND ".join(f"{left}.{c} = {right}.{c}" for c in kljuc)
+
+                    def record_keys(dml):
+                        # DML stavek zapiše ključe spremenjenih vrstic; rowcount ostane število spremenjenih vrstic
+                        return f"""
+                            WITH spremembe AS ({dml} RETURNING c.sifra_ko, c.stevilka_stavbe, c.stevilka_dela_stavbe, c.posel_id)
+                            INSERT INTO {spremenjeni_kljuci} SELECT * FROM spremembe
+                        """
+
+                    params = {"leto": leto}
+
+                    # 1. POSEL - posodobi spremenjene in vstavi nove
+                    # Drugi sklic na tabelo (o) vidi vrstico pred posodobitvijo, zato RETURNING vrne staro (o) in novo (c) vrstico
+                    posel_updated = conn.execute(text(f"""
+                        WITH spremembe AS (
+                            UPDATE {posel_table} c
+                            SET ({", ".join(posel_cols)}) = ({cols("s", posel_cols)})
+                            FROM {novi_posel} s, {posel_table} o
+                            WHERE c.posel_id = s.posel_id
+                              AND c.leto = s.leto
+                              AND o.posel_id = c.posel_id
+                              AND o.leto = c.leto
+                              AND ROW({cols("c", posel_cols)}) IS DISTINCT FROM ROW({cols("s", posel_cols)})
+                            RETURNING c.posel_id, o AS stara, c AS nova
+                        ), vrednosti AS (
+                            INSERT INTO {spremenjene_vrednosti}
+                            SELECT (stara).* FROM spremembe
+                            UNION ALL
+                            SELECT (nova).* FROM spremembe
+                        )
+                        INSERT INTO {spremenjeni_posli} SELECT posel_id FROM spremembe
+                    """)).rowcount
+
+                    posel_inserted = conn.execute(text(f"""
+                        WITH vstavljeni AS (
+                            INSERT INTO {posel_table} ({", ".join(posel_cols)})
+                            SELECT {cols("s", posel_cols)}
+                            FROM {novi_posel} s
+                            WHERE NOT EXISTS (SELECT 1 FROM {posel_table} c WHERE c.posel_id = s.posel_id AND c.leto = s.leto)
+                            RETURNING *
+                        )
+                        INSERT INTO {spremenjene_vrednosti} SELECT * FROM vstavljeni
+                    """)).rowcount
+
+                    # 2. DEL STAVBE - posodobi vrstice, kjer je naravni ključ enoličen na obeh straneh
+                    del_stavbe_updated = conn.execute(text(record_keys(f"""
+                        UPDATE {del_stavbe_table} c
+                        SET ({", ".join(del_stavbe_cols)}) = ({cols("s", del_stavbe_cols)})
+                        FROM {novi_del_stavbe} s
+                        WHERE c.leto = :leto
+                          AND {key_match("c", "s")}
+                          AND ROW({cols("c", del_stavbe_cols)}) IS DISTINCT FROM ROW({cols("s", del_stavbe_cols)})
+                          AND ({cols("s", kljuc)}) IN (
+                              SELECT {", ".join(kljuc)} FROM {novi_del_stavbe}
+                              GROUP BY {", ".join(kljuc)} HAVING COUNT(*) = 1
+                          )
+                          AND ({cols("c", kljuc)}) IN (
+                              SELECT {", ".join(kljuc)} FROM {del_stavbe_table} WHERE leto = :leto
+                              GROUP BY {", ".join(kljuc)} HAVING COUNT(*) = 1
+                          )
+                    """)), params).rowcount
+
+                    # 3. DEL STAVBE - izbriši vrstice, ki nimajo identične vrstice v novih podatkih
+                    del_stavbe_deleted = conn.execute(text(record_keys(f"""
+                        DELETE FROM {del_stavbe_table} c
+                        WHERE c.leto = :leto
+                          AND NOT EXISTS (
+                              SELECT 1 FROM {novi_del_stavbe} s
+                              WHERE {key_match("s", "c")}
+                                AND ROW({cols("s", del_stavbe_cols)}) IS NOT DISTINCT FROM ROW({cols("c", del_stavbe_cols)})
+                          )
+                    """)), params).rowcount
+
+                    # 4. DEL STAVBE - vstavi nove vrstice
+                    del_stavbe_inserted = conn.execute(text(record_keys(f"""
+                        INSERT INTO {del_stavbe_table} AS c ({", ".join(del_stavbe_cols)})
+                        SELECT {cols("s", del_stavbe_cols)}
+                        FROM {novi_del_stavbe} s
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM {del_stavbe_table} c
+                            WHERE c.leto = :leto
+                              AND {key_match("c", "s")}
+                              AND ROW({cols("c", del_stavbe_cols)}) IS NOT DISTINCT FROM ROW({cols("s", del_stavbe_cols)})
+                        )
+                    """)), params).rowcount
+
+                    # 5. POSEL - izbriši posle leta, ki jih ni več v novih podatkih (po del_stavbe zaradi FK)
+                    posel_deleted = conn.execute(text(f"""
+                        WITH izbrisani AS (
+                            DELETE FROM {posel_table} c
+                            WHERE c.leto = :leto
+                              AND NOT EXISTS (SELECT 1 FROM {novi_posel} s WHERE s.posel_id = c.posel_id)
+                            RETURNING c.*
+                        )
+                        INSERT INTO {spremenjene_vrednosti} SELECT * FROM izbrisani
+                    """), params).rowcount
+
+                    # 6. Nepremičnine za inkrementalno dedupliciranje: spremenjene vrstice in deli stavb spremenjenih poslov
+                    conn.execute(text(f"""
+                        INSERT INTO {spremenjeni_kljuci}
+                        SELECT ds.sifra_ko, ds.stevilka_stavbe, ds.stevilka_dela_stavbe, ds.posel_id
+                        FROM {del_stavbe_table} ds
+                        WHERE ds.leto = :leto
+                          AND ds.posel_id IN (SELECT posel_id FROM {spremenjeni_posli})
+                    """), params)
+                    self._record_changed_properties(conn, table_prefix, spremenjeni_kljuci)
+
+                    # 7. Leta statistik za inkrementalno osvežitev statistik: stare in nove vrstice spremenjenih poslov
+                    # ter posli, katerih deli stavb so se spremenili
+                    conn.execute(text(f"""
+                        INSERT INTO {spremenjene_vrednosti}
+                        SELECT p.* FROM {posel_table} p
+                        WHERE p.leto = :leto
+                          AND p.posel_id IN (SELECT posel_id FROM {spremenjeni_kljuci})
+                    """), params)
+                    self._record_changed_statistics_years(conn, table_prefix, spremenjene_vrednosti)
+
+                    adjust_row_count(conn, 'core', f"{table_prefix}_posel_{leto}", posel_inserted - posel_deleted)
+                    adjust_row_count(conn, 'core', f"{table_prefix}_del_stavbe_{leto}", del_stavbe_inserted - del_stavbe_deleted)
+
+                    trans.commit()
+
+                except Exception as e:
+                    trans.rollback()
+                    logger.error(f"Napaka pri združevanju podatkov v core: {str(e)}")
+                    raise
+        except Exception as e:
+            logger.error(f"Napaka povezave pri združevanju podatkov v core: {str(e)}")
+            raise
+
+        changes = {
+            "mode": "merge",
+            "posel": {"inserted": posel_inserted, "updated": posel_updated, "deleted": posel_deleted},
+            "del_stavbe": {"inserted": del_stavbe_inserted, "updated": del_stavbe_updated, "deleted": del_stavbe_deleted}
+        }
+        logger.info(f"Merge zaključen za leto {leto}: {table_prefix}_posel {changes['posel']}, {table_prefix}_del_stavbe {changes['del_stavbe']}")
+
+        return changes
+
+
+    def _record_changed_properties(self, conn, table_prefix: str, source: str):
+        """Doda ključe nepremičnin iz source tabele/poizvedbe v core.<prefix>_spremenjene_nepremicnine."""
+        result = conn.execute(text(f"""
+            INSERT INTO core.{table_prefix}_spremenjene_nepremicnine (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
+            SELECT DISTINCT k.sifra_ko, k.stevilka_stavbe, k.stevilka_dela_stavbe
+            FROM {source} k
+            WHERE k.sifra_ko IS NOT NULL
+              AND k.stevilka_stavbe IS NOT NULL
+              AND k.stevilka_dela_stavbe IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """))
+        logger.info(f"Zabeleženih {result.rowcount} novih spremenjenih nepremičnin za dedupliciranje")
+
+
+    def _record_changed_statistics_years(self, conn, table_prefix: str, source: str):
+        """
+        Doda leta statistik, na katera vplivajo posli iz source tabele/poizvedbe, v stats.spremenjena_leta.
+
+        Source vsebuje stare in nove vrstice spremenjenih poslov (pri izbrisanih samo stare, pri novih samo nove).
+        Prodaja vpliva na leto sklenitve, najem na leto sklenitve (mesečna kocka) in vsa leta od začetka do
+        konca najema (aktivni najemi do tekočega leta).
+        """
+        if table_prefix == "kpp":
+            tip_posla = "prodaja"
+            leta = f"""
+                SELECT DATE_PART('year', p.datum_sklenitve)::INTEGER FROM {source} p WHERE p.datum_sklenitve IS NOT NULL
+            """
+        else:
+            tip_posla = "najem"
+            leta = f"""
+                SELECT generate_series(
+                    DATE_PART('year', p.datum_zacetka_najemanja)::INTEGER,
+                    COALESCE(DATE_PART('year', p.datum_zakljucka_najema)::INTEGER, DATE_PART('year', CURRENT_DATE)::INTEGER)
+                )
+                FROM {source} p WHERE p.datum_zacetka_najemanja IS NOT NULL
+                UNION SELECT DATE_PART('year', p.datum_sklenitve)::INTEGER FROM {source} p WHERE p.datum_sklenitve IS NOT NULL
+            """
+
+        result = conn.execute(text(f"""
+            INSERT INTO stats.spremenjena_leta (tip_posla, leto)
+            SELECT DISTINCT :tip_posla, l.leto
+            FROM ({leta}) AS l(leto)
+            WHERE l.leto BETWEEN 2007 AND DATE_PART('year', CURRENT_DATE)
+            ON CONFLICT DO NOTHING
+        """), {"tip_posla": tip_posla})
+        logger.info(f"Zabeleženih {result.rowcount} novih spremenjenih let statistik ({tip_posla})")
+
+
+    def _get_table_columns(self, conn, schema: str, table: str, exclude: tuple = ()) -> List[str]:
+        """Vrne imena stolpcev tabele v vrstnem redu definicije."""
+        rows = conn.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = :schema AND table_name = :table
+            ORDER BY ordinal_position
+        """), {"schema": schema, "table": table}).fetchall()
+
+        return [row[0] for row in rows if row[0] not in exclude]
+
     
 
 
 
+    @staticmethod
+    def _copy_into_table(table, conn, keys, data_iter):
+        """Metoda za pandas to_sql, ki vrstice naloži s PostgreSQL COPY ukazom."""
+
+        def copy_value(value):
+            # prazne vrednosti -> NULL, cela števila iz float stolpcev (zaradi NaN) -> int
+            if isinstance(value, float):
+                if math.isnan(value):
+                    return None
+                if value.is_integer():
+                    return int(value)
+            return value
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in data_iter:
+            writer.writerow([copy_value(value) for value in row])
+        buffer.seek(0)
+
+        columns = ", ".join(f'"{key}"' for key in keys)
+        table_name = f"{table.schema}.{table.name}" if table.schema else table.name
+
+        dbapi_conn = conn.connection
+        with dbapi_conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+    def _set_staging_unlogged(self, data_type: str):
+        """Nastavi staging tabele tipa podatkov kot UNLOGGED (brez pisanja v WAL)."""
+        tables = ["sifranti", f"{data_type}_posel", f"{data_type}_del_stavbe"]
+
+        with self.engine.connect() as conn:
+            for table in tables:
+                persistence = conn.execute(text("""
+                    SELECT c.relpersistence
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = 'staging' AND c.relname = :table
+                """), {"table": table}).scalar()
+
+                if persistence == 'p':
+                    conn.execute(text(f"ALTER TABLE staging.{table} SET UNLOGGED"))
+                    logger.info(f"staging.{table} nastavljena kot UNLOGGED")
+            conn.commit()
+
+
+    def _drop_deferrable_indexes(self, table_prefix: str) -> List[Dict[str, str]]:
+        """
+        Izbriše indekse na core del_stavbe tabeli, ki med množičnim vnosom niso potrebni.
+
+        Vrne definicije izbrisanih indeksov, da jih lahko po vnosu ponovno ustvarimo.
+        Indeksi, ki pripadajo omejitvam (PK, unique), in BULK_KEEP_INDEXES ostanejo.
+        Brisanje indeksa na particionirani tabeli izbriše tudi indekse vseh particij.
+        """
+        table = f"{table_prefix}_del_stavbe"
+
+        with self.engine.connect() as conn:
+            indexes = [
+                {**index, "table": f"core.{table}"}
+                for index in get_index_definitions(conn, 'core', table)
+                if index["name"] not in BULK_KEEP_INDEXES.get(table_prefix, [])
+            ]
+
+            for index in indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS core.{index['name']}"))
+                logger.info(f"Izbrisan indeks core.{index['name']}: {index['definition']}")
+            conn.commit()
+
+        return indexes
+
+
+    def _recreate_indexes(self, indexes: List[Dict[str, str]]):
+        """Ponovno ustvari indekse iz shranjenih definicij (pg_indexes.indexdef)."""
+        with self.engine.connect() as conn:
+            for index in indexes:
+                # indexdef particionirane tabele vsebuje 'ON ONLY', ki indeksa ne bi ustvaril na particijah
+                conn.execute(text(clone_index_definition(index["definition"], index["table"], index["name"])))
+                conn.commit()
+                logger.info(f"Ponovno ustvarjen indeks core.{index['name']}")
+
+
+    def _analyze_tables(self, tables: List[str]):
+        """Posodobi statistiko planerja za podane tabele."""
+        with self.engine.connect() as conn:
+            for table in tables:
+                conn.execute(text(f"ANALYZE {table}"))
+            conn.commit()
+        logger.info(f"ANALYZE izveden za: {', '.join(tables)}")
+
+    
+
     def cleanup(self, temp_dir: str):
         """Počisti začasen direktorij."""
         try:
@@ -351,8 +802,14 @@ class DataIngestionService:
 
 
 
-    async def run_ingestion(self, filter_year: str, data_type: str = "np") -> Dict[str, Any]:
-        """Zažene celoten proces vnosa podatkov."""
+    async def run_ingestion(self, filter_year: str, data_type: str = "np", mode: str = "replace", bulk: bool = False) -> Dict[str, Any]:
+        """
+        Zažene celoten proces vnosa podatkov.
+
+        Pri bulk=True so staging tabele UNLOGGED in se polnijo s COPY; za brisanje in ponovno
+        ustvarjanje indeksov na core tabelah poskrbi run_bulk_ingestion.
+        """
+        timings = {}
         try:
             #za async izvajanje
             loop = asyncio.get_event_loop()
@@ -364,34 +821,49 @@ class DataIngestionService:
             logger.info("=" + "/" * 50 + '=')
 
             logger.info(f"Začenjam vnos podatkov tipa {data_type}")
+
+            if bulk:
+                await loop.run_in_executor(self.executor, self._set_staging_unlogged, data_type)
             
             # Prenesi podatke
-            zip_path = await self.download_data(filter_year, data_type)
+            with timed_phase(logger, "prenos", timings):
+                zip_path = await self.download_data(filter_year, data_type)
             temp_dir = os.path.dirname(zip_path)
+            downloaded_bytes = os.path.getsize(zip_path)
 
             logger.info("=" * 50)
             
             # Ekstrahiraj datoteke
-            csv_files = self.extract_files(zip_path, data_type)
+            with timed_phase(logger, "ekstrakcija", timings):
+                csv_files = await loop.run_in_executor(
+                    self.executor,
+                    self.extract_files,
+                    zip_path,
+                    data_type
+                )
 
             logger.info("=" * 50)
             
             # Uvozi v staging tabele
-            await loop.run_in_executor(
-                self.executor,
-                self.import_to_staging,
-                csv_files
-            )
+            with timed_phase(logger, "staging", timings):
+                staging_rows = await loop.run_in_executor(
+                    self.executor,
+                    self.import_to_staging,
+                    csv_files,
+                    bulk
+                )
 
             logger.info("=" * 50)
             
             # Pretvori v core tabele
-            await loop.run_in_executor(
-                self.executor,
-                self.transform_to_core,
-                filter_year,
-                data_type
-            )
+            with timed_phase(logger, "core", timings):
+                changes = await loop.run_in_executor(
+                    self.executor,
+                    self.transform_to_core,
+                    filter_year,
+                    data_type,
+                    mode
+                )
             logger.info("=" * 50)
             
             #počisti temp direktorij
@@ -401,8 +873,62 @@ class DataIngestionService:
                 temp_dir
             )            
 
-            return {"status": "success", "message": f"Vnos podatkov tipa {data_type} uspešno zaključen"}
+            return {
+                "status": "success",
+                "message": f"Vnos podatkov tipa {data_type} uspešno zaključen",
+                "changes": changes,
+                "staging_rows": staging_rows,
+                "bytes": downloaded_bytes,
+                "timings": timings
+            }
             
         except Exception as e:
             logger.error(f"Napaka pri vnosu podatkov: {str(e)}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e), "timings": timings}
+
+
+    async def run_bulk_ingestion(self, data_type: str, years: List[int], mode: str = "replace") -> Dict[str, Any]:
+        """
+        Množični vnos več let naenkrat.
+
+        Pred vnosom se izbrišejo indeksi na core del_stavbe tabeli, ki niso potrebni za sam vnos,
+        po vnosu vseh let se ponovno ustvarijo in core tabele se analizirajo. Tako se indeksi
+        zgradijo enkrat namesto sprotnega vzdrževanja za vsako vstavljeno vrstico.
+        """
+        loop = asyncio.get_event_loop()
+        table_prefix = data_type
+        timings = {}
+        results = {}
+        dropped_indexes = []
+
+        logger.info(f"Začenjam množični vnos podatkov tipa {data_type} za leta {years}")
+
+        try:
+            with timed_phase(logger, "brisanje_indeksov", timings):
+                dropped_indexes = await loop.run_in_executor(self.executor, self._drop_deferrable_indexes, table_prefix)
+
+            for year in years:
+                result = await self.run_ingestion(str(year), data_type, mode=mode, bulk=True)
+                results[str(year)] = result
+                for phase, duration in result.get("timings", {}).items():
+                    timings[phase] = round(timings.get(phase, 0) + duration, 3)
+
+        finally:
+            # Indekse ustvarimo tudi ob napaki, da core tabele ne ostanejo brez njih
+            with timed_phase(logger, "ustvarjanje_indeksov", timings):
+                await loop.run_in_executor(self.executor, self._recreate_indexes, dropped_indexes)
+
+            with timed_phase(logger, "analyze", timings):
+                await loop.run_in_executor(
+                    self.executor,
+                    self._analyze_tables,
+                    [f"core.{table_prefix}_posel", f"core.{table_prefix}_del_stavbe"]
+                )
+
+        failed = [year for year, result in results.items() if result["status"] != "success"]
+        logger.info(f"Množični vnos {data_type} zaključen. Časi faz: {timings}")
+
+        if failed:
+            return {"status": "error", "message": f"Vnos ni uspel za leta: {', '.join(failed)}", "years": results, "timings": timings}
+
+        return {"status": "success", "message": f"Množični vnos podatkov tipa {data_type} uspešno zaključen", "years": results, "timings": timings}
@@ -1,11 +1,112 @@
-from .logging_utils import setup_logger
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .logging_utils import setup_logger, timed_phase
 from sqlalchemy import text
-from .sql_utils import get_sql_query, execute_sql_count
+from .maintenance import spatial_index_name
+from .sql_utils import get_sql_query, record_row_count, adjust_row_count, get_row_count, clone_indexes_and_constraints, swap_shadow_table
 from .database import get_engine
 
 
 logger = setup_logger("deduplication", "deduplication.log", "DEDUP")
 
+# full: ponovna izgradnja celotne tabele, incremental: samo nepremičnine iz core.<prefix>_spremenjene_nepremicnine
+DEDUP_MODES = ["full", "incremental"]
+
+# Število vzporednih povezav (shardov po obsegih sifra_ko) na posamezen tip podatkov pri polnem dedupliciranju
+DEDUP_SHARDS = 4
+
+# Pripona senčne tabele, v katero se gradi celotna deduplicirana tabela pred zamenjavo
+SHADOW_SUFFIX = "_novo"
+
+# Stolpec cene posla, ki se zapiše v tabelo povezav <prefix>_del_stavbe_posel
+CENA_POSLA = {"np": "najemnina", "kpp": "cena"}
+
+# Stolpec zadnje cene nepremičnine, iz katerega se računajo cene v povzetku stavb <prefix>_stavba
+ZADNJA_CENA = {"np": "zadnja_najemnina", "kpp": "zadnja_cena"}
+
+# Omejitev dedup_stavba.sql na stavbe iz začasne tabele ei_spremenjene_stavbe
+OMEJITEV_SPREMENJENE_STAVBE = "AND (sifra_ko, stevilka_stavbe) IN (SELECT sifra_ko, stevilka_stavbe FROM ei_spremenjene_stavbe)"
+
+# Omejitev dodaj_ei_deduplication.sql na stavbe iz začasne tabele ei_spremenjene_stavbe
+EI_OMEJITEV_SPREMENJENE_STAVBE = "AND (ei.sifra_ko, ei.stevilka_stavbe) IN (SELECT sifra_ko, stevilka_stavbe FROM ei_spremenjene_stavbe)"
+
+
+def update_energetske_izkaznice(conn, table: str, only_changed_buildings: bool = False):
+    """
+    Posodobi energetske_izkaznice in energijski_razred v deduplicirani tabeli.
+
+    Pri only_changed_buildings=True se obdelajo samo stavbe iz začasne tabele ei_spremenjene_stavbe
+    (sifra_ko, stevilka_stavbe), ki jo mora klicatelj ustvariti v isti transakciji. Izkaznice teh stavb
+    se najprej počistijo, saj je izkaznica lahko izbrisana ali premaknjena.
+    """
+    omejitev = ""
+    if only_changed_buildings:
+        conn.execute(text(f"""
+            UPDATE {table} d
+            SET energetske_izkaznice = NULL, energijski_razred = NULL
+            FROM ei_spremenjene_stavbe s
+            WHERE d.sifra_ko = s.sifra_ko
+              AND d.stevilka_stavbe = s.stevilka_stavbe
+        """))
+        omejitev = EI_OMEJITEV_SPREMENJENE_STAVBE
+
+    result = conn.execute(text(get_sql_query('dodaj_ei_deduplication.sql', tabela=table, omejitev=omejitev)))
+    logger.info(f"Energetske izkaznice posodobljene v {table}: {result.rowcount} vrstic")
+
+
+def get_del_stavbe_posel_query(table_prefix: str, target_table: str, tabela: str, omejitev: str = "") -> str:
+    """Vrne SQL za polnjenje tabele povezav nepremičnin iz deduplicirane tabele tabela v target_table."""
+    return get_sql_query(
+        'dedup_del_stavbe_posel.sql',
+        target_table=target_table,
+        tabela=tabela,
+        del_stavbe=f"core.{table_prefix}_del_stavbe",
+        posel=f"core.{table_prefix}_posel",
+        cena=CENA_POSLA[table_prefix],
+        omejitev=omejitev
+    )
+
+
+def get_stavba_query(table_prefix: str, target_table: str, tabela: str, omejitev: str = "") -> str:
+    """Vrne SQL za polnjenje povzetka stavb iz deduplicirane tabele tabela v target_table."""
+    return get_sql_query(
+        'dedup_stavba.sql',
+        target_table=target_table,
+        tabela=tabela,
+        cena=ZADNJA_CENA[table_prefix],
+        omejitev=omejitev
+    )
+
+
+def split_sifra_ko_ranges(counts: list, shards: int) -> list:
+    """
+    Razdeli katastrske občine na zaporedne obsege sifra_ko s približno enakim številom vrstic.
+
+    Args:
+        counts: Seznam (sifra_ko, število vrstic), urejen po sifra_ko
+        shards: Največje število obsegov
+
+    Returns:
+        Seznam obsegov (sifra_ko_od, sifra_ko_do), oba vključno
+    """
+    if not counts:
+        return []
+
+    total = sum(count for _, count in counts)
+    ranges = []
+    start = counts[0][0]
+    accumulated = 0
+
+    for i, (sifra_ko, count) in enumerate(counts):
+        accumulated += count
+        is_last = i == len(counts) - 1
+        if is_last or (len(ranges) < shards - 1 and accumulated >= total * (len(ranges) + 1) / shards):
+            ranges.append((start, sifra_ko))
+            if not is_last:
+                start = counts[i + 1][0]
+
+    return ranges
+
 
 class DeduplicationService:
     """
@@ -13,101 +114,375 @@ class DeduplicationService:
     To se izvršuje ENKRAT na koncu celotnega procesa vnosa za vsa leta.
     """
     
-    def __init__(self):
+    def __init__(self, shards: int = DEDUP_SHARDS):
         self.engine = get_engine()
+        self.shards = shards
  
     
-    def create_deduplicated_del_stavbe(self, data_type: str):
+    def create_deduplicated_del_stavbe(self, data_type: str) -> dict:
         """
         Ustvari deduplicirane lastnosti za prikaz na zemljevidu z uporabo VSEH podatkov vseh let.
-        To naj se izvršuje ENKRAT potem, ko so vsa leta vnešena.
+        To naj se izvršuje ENKRAT potem, ko so vsa leta vnešena. Vrne število ustvarjenih lastnosti.
         """
         try:
             table_prefix = data_type.lower()
             logger.info(f"Ustvarjam deduplicirane lastnosti za VSE {table_prefix} podatke")
             
-            # Korak 1: Popolnoma očisti obstoječe deduplicirane podatke
-            self._clear_deduplicated_table(table_prefix)
+            # Korak 1: Zgradi celotno tabelo v senčno tabelo (bralci še vedno vidijo obstoječo tabelo)
+            inserted, links, buildings = self._build_shadow_table(table_prefix)
             
-            # Korak 2: Zaženi dedupliciranje SQL za obdelavo VSEH let naenkrat
-            self._run_deduplication_sql(table_prefix)
+            # Korak 2: V kratki transakciji zamenjaj tabele
+            self._swap_shadow_table(table_prefix, inserted, links, buildings)
             
             # Korak 3: Preveri rezultate
             self._verify_deduplication_results(table_prefix)
             
             logger.info(f"Dedupliciranje uspešno dokončano za {table_prefix}")
+            return {"inserted": inserted}
             
         except Exception as e:
             logger.error(f"Napaka pri ustvarjanju dedupliciranih lastnosti za {data_type}: {str(e)}")
             raise
     
-    def _clear_deduplicated_table(self, table_prefix: str):
-        """Očisti celotno deduplicirano tabelo za sveže podatke"""
+    def update_deduplicated_del_stavbe(self, data_type: str) -> dict:
+        """
+        Inkrementalno dedupliciranje: ponovno izračuna samo nepremičnine, ki jih je spremenil vnos podatkov.
+
+        Ključi (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe) se vzamejo iz core.<prefix>_spremenjene_nepremicnine
+        in razširijo z nepremičninami, ki si z njimi delijo posel (povezani deli stavb, podvojeni posli).
+        Nove vrstice se zapišejo z upsert na uq_<prefix>_deduplicated, zato del_stavbe_id nespremenjenih
+        nepremičnin ostane enak. Energetske izkaznice in povzetek stavb se posodobijo samo za prizadete stavbe.
+        """
+        table_prefix = data_type.lower()
+        dedup_table = f"core.{table_prefix}_del_stavbe_deduplicated"
+        link_table = f"core.{table_prefix}_del_stavbe_posel"
+        building_table = f"core.{table_prefix}_stavba"
+        result = {"keys": 0, "deleted": 0, "upserted": 0}
+        omejitev = "AND (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe) IN (SELECT sifra_ko, stevilka_stavbe, stevilka_dela_stavbe FROM dedup_kljuci)"
+
         try:
+            logger.info(f"Inkrementalno dedupliciranje za {table_prefix}")
+
             with self.engine.connect() as conn:
                 trans = conn.begin()
                 try:
-                    delete_sql = f"TRUNCATE TABLE core.{table_prefix}_del_stavbe_deduplicated"
-                    conn.execute(text(delete_sql))
+                    # KORAK 1: Spremenjene nepremičnine in nepremičnine, povezane preko skupnih poslov
+                    conn.execute(text(f"""
+                        CREATE TEMP TABLE dedup_kljuci ON COMMIT DROP AS
+                        SELECT sifra_ko, stevilka_stavbe, stevilka_dela_stavbe
+                        FROM core.{table_prefix}_spremenjene_nepremicnine
+                        UNION
+                        SELECT ds.sifra_ko, ds.stevilka_stavbe, ds.stevilka_dela_stavbe
+                        FROM core.{table_prefix}_del_stavbe ds
+                        WHERE ds.posel_id IN (
+                            SELECT d.posel_id
+                            FROM core.{table_prefix}_del_stavbe d
+                            JOIN core.{table_prefix}_spremenjene_nepremicnine s USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
+                        )
+                        AND ds.sifra_ko IS NOT NULL
+                        AND ds.stevilka_stavbe IS NOT NULL
+                        AND ds.stevilka_dela_stavbe IS NOT NULL
+                    """))
+                    conn.execute(text("ANALYZE dedup_kljuci"))
+
+                    result["keys"] = conn.execute(text("SELECT COUNT(*) FROM dedup_kljuci")).scalar()
+                    if result["keys"] == 0:
+                        trans.rollback()
+                        logger.info(f"Ni spremenjenih nepremičnin za {table_prefix}, dedupliciranje ni potrebno")
+                        return result
+
+                    logger.info(f"Ponovni izračun {result['keys']} nepremičnin za {table_prefix}")
+
+                    # KORAK 2: Izračun novih vrstic v začasno tabelo
+                    conn.execute(text(f"CREATE TEMP TABLE dedup_novi (LIKE {dedup_table}) ON COMMIT DROP"))
+                    conn.execute(text("ALTER TABLE dedup_novi ALTER COLUMN del_stavbe_id DROP NOT NULL"))
+                    conn.execute(text(get_sql_query(
+                        f'{table_prefix}_del_stavbe_deduplication.sql',
+                        target_table="dedup_novi",
+                        omejitev=omejitev
+                    )))
+
+                    # Povezave ponovno izračunanih nepremičnin se zgradijo na novo (po upsertu, ko so znani id-ji)
+                    links_deleted = conn.execute(text(f"""
+                        DELETE FROM {link_table} l
+                        USING {dedup_table} d, dedup_kljuci k
+                        WHERE l.dedup_id = d.del_stavbe_id
+                          AND d.sifra_ko = k.sifra_ko
+                          AND d.stevilka_stavbe = k.stevilka_stavbe
+                          AND d.stevilka_dela_stavbe = k.stevilka_dela_stavbe
+                    """)).rowcount
+
+                    # KORAK 3: Izbriši vrstice, ki ne obstajajo več (nepremičnina ni več veljavna ali ima drugo dejansko rabo)
+                    result["deleted"] = conn.execute(text(f"""
+                        DELETE FROM {dedup_table} d
+                        USING dedup_kljuci k
+                        WHERE d.sifra_ko = k.sifra_ko
+                          AND d.stevilka_stavbe = k.stevilka_stavbe
+                          AND d.stevilka_dela_stavbe = k.stevilka_dela_stavbe
+                          AND NOT EXISTS (
+                              SELECT 1 FROM dedup_novi n
+                              WHERE n.sifra_ko = d.sifra_ko
+                                AND n.stevilka_stavbe = d.stevilka_stavbe
+                                AND n.stevilka_dela_stavbe = d.stevilka_dela_stavbe
+                                AND n.dejanska_raba = d.dejanska_raba
+                          )
+                    """)).rowcount
+
+                    # KORAK 4: Upsert novih vrstic (del_stavbe_id obstoječih vrstic ostane)
+                    columns = [
+                        row[0] for row in conn.execute(text("""
+                            SELECT column_name
+                            FROM information_schema.columns
+                            WHERE table_schema = 'core' AND table_name = :table
+                            ORDER BY ordinal_position
+                        """), {"table": f"{table_prefix}_del_stavbe_deduplicated"}).fetchall()
+                        if row[0] not in ("del_stavbe_id", "energetske_izkaznice", "energijski_razred")
+                    ]
+                    # xmax = 0 označuje na novo vstavljene vrstice (posodobljene imajo xmax transakcije)
+                    result["upserted"], inserted = conn.execute(text(f"""
+                        WITH upsert AS (
+                            INSERT INTO {dedup_table} ({", ".join(columns)})
+                            SELECT {", ".join(columns)} FROM dedup_novi
+                            ON CONFLICT ON CONSTRAINT uq_{table_prefix}_deduplicated DO UPDATE
+                            SET {", ".join(f"{c} = EXCLUDED.{c}" for c in columns)}
+                            RETURNING (xmax = 0) AS vstavljena
+                        )
+                        SELECT COUNT(*), COUNT(*) FILTER (WHERE vstavljena) FROM upsert
+                    """)).one()
+                    adjust_row_count(conn, 'core', f"{table_prefix}_del_stavbe_deduplicated", inserted - result["deleted"])
+
+                    links_inserted = conn.execute(text(get_del_stavbe_posel_query(table_prefix, link_table, dedup_table, omejitev))).rowcount
+                    adjust_row_count(conn, 'core', f"{table_prefix}_del_stavbe_posel", links_inserted - links_deleted)
+
+                    # KORAK 5: Energetske izkaznice za prizadete stavbe
+                    conn.execute(text("""
+                        CREATE TEMP TABLE ei_spremenjene_stavbe ON COMMIT DROP AS
+                        SELECT DISTINCT sifra_ko, stevilka_stavbe FROM dedup_kljuci
+                    """))
+                    update_energetske_izkaznice(conn, dedup_table, only_changed_buildings=True)
+
+                    # Povzetek prizadetih stavb se zgradi na novo iz posodobljene deduplicirane tabele
+                    buildings_deleted = conn.execute(text(f"""
+                        DELETE FROM {building_table} b
+                        USING ei_spremenjene_stavbe s
+                        WHERE b.sifra_ko = s.sifra_ko
+                          AND b.stevilka_stavbe = s.stevilka_stavbe
+                    """)).rowcount
+                    buildings_inserted = conn.execute(text(get_stavba_query(
+                        table_prefix, building_table, dedup_table, OMEJITEV_SPREMENJENE_STAVBE
+                    ))).rowcount
+                    adjust_row_count(conn, 'core', f"{table_prefix}_stavba", buildings_inserted - buildings_deleted)
+
+                    # KORAK 6: Obdelane nepremičnine niso več čakajoče
+                    conn.execute(text(f"""
+                        DELETE FROM core.{table_prefix}_spremenjene_nepremicnine s
+                        USING dedup_kljuci k
+                        WHERE s.sifra_ko = k.sifra_ko
+                          AND s.stevilka_stavbe = k.stevilka_stavbe
+                          AND s.stevilka_dela_stavbe = k.stevilka_dela_stavbe
+                    """))
+
                     trans.commit()
-                    logger.info(f"Očiščena obstoječa deduplicirana tabela: {table_prefix}_del_stavbe_deduplicated")
+                    logger.info(f"Inkrementalno dedupliciranje {table_prefix} zaključeno: izbrisanih {result['deleted']}, "
+                                f"vstavljenih/posodobljenih {result['upserted']}")
+                    return result
+
                 except Exception as e:
                     trans.rollback()
-                    logger.error(f"Napaka pri čiščenju deduplicirane tabele: {str(e)}")
+                    logger.error(f"Napaka pri inkrementalnem dedupliciranju: {str(e)}")
                     raise
         except Exception as e:
-            logger.error(f"Napaka povezave z bazo podatkov pri čiščenju tabele: {str(e)}")
+            logger.error(f"Napaka pri inkrementalnem dedupliciranju za {data_type}: {str(e)}")
             raise
     
-    def _run_deduplication_sql(self, table_prefix: str):
-        """Zaženi SQL za dedupliciranje za obdelavo vseh podatkov"""
+    def _build_shadow_table(self, table_prefix: str):
+        """
+        Zgradi deduplicirano tabelo v senčno tabelo core.<prefix>_del_stavbe_deduplicated_novo, tabelo
+        povezav v core.<prefix>_del_stavbe_posel_novo in povzetek stavb v core.<prefix>_stavba_novo;
+        vrne (število nepremičnin, število povezav, število vrstic povzetka stavb).
+
+        Nepremičnine se razdelijo na shard-e po obsegih sifra_ko, ki se polnijo vzporedno, vsak na svoji
+        povezavi. Nato senčna tabela dobi energetske izkaznice, enake indekse in omejitve kot obstoječa
+        tabela, se fizično uredi po indeksu koordinat (CLUSTER) in dobi posodobljeno statistiko (ANALYZE).
+        Obstoječa tabela med gradnjo ni zaklenjena.
+        """
+        table = f"{table_prefix}_del_stavbe_deduplicated"
+        shadow = f"{table}{SHADOW_SUFFIX}"
+        link_table = f"{table_prefix}_del_stavbe_posel"
+        building_table = f"{table_prefix}_stavba"
+        timings = {}
+
         try:
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                for live in (table, link_table, building_table):
+                    conn.execute(text(f"DROP TABLE IF EXISTS core.{live}{SHADOW_SUFFIX}"))
+                    conn.execute(text(f"CREATE TABLE core.{live}{SHADOW_SUFFIX} (LIKE core.{live} INCLUDING DEFAULTS)"))
+                trans.commit()
+
+            with timed_phase(logger, f"{table_prefix}_shardi", timings):
+                inserted, links, buildings = self._fill_shadow_table(table_prefix, shadow)
+
             with self.engine.connect() as conn:
                 trans = conn.begin()
                 try:
-                    sql_query = get_sql_query(f'{table_prefix}_del_stavbe_deduplication.sql')
-                    result = conn.execute(text(sql_query))
-                    logger.info(f"Dedupliciranje {table_prefix}_del_stavbe: ustvarjenih {result.rowcount} dedupliciranih lastnosti")
+                    with timed_phase(logger, f"{table_prefix}_podvojeni", timings):
+                        result = conn.execute(text(get_sql_query(
+                            'dedup_oznaci_podvojene.sql',
+                            tabela=f"core.{shadow}",
+                            del_stavbe=f"core.{table_prefix}_del_stavbe"
+                        )))
+                        logger.info(f"Podvojeni posli med shardi za {table_prefix}: {result.rowcount} nepremičnin")
+
+                    with timed_phase(logger, f"{table_prefix}_energetske_izkaznice", timings):
+                        update_energetske_izkaznice(conn, f"core.{shadow}")
+
+                    # Indeksi se zgradijo po vnosu podatkov
+                    with timed_phase(logger, f"{table_prefix}_indeksi", timings):
+                        clone_indexes_and_constraints(conn, 'core', table, shadow, SHADOW_SUFFIX)
+                        clone_indexes_and_constraints(conn, 'core', link_table, f"{link_table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                        clone_indexes_and_constraints(conn, 'core', building_table, f"{building_table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                        conn.execute(text(f"ANALYZE core.{link_table}{SHADOW_SUFFIX}"))
+                        conn.execute(text(f"ANALYZE core.{building_table}{SHADOW_SUFFIX}"))
+
+                    # Fizična ureditev po GiST indeksu koordinat (bralci senčne tabele še ne vidijo, zato zaklep ne moti)
+                    with timed_phase(logger, f"{table_prefix}_cluster", timings):
+                        conn.execute(text(f"CLUSTER core.{shadow} USING {spatial_index_name(table_prefix)}{SHADOW_SUFFIX}"))
+                        conn.execute(text(f"ANALYZE core.{shadow}"))
+
                     trans.commit()
+                    return inserted, links, buildings
                 except Exception as e:
                     trans.rollback()
-                    logger.error(f"Napaka pri izvrševanju SQL za dedupliciranje: {str(e)}")
+                    logger.error(f"Napaka pri gradnji senčne tabele core.{shadow}: {str(e)}")
                     raise
         except Exception as e:
             logger.error(f"Napaka povezave z bazo podatkov med dedupliciranjem: {str(e)}")
             raise
 
-    def _update_energetske_izkaznice(self):
-        """Posodobi energetske izkaznice v deduplikacijskih tabelah"""
+    def _get_shard_ranges(self, table_prefix: str) -> list:
+        """Vrne obsege sifra_ko za shard-e glede na število delov stavb v posamezni katastrski občini"""
+        with self.engine.connect() as conn:
+            counts = conn.execute(text(f"""
+                SELECT sifra_ko, COUNT(*)
+                FROM core.{table_prefix}_del_stavbe
+                WHERE sifra_ko IS NOT NULL
+                GROUP BY sifra_ko
+                ORDER BY sifra_ko
+            """)).fetchall()
+
+        return split_sifra_ko_ranges([(row[0], row[1]) for row in counts], self.shards)
+
+    def _fill_shadow_table(self, table_prefix: str, shadow: str):
+        """
+        Vzporedno napolni senčno tabelo, senčno tabelo povezav in senčni povzetek stavb po shardih, beleži
+        napredek in čas posameznega sharda ter vrne (število nepremičnin, število povezav, število vrstic stavb)
+        """
+        ranges = self._get_shard_ranges(table_prefix)
+        logger.info(f"Dedupliciranje {table_prefix}_del_stavbe v {len(ranges)} shardih: {ranges}")
+
+        total_rows = 0
+        total_links = 0
+        total_buildings = 0
+        completed = 0
+        with ThreadPoolExecutor(max_workers=max(len(ranges), 1)) as executor:
+            futures = {
+                executor.submit(self._fill_shard, table_prefix, shadow, sifra_ko_od, sifra_ko_do): (i, sifra_ko_od, sifra_ko_do)
+                for i, (sifra_ko_od, sifra_ko_do) in enumerate(ranges, 1)
+            }
+            for future in as_completed(futures):
+                i, sifra_ko_od, sifra_ko_do = futures[future]
+                rows, links, buildings, elapsed = future.result()
+                total_rows += rows
+                total_links += links
+                total_buildings += buildings
+                completed += 1
+                logger.info(
+                    f"Shard {i}/{len(ranges)} ({table_prefix}, sifra_ko {sifra_ko_od}-{sifra_ko_do}): "
+                    f"{rows} lastnosti, {links} povezav in {buildings} vrstic stavb v {elapsed:.2f} s, končanih {completed}/{len(ranges)}"
+                )
+
+        logger.info(f"Dedupliciranje {table_prefix}_del_stavbe: ustvarjenih {total_rows} dedupliciranih lastnosti, "
+                    f"{total_links} povezav in {total_buildings} vrstic stavb v core.{shadow}")
+        return total_rows, total_links, total_buildings
+
+    def _fill_shard(self, table_prefix: str, shadow: str, sifra_ko_od: int, sifra_ko_do: int):
+        """
+        Izvede dedupliciranje, povezave in povzetek stavb za en obseg sifra_ko v lastni transakciji
+        (stavba je vedno v enem obsegu); vrne (število vrstic, število povezav, število vrstic stavb, trajanje v s)
+        """
+        start = time.perf_counter()
+        omejitev = f"AND sifra_ko BETWEEN {int(sifra_ko_od)} AND {int(sifra_ko_do)}"
+        sql_query = get_sql_query(
+            f'{table_prefix}_del_stavbe_deduplication.sql',
+            target_table=f"core.{shadow}",
+            omejitev=omejitev
+        )
+        link_query = get_del_stavbe_posel_query(
+            table_prefix, f"core.{table_prefix}_del_stavbe_posel{SHADOW_SUFFIX}", f"core.{shadow}", omejitev
+        )
+        building_query = get_stavba_query(
+            table_prefix, f"core.{table_prefix}_stavba{SHADOW_SUFFIX}", f"core.{shadow}", omejitev
+        )
+
+        with self.engine.connect() as conn:
+            trans = conn.begin()
+            try:
+                result = conn.execute(text(sql_query))
+                links = conn.execute(text(link_query)).rowcount
+                buildings = conn.execute(text(building_query)).rowcount
+                trans.commit()
+            except Exception as e:
+                trans.rollback()
+                logger.error(f"Napaka v shardu {table_prefix} sifra_ko {sifra_ko_od}-{sifra_ko_do}: {str(e)}")
+                raise
+
+        return result.rowcount, links, buildings, time.perf_counter() - start
+
+    def _swap_shadow_table(self, table_prefix: str, row_count: int, link_count: int, building_count: int):
+        """
+        Zamenja deduplicirano tabelo, tabelo povezav in povzetek stavb s senčnimi tabelami v kratki
+        transakciji in zabeleži njihovo število vrstic.
+        """
+        table = f"{table_prefix}_del_stavbe_deduplicated"
+        link_table = f"{table_prefix}_del_stavbe_posel"
+        building_table = f"{table_prefix}_stavba"
+
         try:
-            logger.info("Posodabljam energetske izkaznice v deduplikacijskih tabelah")
-            
             with self.engine.connect() as conn:
                 trans = conn.begin()
                 try:
-                    sql_query = get_sql_query('dodaj_ei_deduplication.sql')
-                    result = conn.execute(text(sql_query))
-                    logger.info("Energetske izkaznice uspešno posodobljene v vseh deduplikacijskih tabelah")
+                    swap_shadow_table(conn, 'core', table, f"{table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                    record_row_count(conn, 'core', table, row_count)
+                    swap_shadow_table(conn, 'core', link_table, f"{link_table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                    record_row_count(conn, 'core', link_table, link_count)
+                    swap_shadow_table(conn, 'core', building_table, f"{building_table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                    record_row_count(conn, 'core', building_table, building_count)
+
+                    # Celotna tabela je zgrajena na novo, zabeležene spremembe niso več potrebne
+                    conn.execute(text(f"TRUNCATE TABLE core.{table_prefix}_spremenjene_nepremicnine"))
                     trans.commit()
+                    logger.info(f"Senčna tabela zamenjana: core.{table}")
                 except Exception as e:
                     trans.rollback()
-                    logger.error(f"Napaka pri posodabljanju energetskih izkaznic: {str(e)}")
+                    logger.error(f"Napaka pri zamenjavi deduplicirane tabele: {str(e)}")
                     raise
         except Exception as e:
-            logger.error(f"Napaka povezave z bazo podatkov pri posodabljanju energetskih izkaznic: {str(e)}")
+            logger.error(f"Napaka povezave z bazo podatkov pri zamenjavi tabele: {str(e)}")
             raise
     
     def _verify_deduplication_results(self, table_prefix: str):
         """Preveri rezultate dedupliciranja in zabeleži statistike"""
         try:
-            # Preštej deduplicirane lastnosti
-            dedup_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_del_stavbe_deduplicated')
-            
-            # Preštej originalne del_stavbe zapise
-            original_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_del_stavbe')
-            
-            # Preštej originalne posel zapise
-            posel_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_posel')
+            with self.engine.connect() as conn:
+                # Deduplicirane lastnosti
+                dedup_count = get_row_count(conn, 'core', f'{table_prefix}_del_stavbe_deduplicated')
+                
+                # Originalni del_stavbe zapisi
+                original_count = get_row_count(conn, 'core', f'{table_prefix}_del_stavbe')
+                
+                # Originalni posel zapisi
+                posel_count = get_row_count(conn, 'core', f'{table_prefix}_posel')
             
             # Izračunaj razmerje dedupliciranja
             if original_count > 0:
@@ -130,40 +505,45 @@ class DeduplicationService:
             logger.error(f"Napaka pri preverjanju rezultatov dedupliciranja: {str(e)}")
             # Ne sproži napake - to je samo preverjanje
     
-    def create_all_deduplicated_del_stavbe(self, data_types: list = None):
+    def create_all_deduplicated_del_stavbe(self, data_types: list = None, mode: str = "full") -> dict:
         """
-        Ustvari deduplicirane lastnosti za več tipov podatkov.
+        Ustvari deduplicirane lastnosti za več tipov podatkov (tipi se obdelujejo vzporedno).
+        Vrne rezultat za vsak tip podatkov (ob napaki {"error": sporočilo}).
         """
         if data_types is None:
             data_types = ["np", "kpp"]
+
+        if mode == "incremental":
+            return self._run_for_data_types(data_types, self.update_deduplicated_del_stavbe, "inkrementalno dedupliciranje")
         
         logger.info("=" * 60)
         logger.info("ZAČETEK DEDUPLICIRANJA LASTNOSTI")
         logger.info("=" * 60)
         
-        for data_type in data_types:
-            try:
-                logger.info("=" * 50)
-                logger.info(f"Obdelujem dedupliciranje za {data_type.upper()}")
-                self.create_deduplicated_del_stavbe(data_type)
-            except Exception as e:
-                logger.error(f"Neuspešno ustvarjanje dedupliciranih lastnosti za {data_type}: {str(e)}")
-                # Nadaljuj z drugimi tipi podatkov, tudi če eden ne uspe
-                continue
-
-        # Posodobi energetske izkaznice za vse deduplicirane lastnosti na koncu
-        logger.info("=" * 50)
-        logger.info("Posodabljam energetske izkaznice za vse deduplicirane lastnosti")
-        try:
-            self._update_energetske_izkaznice()
-        except Exception as e:
-            logger.error(f"Napaka pri posodabljanju energetskih izkaznic: {str(e)}")
-            # Ne prekinjaj procesa, samo zabeleži napako
-
+        results = self._run_for_data_types(data_types, self.create_deduplicated_del_stavbe, "ustvarjanje dedupliciranih lastnosti")
         
         logger.info("=" * 60)
         logger.info("DEDUPLICIRANJE USPEŠNO ZAKLJUČENO")
         logger.info("=" * 60)
+        return results
+    
+    def _run_for_data_types(self, data_types: list, func, description: str) -> dict:
+        """
+        Vzporedno izvede func za vsak tip podatkov (np in kpp sta neodvisna).
+        Napaka pri enem tipu ne prekine ostalih.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(data_types)) as executor:
+            futures = {executor.submit(func, data_type): data_type for data_type in data_types}
+            for future in as_completed(futures):
+                data_type = futures[future]
+                try:
+                    results[data_type] = future.result()
+                    logger.info(f"Končano {description} za {data_type.upper()}")
+                except Exception as e:
+                    logger.error(f"Neuspešno {description} za {data_type}: {str(e)}")
+                    results[data_type] = {"error": str(e)}
+        return results
     
     def get_deduplication_stats(self, data_type: str = None):
         """
@@ -182,9 +562,10 @@ class DeduplicationService:
                 table_prefix = dt.lower()
                 
                 # Pridobi števila
-                original_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_del_stavbe')
-                posel_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_posel')
-                dedup_count = execute_sql_count(self.engine, 'core', f'{table_prefix}_del_stavbe_deduplicated')
+                with self.engine.connect() as conn:
+                    original_count = get_row_count(conn, 'core', f'{table_prefix}_del_stavbe')
+                    posel_count = get_row_count(conn, 'core', f'{table_prefix}_posel')
+                    dedup_count = get_row_count(conn, 'core', f'{table_prefix}_del_stavbe_deduplicated')
                 
                 # Izračunaj razmerje
                 if original_count > 0:
@@ -1,18 +1,68 @@
 import os
+import time
 import requests
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import tempfile
 from datetime import datetime
 from .logging_utils import setup_logger
 from sqlalchemy import QueuePool, create_engine, text
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import shutil
-from .sql_utils import execute_sql_file, execute_sql_count
+from .sql_utils import get_sql_query, record_row_count, adjust_row_count, get_row_count
 from .database import get_engine
+from .deduplication import update_energetske_izkaznice
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 
 logger = setup_logger("ei_ingestion", "energetska_izkaznica_ingestion.log", "EI")
 
+# Preslikava stolpcev CSV datoteke v stolpce staging tabele
+EI_COLUMN_MAPPING = {
+    'ID energetske izkaznice': 'ei_id',
+    'Datum izdelave': 'datum_izdelave',
+    'Velja do': 'velja_do', 
+    'Šifra KO': 'sifra_ko',
+    'Številka stavbe': 'stevilka_stavbe',
+    'Številka dela stavbe': 'stevilka_dela_stavbe',
+    'Tip izkaznice': 'tip_izkaznice',
+    'Potrebna toplota za ogrevanje': 'potrebna_toplota_ogrevanje',
+    'Dovedena energija za delovanje stavbe': 'dovedena_energija_delovanje',
+    'Celotna energija': 'celotna_energija',
+    'Dovedena električna energija': 'dovedena_elektricna_energija',
+    'Primarna energija': 'primarna_energija',
+    'Emisije CO2': 'emisije_co2',
+    'Kondicionirana površina stavbe': 'kondicionirana_povrsina',
+    'Energijski razred': 'energijski_razred',
+    'EPBD': 'epbd_tip'
+}
+
+# Števila v slovenskem zapisu (1.234,56) in datumi (dd.mm.yyyy) se berejo kot besedilo
+# in pretvorijo v vektoriziranem koraku
+EI_NUMERIC_COLUMNS = [
+    'Potrebna toplota za ogrevanje',
+    'Dovedena energija za delovanje stavbe', 
+    'Celotna energija',
+    'Dovedena električna energija',
+    'Primarna energija',
+    'Emisije CO2',
+    'Kondicionirana površina stavbe'
+]
+EI_DATE_COLUMNS = ['Datum izdelave', 'Velja do']
+EI_INTEGER_COLUMNS = ['Šifra KO', 'Številka stavbe', 'Številka dela stavbe']
+
+EI_PARSERS = ["arrow", "pandas"]
+
+# full: zamenjava celotne core tabele, incremental: zapis samo spremenjenih izkaznic
+EI_MODES = ["full", "incremental"]
+
 
 class EnergetskaIzkaznicaIngestionService:
     def __init__(self):
@@ -88,24 +138,14 @@ class EnergetskaIzkaznicaIngestionService:
             df = df[df['ID energetske izkaznice'].notna()]
             
             
-            numeric_columns = [
-                'Potrebna toplota za ogrevanje',
-                'Dovedena energija za delovanje stavbe', 
-                'Celotna energija',
-                'Dovedena električna energija',
-                'Primarna energija',
-                'Emisije CO2',
-                'Kondicionirana površina stavbe'
-            ]
-            for col in numeric_columns:
+            for col in EI_NUMERIC_COLUMNS:
                 if col in df.columns:
                     df[col] = df[col].astype(str).str.replace('.', '', regex=False)
                     df[col] = df[col].astype(str).str.replace(',', '.', regex=False)
                     df[col] = pd.to_numeric(df[col], errors='coerce')
             
 
-            date_columns = ['Datum izdelave', 'Velja do']
-            for col in date_columns:
+            for col in EI_DATE_COLUMNS:
                 if col in df.columns:
                     df[col] = pd.to_datetime(df[col], format='%d.%m.%Y', errors='coerce')
             
@@ -119,36 +159,120 @@ class EnergetskaIzkaznicaIngestionService:
             logger.error(f"Napaka pri čiščenju podatkov: {str(e)}")
             raise
 
+    @staticmethod
+    def parse_slovenian_number(values: pa.Array) -> pa.Array:
+        """Pretvori besedila v slovenskem zapisu (1.234,56) v float64; neveljavne vrednosti postanejo NULL."""
+        values = pc.utf8_trim_whitespace(values)
+        values = pc.replace_substring(values, '.', '')
+        values = pc.replace_substring(values, ',', '.')
+        valid = pc.match_substring_regex(values, r'^-?[0-9]+(\.[0-9]+)?$')
+        return pc.cast(pc.if_else(valid, values, pa.scalar(None, pa.string())), pa.float64())
+
+    @staticmethod
+    def parse_slovenian_date(values: pa.Array) -> pa.Array:
+        """Pretvori datume oblike dd.mm.yyyy v date32; neveljavne vrednosti postanejo NULL."""
+        values = pc.utf8_trim_whitespace(values)
+        timestamps = pc.strptime(values, format='%d.%m.%Y', unit='s', error_is_null=True)
+        # strptime neobstoječe datume (npr. 31.02.) prenese v naslednji mesec, zato preverimo dan in mesec
+        parts = pc.extract_regex(values, r'^(?P<dan>[0-9]{1,2})\.(?P<mesec>[0-9]{1,2})\.')
+        valid = pc.and_(
+            pc.equal(pc.day(timestamps), pc.cast(pc.struct_field(parts, 'dan'), pa.int64())),
+            pc.equal(pc.month(timestamps), pc.cast(pc.struct_field(parts, 'mesec'), pa.int64()))
+        )
+        return pc.cast(pc.if_else(valid, timestamps, pa.scalar(None, timestamps.type)), pa.date32())
+
+    def read_csv_arrow(self, csv_path: str) -> pd.DataFrame:
+        """
+        Prebere in počisti CSV z Arrow bralnikom.
+
+        Shema je določena vnaprej (samo stolpci iz EI_COLUMN_MAPPING), prazna polja se berejo kot NULL,
+        števila in datumi v slovenskem zapisu pa se pretvorijo vektorizirano nad Arrow stolpci.
+        Vrne DataFrame z imeni stolpcev staging tabele.
+        """
+        # Imena stolpcev v glavi so lahko obdana s presledki, zato jih poiščemo v prvi vrstici
+        with open(csv_path, 'r', encoding='utf-8-sig') as f:
+            header = f.readline().rstrip('\r\n').split('|')
+        raw_names = {name.strip(): name for name in header}
+
+        missing = [col for col in EI_COLUMN_MAPPING if col not in raw_names]
+        if missing:
+            raise Exception(f"Manjkajoči stolpci v CSV: {', '.join(missing)}")
+
+        column_types = {
+            raw_names[col]: pa.int32() if col in EI_INTEGER_COLUMNS else pa.string()
+            for col in EI_COLUMN_MAPPING
+        }
+
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(encoding='utf-8'),
+            parse_options=pa_csv.ParseOptions(delimiter='|'),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=list(column_types.keys()),
+                null_values=[''],
+                strings_can_be_null=True
+            )
+        )
+        logger.info(f"Prebrano {table.num_rows} vrstic iz CSV (arrow)")
+
+        table = table.rename_columns([EI_COLUMN_MAPPING[name.strip()] for name in table.column_names])
+        table = table.filter(pc.is_valid(table['ei_id']))
+
+        for col in EI_NUMERIC_COLUMNS:
+            name = EI_COLUMN_MAPPING[col]
+            table = table.set_column(table.schema.get_field_index(name), name, self.parse_slovenian_number(table[name]))
+
+        for col in EI_DATE_COLUMNS:
+            name = EI_COLUMN_MAPPING[col]
+            table = table.set_column(table.schema.get_field_index(name), name, self.parse_slovenian_date(table[name]))
+
+        logger.info(f"Po filtriranju veljavnih ID-jev: {table.num_rows}")
+
+        return table.select(list(EI_COLUMN_MAPPING.values())).to_pandas()
+
+    def read_csv_pandas(self, csv_path: str) -> pd.DataFrame:
+        """Prebere CSV s pandas in ga počisti s clean_data (prejšnji način branja)."""
+        df = pd.read_csv(csv_path, delimiter='|', encoding='utf-8', low_memory=False)
+        logger.info(f"Prebrano {len(df)} vrstic iz CSV")
+
+        df_clean = self.clean_data(df)
+        return df_clean.rename(columns=EI_COLUMN_MAPPING)[list(EI_COLUMN_MAPPING.values())]
+
+    def read_and_clean(self, csv_path: str, parser: str = "arrow") -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Prebere in počisti CSV ter zabeleži hitrost branja (vrstice/s) in največjo porabo pomnilnika."""
+        if parser not in EI_PARSERS:
+            raise ValueError(f"Neznan parser: {parser}")
+
+        pool = pa.default_memory_pool()
+        start = time.perf_counter()
+
+        if parser == "arrow":
+            df = self.read_csv_arrow(csv_path)
+        else:
+            df = self.read_csv_pandas(csv_path)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "parser": parser,
+            "rows": len(df),
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(len(df) / elapsed) if elapsed > 0 else None,
+            "arrow_peak_memory_mb": round(pool.max_memory() / 1024 ** 2, 1) if pool.max_memory() else None,
+            # ru_maxrss je na Linuxu v KB - največja poraba celotnega procesa
+            "process_peak_memory_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None
+        }
+        logger.info(f"Branje CSV ({parser}): {stats['rows']} vrstic v {stats['seconds']} s "
+                    f"({stats['rows_per_second']} vrstic/s), največ pomnilnika: arrow {stats['arrow_peak_memory_mb']} MB, "
+                    f"proces {stats['process_peak_memory_mb']} MB")
+
+        return df, stats
+
     def import_to_staging(self, df: pd.DataFrame) -> int:
-        """Uvozi podatke v staging tabelo."""
+        """Uvozi podatke (s stolpci staging tabele) v staging tabelo."""
         try:
             logger.info(f"Uvažanje {len(df)} zapisov v staging tabelo")
             
-            column_mapping = {
-                'ID energetske izkaznice': 'ei_id',
-                'Datum izdelave': 'datum_izdelave',
-                'Velja do': 'velja_do', 
-                'Šifra KO': 'sifra_ko',
-                'Številka stavbe': 'stevilka_stavbe',
-                'Številka dela stavbe': 'stevilka_dela_stavbe',
-                'Tip izkaznice': 'tip_izkaznice',
-                'Potrebna toplota za ogrevanje': 'potrebna_toplota_ogrevanje',
-                'Dovedena energija za delovanje stavbe': 'dovedena_energija_delovanje',
-                'Celotna energija': 'celotna_energija',
-                'Dovedena električna energija': 'dovedena_elektricna_energija',
-                'Primarna energija': 'primarna_energija',
-                'Emisije CO2': 'emisije_co2',
-                'Kondicionirana površina stavbe': 'kondicionirana_povrsina',
-                'Energijski razred': 'energijski_razred',
-                'EPBD': 'epbd_tip'
-            }
-            
-            df_renamed = df.rename(columns=column_mapping)
-            
-            # Obdrži samo stolpce ki obstajajo v tabeli
-            table_columns = list(column_mapping.values())
-            df_final = df_renamed[table_columns].copy()
-            
             # Počisti staging tabelo in vstavi nove podatke
             with self.engine.connect() as conn:
                 trans = conn.begin()
@@ -157,7 +281,7 @@ class EnergetskaIzkaznicaIngestionService:
                     truncate_sql = "TRUNCATE TABLE staging.energetska_izkaznica;"
                     conn.execute(text(truncate_sql))
                     
-                    df_final.to_sql(
+                    df.to_sql(
                         name='energetska_izkaznica',
                         schema='staging',
                         con=conn,
@@ -167,9 +291,10 @@ class EnergetskaIzkaznicaIngestionService:
                         method='multi'
                     )
 
+                    staging_count = len(df)
+                    record_row_count(conn, 'staging', 'energetska_izkaznica', staging_count)
                     trans.commit()
                     
-                    staging_count = execute_sql_count(self.engine, 'staging', 'energetska_izkaznica')
                     logger.info(f"Uspešno naloženih {staging_count} zapisov v staging tabelo")
                     
                     return staging_count
@@ -188,7 +313,8 @@ class EnergetskaIzkaznicaIngestionService:
         try:
             logger.info("Zamenjava celotne core tabele z novimi podatki")
             
-            staging_count = execute_sql_count(self.engine, 'staging', 'energetska_izkaznica')
+            with self.engine.connect() as conn:
+                staging_count = get_row_count(conn, 'staging', 'energetska_izkaznica')
             
             if staging_count == 0:
                 logger.warning("Staging tabela je prazna! Ne morem nadaljevati s transformacijo.")
@@ -196,10 +322,18 @@ class EnergetskaIzkaznicaIngestionService:
             
             logger.info(f"Zamenjavanje core tabele z {staging_count} zapisi iz staging tabele")
             
-            # Izvedi SQL skripto za zamenjavo tabele
-            execute_sql_file(self.engine, 'ei_insert.sql')
+            # Izvedi SQL skripto za zamenjavo tabele (TRUNCATE + INSERT, rowcount je število vstavljenih vrstic)
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    core_count = conn.execute(text(get_sql_query('ei_insert.sql'))).rowcount
+                    record_row_count(conn, 'core', 'energetska_izkaznica', core_count)
+                    trans.commit()
+                except Exception as e:
+                    trans.rollback()
+                    logger.error(f"SQL napaka pri izvajanju ei_insert.sql: {str(e)}")
+                    raise
                     
-            core_count = execute_sql_count(self.engine, 'core', 'energetska_izkaznica')
             logger.info(f"Uspešno zamenjanih {core_count} zapisov v core tabeli")
             
             return core_count
@@ -208,6 +342,57 @@ class EnergetskaIzkaznicaIngestionService:
             logger.error(f"Napaka pri transformaciji v core tabelo: {str(e)}")
             raise
 
+    def sync_incremental(self) -> Dict[str, int]:
+        """
+        Zapiše samo razlike med staging in core tabelo izkaznic.
+
+        Izkaznice se primerjajo po ei_id in zgoščeni vrednosti vseh vrstic izkaznice. Novi, spremenjeni
+        in izbrisani ei_id se zapišejo v core tabelo, nato se v isti transakciji posodobijo
+        energetske_izkaznice/energijski_razred v dedupliciranih tabelah samo za prizadete stavbe.
+        """
+        try:
+            with self.engine.connect() as conn:
+                staging_count = get_row_count(conn, 'staging', 'energetska_izkaznica')
+
+            if staging_count == 0:
+                logger.warning("Staging tabela je prazna! Ne morem nadaljevati s sinhronizacijo.")
+                return {"inserted": 0, "updated": 0, "deleted": 0, "buildings": 0}
+
+            logger.info(f"Inkrementalna sinhronizacija {staging_count} zapisov iz staging tabele")
+
+            with self.engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    conn.execute(text(get_sql_query('ei_incremental_sync.sql')))
+
+                    changes = {"inserted": 0, "updated": 0, "deleted": 0}
+                    for sprememba, count in conn.execute(text(
+                        "SELECT sprememba, COUNT(*) FROM ei_spremenjene GROUP BY sprememba"
+                    )).fetchall():
+                        changes[sprememba] = count
+
+                    adjust_row_count(conn, 'core', 'energetska_izkaznica', changes["inserted"] - changes["deleted"])
+
+                    changes["buildings"] = conn.execute(text("SELECT COUNT(*) FROM ei_spremenjene_stavbe")).scalar()
+                    logger.info(f"Spremembe izkaznic: novih {changes['inserted']}, spremenjenih {changes['updated']}, "
+                                f"izbrisanih {changes['deleted']}, prizadetih stavb {changes['buildings']}")
+
+                    if changes["buildings"] > 0:
+                        for table_prefix in ["np", "kpp"]:
+                            update_energetske_izkaznice(conn, f"core.{table_prefix}_del_stavbe_deduplicated", only_changed_buildings=True)
+
+                    trans.commit()
+                    return changes
+
+                except Exception as e:
+                    trans.rollback()
+                    logger.error(f"Napaka pri inkrementalni sinhronizaciji: {str(e)}")
+                    raise
+
+        except Exception as e:
+            logger.error(f"Napaka pri inkrementalni sinhronizaciji izkaznic: {str(e)}")
+            raise
+
     def cleanup(self, file_path: str):
         """Počisti začasne datoteke."""
         try:
@@ -217,26 +402,44 @@ class EnergetskaIzkaznicaIngestionService:
         except Exception as e:
             logger.warning(f"Napaka pri čiščenju: {str(e)}")
 
-    def run_ingestion(self, url: str = None) -> Dict[str, Any]:
+    def run_ingestion(self, url: str = None, parser: str = "arrow", mode: str = "full") -> Dict[str, Any]:
         """Zaženi celoten proces uvoza energetskih izkaznic."""
         csv_path = None
         try:
             logger.info("=" * 60)
             logger.info("ZAČETEK UVOZA ENERGETSKIH IZKAZNIC")
             logger.info("=" * 60)
+
+            if mode not in EI_MODES:
+                raise ValueError(f"Neznan način uvoza: {mode}")
             
             csv_path = self.download_csv(url)
+            downloaded_bytes = os.path.getsize(csv_path)
             
             logger.info("Branje CSV datoteke...")
-            df = pd.read_csv(csv_path, delimiter='|', encoding='utf-8', low_memory=False)
-            logger.info(f"Prebrano {len(df)} vrstic iz CSV")
-            
-            df_clean = self.clean_data(df)
+            df_clean, parse_stats = self.read_and_clean(csv_path, parser)
             
             logger.info("=" * 50)
             staging_count = self.import_to_staging(df_clean)
             
             logger.info("=" * 50)
+            if mode == "incremental":
+                changes = self.sync_incremental()
+                self.cleanup(csv_path)
+
+                logger.info("=" * 60)
+                logger.info("INKREMENTALNI UVOZ ENERGETSKIH IZKAZNIC USPEŠNO ZAKLJUČEN")
+                logger.info("=" * 60)
+
+                return {
+                    "status": "success",
+                    "message": f"Sinhroniziranih {changes['inserted'] + changes['updated'] + changes['deleted']} spremenjenih energetskih izkaznic",
+                    "changes": changes,
+                    "staging_records": staging_count,
+                    "bytes": downloaded_bytes,
+                    "parse_stats": parse_stats
+                }
+
             core_count = self.transform_to_core()
             
             self.cleanup(csv_path)
@@ -249,7 +452,9 @@ class EnergetskaIzkaznicaIngestionService:
                 "status": "success",
                 "message": f"Uspešno uvoženih {core_count} energetskih izkaznic",
                 "records_imported": core_count,
-                "staging_records": staging_count
+                "staging_records": staging_count,
+                "bytes": downloaded_bytes,
+                "parse_stats": parse_stats
             }
             
         except Exception as e:
@@ -0,0 +1,163 @@
+import json
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from typing import Dict, Any, Optional
+
+from .database import get_engine
+from .logging_utils import setup_logger
+from .pipeline import STATUS_V_TEKU, STATUS_USPESNO, STATUS_NAPAKA
+
+logger = setup_logger("pipeline", "pipeline.log", "PIPELINE")
+
+# Status opravila, ki še čaka na worker (ostali statusi so enaki kot pri zagonih pipeline-a)
+STATUS_CAKAJOCE = "cakajoce"
+
+# Ključ advisory zaklepa, pod katerim worker izvaja opravila (skupne staging in core tabele)
+PIPELINE_LOCK_ID = 72410001
+
+
+def enqueue_job(vrsta: str, parametri: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Vpiše opravilo v čakalno vrsto pipeline.opravilo in vrne {'opravilo_id', 'novo'}.
+    Če enako opravilo (vrsta in parametri) že čaka, se vrne obstoječe opravilo.
+    """
+    parametri_json = json.dumps(parametri or {}, sort_keys=True, default=str)
+    try:
+        with get_engine().connect() as conn:
+            opravilo_id = conn.execute(text("""
+                INSERT INTO pipeline.opravilo (vrsta, parametri, status)
+                VALUES (:vrsta, CAST(:parametri AS JSONB), :status)
+                ON CONFLICT (vrsta, parametri) WHERE status = 'cakajoce' DO NOTHING
+                RETURNING opravilo_id
+            """), {"vrsta": vrsta, "parametri": parametri_json, "status": STATUS_CAKAJOCE}).scalar()
+            novo = opravilo_id is not None
+
+            if not novo:
+                opravilo_id = conn.execute(text("""
+                    SELECT opravilo_id FROM pipeline.opravilo
+                    WHERE vrsta = :vrsta AND parametri = CAST(:parametri AS JSONB) AND status = :status
+                """), {"vrsta": vrsta, "parametri": parametri_json, "status": STATUS_CAKAJOCE}).scalar()
+            conn.commit()
+
+        logger.info(f"Opravilo {opravilo_id} ({vrsta}) {'vpisano v čakalno vrsto' if novo else 'že čaka v čakalni vrsti'}")
+        return {"opravilo_id": opravilo_id, "novo": novo}
+
+    except Exception as e:
+        logger.error(f"Napaka pri vpisu opravila {vrsta}: {str(e)}")
+        raise
+
+
+@contextmanager
+def pipeline_lock(engine):
+    """
+    Poskusi pridobiti advisory zaklep pipeline-a na lastni povezavi in vrne, ali je bil pridobljen.
+    Zaklep velja do konca bloka; ob prekinitvi procesa ga baza sprosti skupaj s povezavo.
+    """
+    conn = engine.connect()
+    try:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": PIPELINE_LOCK_ID}).scalar()
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": PIPELINE_LOCK_ID})
+                conn.commit()
+    finally:
+        conn.close()
+
+
+def claim_next_job(engine) -> Optional[Dict[str, Any]]:
+    """
+    Prevzame najstarejše čakajoče opravilo (FOR UPDATE SKIP LOCKED) in ga označi kot v teku.
+    Klic mora biti pod zaklepom pipeline-a: opravila v teku so takrat ostanki prekinjenega workerja
+    in se označijo kot neuspešna (njihov zagon se lahko nadaljuje z resume_zagon_id).
+    """
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            orphaned = conn.execute(text("""
+                UPDATE pipeline.opravilo
+                SET status = :napaka, konec = NOW(), napaka = 'Worker je bil prekinjen med izvajanjem opravila'
+                WHERE status = :v_teku
+            """), {"napaka": STATUS_NAPAKA, "v_teku": STATUS_V_TEKU}).rowcount
+            if orphaned:
+                logger.warning(f"Označenih {orphaned} prekinjenih opravil kot neuspešnih")
+
+            row = conn.execute(text("""
+                UPDATE pipeline.opravilo
+                SET status = :v_teku, zacetek = NOW()
+                WHERE opravilo_id = (
+                    SELECT opravilo_id
+                    FROM pipeline.opravilo
+                    WHERE status = :cakajoce
+                    ORDER BY ustvarjeno
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING opravilo_id, vrsta, parametri
+            """), {"v_teku": STATUS_V_TEKU, "cakajoce": STATUS_CAKAJOCE}).fetchone()
+            trans.commit()
+        except Exception as e:
+            trans.rollback()
+            logger.error(f"Napaka pri prevzemu opravila: {str(e)}")
+            raise
+
+    if row is None:
+        return None
+    return {"opravilo_id": row[0], "vrsta": row[1], "parametri": row[2] or {}}
+
+
+def finish_job(engine, opravilo_id: int, rezultat: Optional[Dict[str, Any]], napaka: Optional[str] = None):
+    """Zapiše izid opravila; opravilo je uspešno, če je rezultat zagona pipeline-a uspešen."""
+    uspesno = napaka is None and rezultat is not None and rezultat.get("status") == "success"
+    if napaka is None and not uspesno and rezultat is not None:
+        napaka = rezultat.get("message")
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            UPDATE pipeline.opravilo
+            SET status = :status, konec = NOW(), zagon_id = :zagon_id, rezultat = CAST(:rezultat AS JSONB), napaka = :napaka
+            WHERE opravilo_id = :opravilo_id
+        """), {
+            "status": STATUS_USPESNO if uspesno else STATUS_NAPAKA,
+            "zagon_id": (rezultat or {}).get("zagon_id"),
+            "rezultat": json.dumps(rezultat, default=str) if rezultat is not None else None,
+            "napaka": napaka,
+            "opravilo_id": opravilo_id
+        })
+        conn.commit()
+
+
+def get_job(opravilo_id: int) -> Optional[Dict[str, Any]]:
+    """Vrne stanje opravila (in položaj v čakalni vrsti, če še čaka) ali None, če ne obstaja."""
+    with get_engine().connect() as conn:
+        row = conn.execute(text("""
+            SELECT
+                o.opravilo_id, o.vrsta, o.parametri, o.status, o.ustvarjeno, o.zacetek, o.konec,
+                o.zagon_id, o.rezultat, o.napaka,
+                CASE WHEN o.status = :cakajoce THEN (
+                    SELECT COUNT(*) FROM pipeline.opravilo c
+                    WHERE c.status = :cakajoce AND c.ustvarjeno < o.ustvarjeno
+                ) END AS pred_v_vrsti
+            FROM pipeline.opravilo o
+            WHERE o.opravilo_id = :opravilo_id
+        """), {"opravilo_id": opravilo_id, "cakajoce": STATUS_CAKAJOCE}).fetchone()
+
+    if row is None:
+        return None
+
+    return {
+        "opravilo_id": row.opravilo_id,
+        "vrsta": row.vrsta,
+        "parametri": row.parametri,
+        "status": row.status,
+        "ustvarjeno": row.ustvarjeno.isoformat() if row.ustvarjeno else None,
+        "zacetek": row.zacetek.isoformat() if row.zacetek else None,
+        "konec": row.konec.isoformat() if row.konec else None,
+        "zagon_id": row.zagon_id,
+        "pred_v_vrsti": row.pred_v_vrsti,
+        "rezultat": row.rezultat,
+        "napaka": row.napaka
+    }
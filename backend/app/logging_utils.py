@@ -1,6 +1,8 @@
 import logging
 import sys
-from typing import Optional
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
 
 
 class PrefixFilter(logging.Filter):
@@ -99,4 +101,23 @@ def get_logger_for_context(context_name: str) -> logging.Logger:
     Returns:
         Logger instance for the context
     """
-    return logging.getLogger(context_name)
\ No newline at end of file
+    return logging.getLogger(context_name)
+
+@contextmanager
+def timed_phase(logger: logging.Logger, phase: str, timings: Optional[Dict[str, float]] = None):
+    """
+    Measure the duration of a processing phase and log it.
+
+    Args:
+        logger: Logger used for the timing message
+        phase: Phase name (e.g., 'staging', 'core')
+        timings: Optional dict where the duration in seconds is stored under the phase name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[phase] = round(timings.get(phase, 0) + elapsed, 3)
+        logger.info(f"Faza '{phase}' trajala {elapsed:.2f} s")
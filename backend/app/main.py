@@ -1,10 +1,5 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
-
-import pytz
-from apscheduler.triggers.cron import CronTrigger
-from .scheduler import scheduler, weekly_update
 
 from .routes import (
     fill_deduplicated_tables,
@@ -13,31 +8,29 @@ from .routes import (
     ingest_energetske_izkaznice, 
     posodobi_statistike, 
     splosne_statistike, 
+    obdobje_statistike,
+    statistike_bbox,
+    statistike_poligon,
+    choropleth_statistike,
+    batch_statistike,
     vse_obcine_posli_zadnjih_12m,
     vse_obcine_cene_m2_zadnjih_12m,  
     vse_statistike, 
     get_del_stavbe_geojson, 
     get_cluster_del_stavbe, 
-    get_del_stavbe_details
+    get_del_stavbe_details,
+    zazeni_tedensko_posodobitev,
+    pipeline_zagoni,
+    pipeline_opravilo
 )
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    scheduler.add_job(
-        weekly_update,
-        trigger=CronTrigger(day_of_week="sat", hour=4, minute=0, timezone=pytz.timezone("Europe/Ljubljana")),
-        id="weekly_update",
-        replace_existing=True,
-    )
-    scheduler.start()
-    yield
-    scheduler.shutdown()
+# Vnos podatkov in tedensko posodabljanje izvaja ločen worker proces (python -m app.worker),
+# API endpointi opravila samo vpišejo v čakalno vrsto pipeline.opravilo
 
 app = FastAPI(
     title="Domogled API",
     description="API za spletno stran Domogled, vnos podatkov in geojson plast ki grupira dele stavb (najemne ali kupoprodajne)",
-    version="0.1.0",
-    lifespan=lifespan
+    version="0.1.0"
 )
 
 # CORS middleware
@@ -62,10 +55,19 @@ app.post("/api/deduplication/ingest")(fill_deduplicated_tables)
 
 app.post("/api/energetske-izkaznice/ingest")(ingest_energetske_izkaznice)
 
+app.post("/api/pipeline/tedenska-posodobitev")(zazeni_tedensko_posodobitev)
+app.get("/api/pipeline/runs")(pipeline_zagoni)
+app.get("/api/pipeline/opravila/{opravilo_id}")(pipeline_opravilo)
+
 app.post("/api/statistike/posodobi")(posodobi_statistike)
 
 app.get("/api/statistike/vse/{tip_regije}/{regija}")(vse_statistike)
 app.get("/api/statistike/splosne/{tip_regije}/{regija}")(splosne_statistike)
+app.get("/api/statistike/obdobje/{tip_regije}/{regija}")(obdobje_statistike)
+app.get("/api/statistike/bbox")(statistike_bbox)
+app.post("/api/statistike/poligon")(statistike_poligon)
+app.get("/api/statistike/choropleth")(choropleth_statistike)
+app.post("/api/statistike/batch")(batch_statistike)
 app.get("/api/statistike/vse-obcine-posli-zadnjih-12m")(vse_obcine_posli_zadnjih_12m)
 app.get("/api/statistike/vse-obcine-cene-m2-zadnjih-12m")(vse_obcine_cene_m2_zadnjih_12m)  
 
@@ -75,8 +75,7 @@ class NpDelStavbeDeduplicated(Base):
     zadnje_leto = Column(SmallInteger)
     zadnje_stevilo_delov_stavb = Column(SmallInteger)
 
-    povezani_del_stavbe_ids = Column(ARRAY(Integer), nullable=False)
-    povezani_posel_ids = Column(ARRAY(Integer), nullable=False)
+    stevilo_poslov = Column(Integer, nullable=False)
     najnovejsi_del_stavbe_id = Column(Integer, nullable=False)
     
     energetske_izkaznice = Column(ARRAY(Integer))
@@ -85,6 +84,41 @@ class NpDelStavbeDeduplicated(Base):
     coordinates = Column(Geometry('Point', 4326), nullable=False)
 
 
+class NpDelStavbePosel(Base):
+    __tablename__ = "np_del_stavbe_posel"
+    __table_args__ = {"schema": "core"}
+
+    dedup_id = Column(Integer, primary_key=True)
+    del_stavbe_id = Column(Integer, primary_key=True)
+    posel_id = Column(Integer, nullable=False)
+    datum = Column(Date)
+    cena = Column(Numeric(20, 2))
+
+
+class NpStavba(Base):
+    __tablename__ = "np_stavba"
+    __table_args__ = {"schema": "core"}
+
+    sifra_ko = Column(SmallInteger, primary_key=True)
+    stevilka_stavbe = Column(Integer, primary_key=True)
+    zadnje_leto = Column(SmallInteger, primary_key=True)
+    obcina = Column(String(102))
+
+    stevilo_enot = Column(Integer, nullable=False)
+    del_stavbe_id = Column(Integer, nullable=False)
+
+    min_cena = Column(Numeric(20, 2))
+    max_cena = Column(Numeric(20, 2))
+    povprecna_cena = Column(Numeric(20, 2))
+    stevilo_cen = Column(Integer, nullable=False)
+    min_povrsina = Column(Numeric(10, 2))
+    max_povrsina = Column(Numeric(10, 2))
+    povprecna_povrsina = Column(Numeric(10, 2))
+    stevilo_povrsin = Column(Integer, nullable=False)
+
+    centroid = Column(Geometry('Point', 4326), nullable=False)
+
+
 class NpPosel(Base):
     __tablename__ = "np_posel"
     __table_args__ = {"schema": "core"}
@@ -190,8 +224,7 @@ class KppDelStavbeDeduplicated(Base):
     zadnje_leto = Column(SmallInteger)
     zadnje_stevilo_delov_stavb = Column(SmallInteger)
     
-    povezani_del_stavbe_ids = Column(ARRAY(Integer), nullable=False)
-    povezani_posel_ids = Column(ARRAY(Integer), nullable=False)
+    stevilo_poslov = Column(Integer, nullable=False)
     najnovejsi_del_stavbe_id = Column(Integer, nullable=False)
 
     energetske_izkaznice = Column(ARRAY(Integer))
@@ -200,6 +233,41 @@ class KppDelStavbeDeduplicated(Base):
     coordinates = Column(Geometry('Point', 4326), nullable=False)
 
 
+class KppDelStavbePosel(Base):
+    __tablename__ = "kpp_del_stavbe_posel"
+    __table_args__ = {"schema": "core"}
+
+    dedup_id = Column(Integer, primary_key=True)
+    del_stavbe_id = Column(Integer, primary_key=True)
+    posel_id = Column(Integer, nullable=False)
+    datum = Column(Date)
+    cena = Column(Numeric(20, 2))
+
+
+class KppStavba(Base):
+    __tablename__ = "kpp_stavba"
+    __table_args__ = {"schema": "core"}
+
+    sifra_ko = Column(SmallInteger, primary_key=True)
+    stevilka_stavbe = Column(Integer, primary_key=True)
+    zadnje_leto = Column(SmallInteger, primary_key=True)
+    obcina = Column(String(102))
+
+    stevilo_enot = Column(Integer, nullable=False)
+    del_stavbe_id = Column(Integer, nullable=False)
+
+    min_cena = Column(Numeric(20, 2))
+    max_cena = Column(Numeric(20, 2))
+    povprecna_cena = Column(Numeric(20, 2))
+    stevilo_cen = Column(Integer, nullable=False)
+    min_povrsina = Column(Numeric(10, 2))
+    max_povrsina = Column(Numeric(10, 2))
+    povprecna_povrsina = Column(Numeric(10, 2))
+    stevilo_povrsin = Column(Integer, nullable=False)
+
+    centroid = Column(Geometry('Point', 4326), nullable=False)
+
+
 class KppPosel(Base):
     __tablename__ = "kpp_posel"
     __table_args__ = {"schema": "core"}
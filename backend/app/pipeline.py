@@ -0,0 +1,688 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import text
+from typing import Dict, Any, List, Optional, Callable
+
+from .database import get_engine
+from .logging_utils import setup_logger
+
+logger = setup_logger("pipeline", "pipeline.log", "PIPELINE")
+
+# Statusi zagonov in faz v pipeline.zagon / pipeline.faza
+STATUS_V_TEKU = "v_teku"
+STATUS_USPESNO = "uspesno"
+STATUS_PRESKOCENO = "preskoceno"
+STATUS_NAPAKA = "napaka"
+STATUS_BLOKIRANO = "blokirano"
+
+# Faze s temi statusi so končane in se pri nadaljevanju zagona ne izvajajo ponovno
+KONCANI_STATUSI = [STATUS_USPESNO, STATUS_PRESKOCENO]
+
+# Ime pipeline-a tedenske posodobitve (in vrsta opravila v čakalni vrsti)
+WEEKLY_PIPELINE = "tedenska_posodobitev"
+
+# Prenesene datoteke ostanejo na stalni poti (ena na tip podatkov in leto), da jih lahko nadaljevani zagon ponovno uporabi
+PIPELINE_DATA_DIR = os.path.join(tempfile.gettempdir(), "domogled_pipeline")
+
+
+class PipelineStage:
+    """
+    Faza pipeline-a.
+
+    Args:
+        name: Enolično ime faze (npr. 'core_np_2024')
+        func: Funkcija (sync ali async), ki prejme slovar rezultatov odvisnih faz {ime: rezultat} in vrne
+              slovar z rezultatom. Ključi 'vrstice_prebrane', 'vrstice_zapisane' in 'bajti' so metrike faze,
+              ključ 'odtis' pa izhodni odtis faze (privzeto enak vhodnemu odtisu).
+        depends_on: Imena faz, ki morajo biti uspešno končane pred to fazo (njihovi rezultati in odtisi so vhod faze)
+        after: Imena faz, ki morajo biti končane pred to fazo, a niso njen vhod (samo vrstni red, npr. skupne staging tabele)
+        always_run: Faza se nikoli ne preskoči (npr. prenos, ki šele določi odtis podatkov)
+        params: Parametri faze, ki so del vhodnega odtisa
+    """
+
+    def __init__(self, name: str, func: Callable, depends_on: List[str] = None, after: List[str] = None,
+                 always_run: bool = False, params: Dict[str, Any] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on or []
+        self.after = after or []
+        self.always_run = always_run
+        self.params = params or {}
+
+
+def validate_stages(stages: List[PipelineStage]) -> List[str]:
+    """
+    Preveri odvisnosti faz in vrne imena faz v topološkem vrstnem redu.
+    Ob podvojenem imenu, neznani odvisnosti ali ciklu sproži ValueError.
+    """
+    names = [stage.name for stage in stages]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Podvojena imena faz: {sorted(n for n in set(names) if names.count(n) > 1)}")
+
+    remaining = {stage.name: set(stage.depends_on) | set(stage.after) for stage in stages}
+    for name, depends_on in remaining.items():
+        unknown = depends_on - set(names)
+        if unknown:
+            raise ValueError(f"Faza {name} je odvisna od neznanih faz: {sorted(unknown)}")
+
+    order = []
+    while remaining:
+        ready = [name for name in names if name in remaining and not remaining[name]]
+        if not ready:
+            raise ValueError(f"Cikel v odvisnostih faz: {sorted(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for depends_on in remaining.values():
+            depends_on.difference_update(ready)
+
+    return order
+
+
+def stage_metrics(rezultat: Optional[Dict[str, Any]], elapsed: Optional[float]) -> Dict[str, Any]:
+    """
+    Vrne metrike faze iz njenega rezultata. Prepustnost (vrstic/s) se izračuna iz prebranih vrstic,
+    če jih faza ne poroča, pa iz zapisanih.
+    """
+    rezultat = rezultat or {}
+    metrics = {
+        "vrstice_prebrane": rezultat.get("vrstice_prebrane"),
+        "vrstice_zapisane": rezultat.get("vrstice_zapisane"),
+        "bajti": rezultat.get("bajti"),
+        "vrstic_na_sekundo": None
+    }
+
+    rows = metrics["vrstice_prebrane"] if metrics["vrstice_prebrane"] is not None else metrics["vrstice_zapisane"]
+    if rows is not None and elapsed:
+        metrics["vrstic_na_sekundo"] = round(rows / elapsed, 1)
+
+    return metrics
+
+
+def compute_fingerprint(*parts) -> str:
+    """Vrne SHA-256 odtis JSON predstavitve podanih vrednosti."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """Vrne SHA-256 odtis vsebine datoteke."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PipelineRunner:
+    """
+    Izvaja faze pipeline-a po grafu odvisnosti in jih beleži v pipeline.zagon / pipeline.faza.
+
+    Faze, katerih odvisnosti so končane, tečejo vzporedno. Neuspešna faza blokira samo faze, ki so od nje
+    odvisne; neodvisne veje se izvedejo do konca. Faza se preskoči, če je njen vhodni odtis enak vhodnemu
+    odtisu zadnje uspešne izvedbe iste faze. Neuspešen zagon se lahko nadaljuje: končane faze se ne
+    izvajajo ponovno, njihovi rezultati se preberejo iz tabele faz.
+    """
+
+    def __init__(self, name: str, stages: List[PipelineStage]):
+        self.engine = get_engine()
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = validate_stages(stages)
+
+    async def run(self, resume_zagon_id: Optional[int] = None) -> Dict[str, Any]:
+        """Zažene pipeline ali nadaljuje neuspešen zagon z resume_zagon_id."""
+        zagon_id, results = await asyncio.to_thread(self._start_run, resume_zagon_id)
+        logger.info("=" * 60)
+        logger.info(f"Zagon {zagon_id} pipeline-a {self.name}: {len(self.order)} faz, že končanih {len(results)}")
+        logger.info("=" * 60)
+
+        failed = []
+        blocked = []
+        pending = [name for name in self.order if name not in results]
+        running = {}
+
+        while pending or running:
+            for name in list(pending):
+                depends_on = self.stages[name].depends_on + self.stages[name].after
+                failed_dependencies = [d for d in depends_on if d in failed or d in blocked]
+                if failed_dependencies:
+                    pending.remove(name)
+                    blocked.append(name)
+                    await asyncio.to_thread(self._record_blocked, zagon_id, name, failed_dependencies)
+                elif all(d in results for d in depends_on):
+                    pending.remove(name)
+                    task = asyncio.create_task(self._run_stage(zagon_id, self.stages[name], results))
+                    running[task] = name
+
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                name = running.pop(task)
+                try:
+                    results[name] = task.result()
+                except Exception:
+                    failed.append(name)
+
+        status = STATUS_NAPAKA if failed or blocked else STATUS_USPESNO
+        await asyncio.to_thread(self._finish_run, zagon_id, status)
+
+        if status == STATUS_NAPAKA:
+            logger.error(f"Zagon {zagon_id} neuspešen. Neuspešne faze: {failed}, blokirane faze: {blocked}")
+            return {"status": "error", "message": f"Neuspešne faze: {', '.join(failed)}", "zagon_id": zagon_id, "failed": failed, "blocked": blocked}
+
+        logger.info(f"Zagon {zagon_id} pipeline-a {self.name} uspešno zaključen")
+        return {"status": "success", "message": f"Pipeline {self.name} uspešno zaključen", "zagon_id": zagon_id}
+
+    async def _run_stage(self, zagon_id: int, stage: PipelineStage, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Izvede (ali preskoči) eno fazo in vrne {'odtis': izhodni odtis, 'rezultat': rezultat faze}."""
+        input_fingerprint = compute_fingerprint(stage.params, [results[d]["odtis"] for d in sorted(stage.depends_on)])
+
+        if not stage.always_run:
+            previous = await asyncio.to_thread(self._get_last_success, stage.name)
+            if previous is not None and previous["vhodni_odtis"] == input_fingerprint:
+                logger.info(f"Faza {stage.name} preskočena: vhodni podatki niso spremenjeni")
+                await asyncio.to_thread(
+                    self._record_stage, zagon_id, stage.name, STATUS_PRESKOCENO,
+                    input_fingerprint, previous["odtis"], previous["rezultat"]
+                )
+                return {"odtis": previous["odtis"], "rezultat": previous["rezultat"]}
+
+        await asyncio.to_thread(self._record_stage_start, zagon_id, stage.name, input_fingerprint)
+        logger.info(f"Začetek faze {stage.name}")
+        inputs = {d: results[d]["rezultat"] for d in stage.depends_on}
+        start = time.perf_counter()
+
+        try:
+            if asyncio.iscoroutinefunction(stage.func):
+                rezultat = await stage.func(inputs)
+            else:
+                rezultat = await asyncio.to_thread(stage.func, inputs)
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            logger.error(f"Napaka v fazi {stage.name} po {elapsed:.2f} s: {str(e)}")
+            await asyncio.to_thread(
+                self._record_stage, zagon_id, stage.name, STATUS_NAPAKA,
+                input_fingerprint, None, None, elapsed=elapsed, error=str(e)
+            )
+            raise
+
+        elapsed = time.perf_counter() - start
+        rezultat = dict(rezultat or {})
+        output_fingerprint = rezultat.pop("odtis", input_fingerprint)
+        logger.info(
+            f"Faza {stage.name} končana v {elapsed:.2f} s, prebranih vrstic: {rezultat.get('vrstice_prebrane')}, "
+            f"zapisanih vrstic: {rezultat.get('vrstice_zapisane')}, prenesenih bajtov: {rezultat.get('bajti')}"
+        )
+        await asyncio.to_thread(
+            self._record_stage, zagon_id, stage.name, STATUS_USPESNO,
+            input_fingerprint, output_fingerprint, rezultat, elapsed=elapsed
+        )
+        return {"odtis": output_fingerprint, "rezultat": rezultat}
+
+    def _start_run(self, resume_zagon_id: Optional[int]):
+        """Ustvari zapis zagona ali ponovno odpre neuspešen zagon; vrne (zagon_id, rezultati končanih faz)."""
+        with self.engine.connect() as conn:
+            trans = conn.begin()
+            try:
+                if resume_zagon_id is None:
+                    zagon_id = conn.execute(text("""
+                        INSERT INTO pipeline.zagon (ime, status) VALUES (:ime, :status) RETURNING zagon_id
+                    """), {"ime": self.name, "status": STATUS_V_TEKU}).scalar()
+                    trans.commit()
+                    return zagon_id, {}
+
+                updated = conn.execute(text("""
+                    UPDATE pipeline.zagon
+                    SET status = :status, konec = NULL, stevilo_nadaljevanj = stevilo_nadaljevanj + 1
+                    WHERE zagon_id = :zagon_id AND ime = :ime AND status = :napaka
+                """), {"status": STATUS_V_TEKU, "zagon_id": resume_zagon_id, "ime": self.name, "napaka": STATUS_NAPAKA}).rowcount
+                if updated == 0:
+                    raise ValueError(f"Zagon {resume_zagon_id} pipeline-a {self.name} ne obstaja ali ni neuspešen")
+
+                rows = conn.execute(text("""
+                    SELECT faza, izhodni_odtis, rezultat
+                    FROM pipeline.faza
+                    WHERE zagon_id = :zagon_id AND status = ANY(:koncani)
+                """), {"zagon_id": resume_zagon_id, "koncani": KONCANI_STATUSI}).fetchall()
+                trans.commit()
+
+                results = {row[0]: {"odtis": row[1], "rezultat": row[2] or {}} for row in rows if row[0] in self.stages}
+                logger.info(f"Nadaljevanje zagona {resume_zagon_id}, končane faze: {sorted(results)}")
+                return resume_zagon_id, results
+            except Exception as e:
+                trans.rollback()
+                logger.error(f"Napaka pri začetku zagona pipeline-a: {str(e)}")
+                raise
+
+    def _finish_run(self, zagon_id: int, status: str):
+        """Zapiše končni status zagona."""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+                UPDATE pipeline.zagon SET status = :status, konec = NOW() WHERE zagon_id = :zagon_id
+            """), {"status": status, "zagon_id": zagon_id})
+            conn.commit()
+
+    def _get_last_success(self, stage_name: str) -> Optional[Dict[str, Any]]:
+        """Vrne odtisa in rezultat zadnje končane izvedbe faze (iz kateregakoli zagona)."""
+        with self.engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT vhodni_odtis, izhodni_odtis, rezultat
+                FROM pipeline.faza
+                WHERE faza = :faza AND status = ANY(:koncani)
+                ORDER BY konec DESC
+                LIMIT 1
+            """), {"faza": stage_name, "koncani": KONCANI_STATUSI}).fetchone()
+
+        if row is None:
+            return None
+        return {"vhodni_odtis": row[0], "odtis": row[1], "rezultat": row[2] or {}}
+
+    def _record_stage_start(self, zagon_id: int, stage_name: str, input_fingerprint: str):
+        """Zabeleži začetek faze (pri nadaljevanju prepiše zapis neuspešne izvedbe)."""
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+                INSERT INTO pipeline.faza (zagon_id, faza, status, zacetek, vhodni_odtis)
+                VALUES (:zagon_id, :faza, :status, NOW(), :vhodni_odtis)
+                ON CONFLICT (zagon_id, faza) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    zacetek = EXCLUDED.zacetek,
+                    konec = NULL,
+                    trajanje_s = NULL,
+                    vhodni_odtis = EXCLUDED.vhodni_odtis,
+                    izhodni_odtis = NULL,
+                    vrstice_prebrane = NULL,
+                    vrstice_zapisane = NULL,
+                    bajti = NULL,
+                    vrstic_na_sekundo = NULL,
+                    rezultat = NULL,
+                    napaka = NULL
+            """), {"zagon_id": zagon_id, "faza": stage_name, "status": STATUS_V_TEKU, "vhodni_odtis": input_fingerprint})
+            conn.commit()
+
+    def _record_stage(self, zagon_id: int, stage_name: str, status: str, input_fingerprint: str,
+                      output_fingerprint: Optional[str], rezultat: Optional[Dict[str, Any]],
+                      elapsed: Optional[float] = None, error: Optional[str] = None):
+        """Zabeleži končan, preskočen ali neuspešen izid faze."""
+        metrics = stage_metrics(rezultat, elapsed) if status == STATUS_USPESNO else {}
+
+        with self.engine.connect() as conn:
+            conn.execute(text("""
+                INSERT INTO pipeline.faza (
+                    zagon_id, faza, status, zacetek, konec, trajanje_s,
+                    vhodni_odtis, izhodni_odtis, vrstice_prebrane, vrstice_zapisane, bajti, vrstic_na_sekundo,
+                    rezultat, napaka
+                )
+                VALUES (
+                    :zagon_id, :faza, :status, NOW() - make_interval(secs => :trajanje_s), NOW(), :trajanje_s,
+                    :vhodni_odtis, :izhodni_odtis, :vrstice_prebrane, :vrstice_zapisane, :bajti, :vrstic_na_sekundo,
+                    CAST(:rezultat AS JSONB), :napaka
+                )
+                ON CONFLICT (zagon_id, faza) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    konec = EXCLUDED.konec,
+                    trajanje_s = EXCLUDED.trajanje_s,
+                    vhodni_odtis = EXCLUDED.vhodni_odtis,
+                    izhodni_odtis = EXCLUDED.izhodni_odtis,
+                    vrstice_prebrane = EXCLUDED.vrstice_prebrane,
+                    vrstice_zapisane = EXCLUDED.vrstice_zapisane,
+                    bajti = EXCLUDED.bajti,
+                    vrstic_na_sekundo = EXCLUDED.vrstic_na_sekundo,
+                    rezultat = EXCLUDED.rezultat,
+                    napaka = EXCLUDED.napaka
+            """), {
+                "zagon_id": zagon_id,
+                "faza": stage_name,
+                "status": status,
+                "trajanje_s": round(elapsed or 0, 3),
+                "vhodni_odtis": input_fingerprint,
+                "izhodni_odtis": output_fingerprint,
+                "vrstice_prebrane": metrics.get("vrstice_prebrane"),
+                "vrstice_zapisane": metrics.get("vrstice_zapisane"),
+                "bajti": metrics.get("bajti"),
+                "vrstic_na_sekundo": metrics.get("vrstic_na_sekundo"),
+                "rezultat": json.dumps(rezultat, default=str) if rezultat is not None else None,
+                "napaka": error
+            })
+            conn.commit()
+
+    def _record_blocked(self, zagon_id: int, stage_name: str, failed_dependencies: List[str]):
+        """Zabeleži fazo, ki se ni izvedla zaradi neuspešne odvisnosti."""
+        logger.warning(f"Faza {stage_name} blokirana zaradi neuspešnih faz: {failed_dependencies}")
+        self._record_stage(
+            zagon_id, stage_name, STATUS_BLOKIRANO, None, None, None,
+            error=f"Neuspešne odvisne faze: {', '.join(failed_dependencies)}"
+        )
+
+
+# =============================================================================
+# TEDENSKA POSODOBITEV
+# =============================================================================
+
+def build_weekly_pipeline(years: List[int], ingestion_service, ei_ingestion_service, deduplication_service, stats_service,
+                          maintenance_service) -> List[PipelineStage]:
+    """
+    Sestavi faze tedenske posodobitve podatkov.
+
+    Graf faz:
+    - prenos_<tip>_<leto> -> staging_<tip>_<leto> -> core_<tip>_<leto>; staging tabele so skupne za vsa leta
+      istega tipa, zato staging naslednjega leta čaka na core prejšnjega leta (np in kpp tečeta vzporedno);
+      staging se vedno izvede, ker tabele vsebujejo podatke zadnjega naloženega leta, core pa se preskoči,
+      če se prenos ni spremenil
+    - dedup_<tip> po vseh core fazah tipa (inkrementalno dedupliciranje)
+    - ei_prenos -> ei_staging (vzporedno z vnosom), ei_propagacija po dedupliciranju (sinhronizacija
+      izkaznic v core in posodobitev dedupliciranih tabel za prizadete stavbe)
+    - vzdrzevanje po vseh spremembah podatkov: VACUUM (ANALYZE) spremenjenih tabel
+    - statistike po vseh spremembah podatkov (po vzdrževanju, zaradi svežih statistik): inkrementalna posodobitev
+      cache za leta, ki jih je spremenil vnos podatkov; izvede se vedno, ker se okno zadnjih 12 mesecev premika
+      in ker lahko stats.spremenjena_leta vsebuje leta iz prejšnjih zagonov
+    """
+    stages = []
+    dedup_stages = []
+    all_core_stages = []
+
+    for data_type in ["kpp", "np"]:
+        previous_core = None
+        core_stages = []
+
+        for year in years:
+            prenos, staging, core = f"prenos_{data_type}_{year}", f"staging_{data_type}_{year}", f"core_{data_type}_{year}"
+
+            stages.append(PipelineStage(
+                prenos, _download_stage(ingestion_service, data_type, year), always_run=True
+            ))
+            stages.append(PipelineStage(
+                staging, _staging_stage(ingestion_service, data_type, prenos),
+                depends_on=[prenos], after=[previous_core] if previous_core else [], always_run=True
+            ))
+            stages.append(PipelineStage(
+                core, _core_stage(ingestion_service, data_type, year),
+                depends_on=[staging], params={"mode": "merge"}
+            ))
+            previous_core = core
+            core_stages.append(core)
+            all_core_stages.append(core)
+
+        dedup = f"dedup_{data_type}"
+        stages.append(PipelineStage(
+            dedup, lambda inputs, data_type=data_type: _dedup_stage(deduplication_service, data_type),
+            depends_on=core_stages
+        ))
+        dedup_stages.append(dedup)
+
+    stages.append(PipelineStage("ei_prenos", _ei_download_stage(ei_ingestion_service), always_run=True))
+    stages.append(PipelineStage("ei_staging", _ei_staging_stage(ei_ingestion_service), depends_on=["ei_prenos"]))
+    stages.append(PipelineStage(
+        "ei_propagacija", lambda inputs: _ei_sync_stage(ei_ingestion_service),
+        depends_on=["ei_staging"] + dedup_stages
+    ))
+
+    stages.append(PipelineStage(
+        "vzdrzevanje", _maintenance_stage(maintenance_service),
+        depends_on=all_core_stages + dedup_stages + ["ei_propagacija"]
+    ))
+
+    stages.append(PipelineStage(
+        "statistike", _statistics_stage(stats_service, "incremental"),
+        depends_on=dedup_stages + ["ei_propagacija"], after=["vzdrzevanje"], params={"mode": "incremental"},
+        always_run=True
+    ))
+
+    return stages
+
+
+def _download_stage(ingestion_service, data_type: str, year: int):
+    """Prenos ZIP datoteke leta; izhodni odtis je odtis vsebine datoteke."""
+    async def run(inputs):
+        zip_path = await ingestion_service.download_data(str(year), data_type)
+        target_dir = os.path.join(PIPELINE_DATA_DIR, f"{data_type}_{year}")
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, os.path.basename(zip_path))
+        shutil.move(zip_path, target_path)
+        ingestion_service.cleanup(os.path.dirname(zip_path))
+
+        return {
+            "zip_path": target_path,
+            "bajti": os.path.getsize(target_path),
+            "odtis": await asyncio.to_thread(file_fingerprint, target_path)
+        }
+    return run
+
+
+def _staging_stage(ingestion_service, data_type: str, prenos_stage: str):
+    """Ekstrakcija in uvoz v staging tabele v začasnem direktoriju."""
+    def run(inputs):
+        zip_path = inputs[prenos_stage]["zip_path"]
+        if not os.path.exists(zip_path):
+            raise FileNotFoundError(f"Prenesena datoteka ne obstaja več: {zip_path}")
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            local_zip = os.path.join(temp_dir, os.path.basename(zip_path))
+            shutil.copy(zip_path, local_zip)
+            csv_files = ingestion_service.extract_files(local_zip, data_type)
+            row_counts = ingestion_service.import_to_staging(csv_files)
+        finally:
+            ingestion_service.cleanup(temp_dir)
+
+        rows = sum(row_counts.values())
+        return {"vrstice_prebrane": rows, "vrstice_zapisane": rows, "tabele": row_counts}
+    return run
+
+
+def _core_stage(ingestion_service, data_type: str, year: int):
+    """Zapis sprememb leta v core tabele (merge)."""
+    def run(inputs):
+        changes = ingestion_service.transform_to_core(str(year), data_type, "merge") or {}
+        rows = sum(count for table in changes.values() for count in table.values())
+        return {"vrstice_zapisane": rows, "spremembe": changes}
+    return run
+
+
+def _dedup_stage(deduplication_service, data_type: str) -> Dict[str, Any]:
+    """Inkrementalno dedupliciranje nepremičnin, ki jih je spremenil vnos."""
+    result = deduplication_service.update_deduplicated_del_stavbe(data_type)
+    return {"vrstice_prebrane": result["keys"], "vrstice_zapisane": result["upserted"] + result["deleted"], **result}
+
+
+def _ei_download_stage(ei_ingestion_service):
+    """Prenos CSV datoteke energetskih izkaznic; izhodni odtis je odtis vsebine datoteke."""
+    def run(inputs):
+        csv_path = ei_ingestion_service.download_csv()
+        target_dir = os.path.join(PIPELINE_DATA_DIR, "ei")
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, os.path.basename(csv_path))
+        shutil.move(csv_path, target_path)
+        ei_ingestion_service.cleanup(csv_path)
+
+        return {"csv_path": target_path, "bajti": os.path.getsize(target_path), "odtis": file_fingerprint(target_path)}
+    return run
+
+
+def _ei_staging_stage(ei_ingestion_service):
+    """Branje CSV datoteke izkaznic in uvoz v staging tabelo."""
+    def run(inputs):
+        csv_path = inputs["ei_prenos"]["csv_path"]
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Prenesena datoteka ne obstaja več: {csv_path}")
+
+        df, parse_stats = ei_ingestion_service.read_and_clean(csv_path)
+        staging_count = ei_ingestion_service.import_to_staging(df)
+        return {"vrstice_prebrane": parse_stats["rows"], "vrstice_zapisane": staging_count, "parse_stats": parse_stats}
+    return run
+
+
+def _ei_sync_stage(ei_ingestion_service) -> Dict[str, Any]:
+    """Sinhronizacija izkaznic v core tabelo in posodobitev dedupliciranih tabel za prizadete stavbe."""
+    changes = ei_ingestion_service.sync_incremental()
+    return {"vrstice_zapisane": changes["inserted"] + changes["updated"] + changes["deleted"], **changes}
+
+
+def _statistics_stage(stats_service, mode: str):
+    """Polna ali inkrementalna posodobitev statistik s časi posameznih korakov."""
+    def run(inputs):
+        if mode == "incremental":
+            result = stats_service.update_statistics()
+        else:
+            result = stats_service.refresh_all_statistics()
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+
+        return {"vrstice_zapisane": result["zapisanih"], "statistike": result["details"], "casi": result["casi"]}
+    return run
+
+
+def _maintenance_stage(maintenance_service):
+    """VACUUM (ANALYZE) tabel, ki so jih spremenile odvisne faze."""
+    def run(inputs):
+        vacuum_tables = []
+        for name, rezultat in inputs.items():
+            if not rezultat.get("vrstice_zapisane"):
+                continue
+            if name.startswith("core_"):
+                _, data_type, year = name.split("_")
+                vacuum_tables += [f"core.{data_type}_posel_{year}", f"core.{data_type}_del_stavbe_{year}",
+                                  f"core.{data_type}_spremenjene_nepremicnine"]
+            elif name.startswith("dedup_"):
+                data_type = name.split("_")[1]
+                vacuum_tables += [f"core.{data_type}_del_stavbe_deduplicated", f"core.{data_type}_del_stavbe_posel",
+                                  f"core.{data_type}_stavba"]
+            elif name == "ei_propagacija":
+                vacuum_tables.append("core.energetska_izkaznica")
+
+        result = maintenance_service.run_maintenance(list(dict.fromkeys(vacuum_tables)))
+        return {"tabele": len(result["casi"]), **result}
+    return run
+
+
+# =============================================================================
+# ROČNI ZAGONI (API ENDPOINTI)
+# =============================================================================
+
+def build_ingestion_stage(ingestion_service, data_type: str, years: List[int], mode: str, bulk: bool) -> PipelineStage:
+    """Faza ročnega vnosa podatkov za razpon let (leta se izvedejo zaporedno, neuspešno leto ne ustavi ostalih)."""
+    async def run(inputs):
+        if bulk:
+            result = await ingestion_service.run_bulk_ingestion(data_type, years, mode)
+            year_results = result["years"]
+        else:
+            year_results = {}
+            for year in years:
+                year_results[str(year)] = await ingestion_service.run_ingestion(str(year), data_type, mode=mode)
+
+        failed = [year for year, result in year_results.items() if result["status"] != "success"]
+        if failed:
+            raise RuntimeError(f"Vnos ni uspel za leta: {', '.join(failed)}")
+
+        return {
+            "vrstice_prebrane": sum(sum(r["staging_rows"].values()) for r in year_results.values()),
+            "vrstice_zapisane": sum(
+                count for r in year_results.values() for table in (r["changes"] or {}).values() for count in table.values()
+            ),
+            "bajti": sum(r["bytes"] for r in year_results.values()),
+            "leta": {year: {"changes": r["changes"], "timings": r["timings"]} for year, r in year_results.items()}
+        }
+
+    return PipelineStage(f"vnos_{data_type}", run, always_run=True, params={"years": years, "mode": mode, "bulk": bulk})
+
+
+def build_deduplication_stage(deduplication_service, data_types: List[str], mode: str) -> PipelineStage:
+    """Faza ročnega dedupliciranja (polnega ali inkrementalnega)."""
+    def run(inputs):
+        results = deduplication_service.create_all_deduplicated_del_stavbe(data_types, mode)
+
+        failed = [data_type for data_type, result in results.items() if "error" in result]
+        if failed:
+            raise RuntimeError(f"Dedupliciranje ni uspelo za: {', '.join(failed)}")
+
+        return {
+            "vrstice_prebrane": sum(r.get("keys", 0) for r in results.values()) if mode == "incremental" else None,
+            "vrstice_zapisane": sum(r.get("inserted", 0) + r.get("upserted", 0) + r.get("deleted", 0) for r in results.values()),
+            "tipi": results
+        }
+
+    return PipelineStage("dedup", run, always_run=True, params={"data_types": data_types, "mode": mode})
+
+
+def build_ei_stage(ei_ingestion_service, url: Optional[str], parser: str, mode: str) -> PipelineStage:
+    """Faza ročnega uvoza energetskih izkaznic."""
+    def run(inputs):
+        result = ei_ingestion_service.run_ingestion(url=url, parser=parser, mode=mode)
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+
+        changes = result.get("changes")
+        return {
+            "vrstice_prebrane": result["parse_stats"]["rows"],
+            "vrstice_zapisane": changes["inserted"] + changes["updated"] + changes["deleted"] if changes else result["records_imported"],
+            "bajti": result["bytes"],
+            "parse_stats": result["parse_stats"]
+        }
+
+    return PipelineStage("energetske_izkaznice", run, always_run=True, params={"url": url, "parser": parser, "mode": mode})
+
+
+def build_statistics_stage(stats_service, mode: str = "full") -> PipelineStage:
+    """Faza ročne posodobitve statistik (polna ali inkrementalna)."""
+    return PipelineStage("statistike", _statistics_stage(stats_service, mode), always_run=True, params={"mode": mode})
+
+
+def get_pipeline_runs(limit: int = 20, ime: Optional[str] = None) -> Dict[str, Any]:
+    """Vrne zadnje zagone pipeline-a z metrikami posameznih faz."""
+    try:
+        with get_engine().connect() as conn:
+            rows = conn.execute(text("""
+                SELECT
+                    z.zagon_id, z.ime, z.status, z.zacetek, z.konec, z.stevilo_nadaljevanj,
+                    EXTRACT(EPOCH FROM (COALESCE(z.konec, NOW()) - z.zacetek)) AS trajanje_s,
+                    COALESCE(
+                        json_agg(json_build_object(
+                            'faza', f.faza,
+                            'status', f.status,
+                            'zacetek', f.zacetek,
+                            'konec', f.konec,
+                            'trajanje_s', f.trajanje_s,
+                            'vrstice_prebrane', f.vrstice_prebrane,
+                            'vrstice_zapisane', f.vrstice_zapisane,
+                            'bajti', f.bajti,
+                            'vrstic_na_sekundo', f.vrstic_na_sekundo,
+                            'napaka', f.napaka
+                        ) ORDER BY f.zacetek) FILTER (WHERE f.faza IS NOT NULL),
+                        '[]'
+                    ) AS faze
+                FROM (
+                    SELECT *
+                    FROM pipeline.zagon
+                    WHERE CAST(:ime AS VARCHAR) IS NULL OR ime = :ime
+                    ORDER BY zacetek DESC
+                    LIMIT :limit
+                ) z
+                LEFT JOIN pipeline.faza f ON f.zagon_id = z.zagon_id
+                GROUP BY z.zagon_id, z.ime, z.status, z.zacetek, z.konec, z.stevilo_nadaljevanj
+                ORDER BY z.zacetek DESC
+            """), {"ime": ime, "limit": limit}).fetchall()
+
+        runs = [{
+            "zagon_id": row.zagon_id,
+            "ime": row.ime,
+            "status": row.status,
+            "zacetek": row.zacetek.isoformat() if row.zacetek else None,
+            "konec": row.konec.isoformat() if row.konec else None,
+            "stevilo_nadaljevanj": row.stevilo_nadaljevanj,
+            "trajanje_s": round(float(row.trajanje_s), 3) if row.trajanje_s is not None else None,
+            "faze": row.faze
+        } for row in rows]
+
+        return {"status": "success", "runs": runs}
+
+    except Exception as e:
+        logger.error(f"Napaka pri branju zagonov pipeline-a: {str(e)}")
+        return {"status": "error", "message": str(e)}
@@ -0,0 +1,67 @@
+"""
+Skice kvantilov z logaritemskimi vedri.
+
+Vrednost x > 0 pade v vedro CEIL(LN(x) / LN(gamma)); vrednost vedra i je 2 * gamma^i / (gamma + 1), zato
+je relativna napaka vsakega kvantila največ SKICA_RELATIVNA_NAPAKA. Skice so združljive (dve skici se
+združita s seštevanjem števcev istih veder), zato se skice regij in poljubnih obdobij zgradijo iz mesečnih
+skic (stats.statistike_mesecno_skica) brez ponovnega branja poslov. Enako vedenje v SQL imajo
+populate_statistike_mesecno_skica.sql, populate_statistike_mreza.sql in kvantili v populate_statistike_cache_*.sql
+(parameter gamma).
+"""
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+# Relativna napaka kvantilov (1 %)
+SKICA_RELATIVNA_NAPAKA = 0.01
+SKICA_GAMMA = (1 + SKICA_RELATIVNA_NAPAKA) / (1 - SKICA_RELATIVNA_NAPAKA)
+
+# Kvantili, ki jih vračajo endpointi statistik
+KVANTILI = {"p10": 0.1, "mediana": 0.5, "p90": 0.9}
+
+
+def sketch_bucket(value: float, gamma: float = SKICA_GAMMA) -> int:
+    """Indeks vedra za pozitivno vrednost"""
+    return math.ceil(math.log(value) / math.log(gamma))
+
+
+def bucket_value(bucket: int, gamma: float = SKICA_GAMMA) -> float:
+    """Reprezentativna vrednost vedra (relativna napaka glede na vse vrednosti vedra največ (gamma-1)/(gamma+1))"""
+    return 2 * gamma ** bucket / (gamma + 1)
+
+
+def build_sketch(values: Iterable[float], gamma: float = SKICA_GAMMA) -> Dict[int, int]:
+    """Skica pozitivnih vrednosti kot {vedro: število}"""
+    sketch: Dict[int, int] = {}
+    for value in values:
+        if value is not None and value > 0:
+            bucket = sketch_bucket(value, gamma)
+            sketch[bucket] = sketch.get(bucket, 0) + 1
+    return sketch
+
+
+def merge_sketches(sketches: Iterable[Tuple[Iterable[int], Iterable[int]]]) -> Dict[int, int]:
+    """Združi skice, podane kot pare (vedra, števci) iz stats.statistike_mesecno_skica"""
+    merged: Dict[int, int] = {}
+    for vedra, stevci in sketches:
+        for bucket, count in zip(vedra, stevci):
+            merged[bucket] = merged.get(bucket, 0) + count
+    return merged
+
+
+def sketch_quantile(sketch: Dict[int, int], q: float, gamma: float = SKICA_GAMMA) -> Optional[float]:
+    """Kvantil q: vrednost vedra, v katerem kumulativno število doseže q * število vseh vrednosti"""
+    total = sum(sketch.values())
+    if total == 0:
+        return None
+
+    cumulative = 0
+    for bucket in sorted(sketch):
+        cumulative += sketch[bucket]
+        if cumulative >= q * total:
+            return round(bucket_value(bucket, gamma), 2)
+    return None
+
+
+def sketch_quantiles(sketch: Dict[int, int], gamma: float = SKICA_GAMMA) -> Dict[str, Optional[float]]:
+    """Mediana, p10 in p90 skice"""
+    return {ime: sketch_quantile(sketch, q, gamma) for ime, q in KVANTILI.items()}
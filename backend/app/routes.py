@@ -1,22 +1,19 @@
 from datetime import datetime
-from fastapi import Depends, HTTPException, Path, Query, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import Body, Depends, HTTPException, Path, Query
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 
 from .database import get_db
 from .zemljevid_service import DelStavbeService
-from .data_ingestion import DataIngestionService
-from .deduplication import DeduplicationService
-from .energetska_izkaznica_ingestion import EnergetskaIzkaznicaIngestionService
-from .statistics_service import StatisticsService
+from .data_ingestion import TRANSFORM_MODES
+from .deduplication import DEDUP_MODES
+from .energetska_izkaznica_ingestion import EI_PARSERS, EI_MODES
+from .statistics_service import StatisticsService, STATS_MODES, resolve_period, polygon_bounds, parse_batch_request
+from .statistics_index import CHOROPLETH_FORMATI
+from .pipeline import WEEKLY_PIPELINE, get_pipeline_runs
+from .job_queue import enqueue_job, get_job
 
 
-ingestion_service = DataIngestionService()
-
-deduplication_service = DeduplicationService()
-
-ei_ingestion_service = EnergetskaIzkaznicaIngestionService()
-
 stats_service = StatisticsService()
 
 
@@ -25,10 +22,11 @@ stats_service = StatisticsService()
 # =============================================================================
 
 def ingest_data(
-    background_tasks: BackgroundTasks,  
     data_type: str = Query("kpp", description="Tip podatkov (np ali kpp)"),
     start_year: int = Query(None, description="Začetno leto"),
-    end_year: int = Query(datetime.now().year, description="Končno leto")
+    end_year: int = Query(datetime.now().year, description="Končno leto"),
+    mode: str = Query("replace", description="Način zapisa v core (replace ali merge)"),
+    bulk: bool = Query(False, description="Množični vnos (UNLOGGED staging, COPY, odloženi indeksi)")
 ):
     """API endpoint za zagon vnosa podatkov za razpon let"""
     try:
@@ -50,22 +48,28 @@ def ingest_data(
                 status_code=400,
                 content={"status": "error", "message": "Data type mora biti 'np' ali 'kpp'"}
             )
-            
-        # Dodamo opravila za vsako leto v razponu
-        for year in range(start_year, end_year + 1):
-            background_tasks.add_task(
-                ingestion_service.run_ingestion,
-                filter_year=str(year),
-                data_type=data_type
+
+        if mode not in TRANSFORM_MODES:
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Mode mora biti 'replace' ali 'merge'"}
             )
+            
+        # Vsa leta v enem zagonu workerja (zaporedno); pri bulk se indeksi ponovno zgradijo samo enkrat.
+        # Zagon in njegove metrike se beležijo v pipeline.zagon / pipeline.faza
+        years = list(range(start_year, end_year + 1))
+        opravilo = enqueue_job("vnos_podatkov", {"data_type": data_type, "years": years, "mode": mode, "bulk": bulk})
         
         return JSONResponse(
             status_code=202,
             content={
                 "status": "accepted",
-                "message": f"Vnos podatkov '{data_type}' se je začel za leta od {start_year} do {end_year}",
+                "message": f"Vnos podatkov '{data_type}' za leta od {start_year} do {end_year} je v čakalni vrsti",
+                "opravilo_id": opravilo["opravilo_id"],
                 "params": {
                     "data_type": data_type,
+                    "mode": mode,
+                    "bulk": bulk,
                     "years": list(range(start_year, end_year + 1))
                 }
             }
@@ -78,8 +82,8 @@ def ingest_data(
 
 
 def fill_deduplicated_tables(
-    background_tasks: BackgroundTasks,
-    data_type: str = Query(None, description="Tip podatkov (np, kpp, ali vsi za np + kpp)")
+    data_type: str = Query(None, description="Tip podatkov (np, kpp, ali vsi za np + kpp)"),
+    mode: str = Query("full", description="Način dedupliciranja (full ali incremental)")
 ):
     """
     API endpoint za ustvarjanje deduplicirane tabele po končanem vnosu podatkov.
@@ -92,26 +96,29 @@ def fill_deduplicated_tables(
                 content={"status": "error", "message": "Data type mora biti 'np', 'kpp' ali 'vsi' za np + kpp"}
             )
 
+        if mode not in DEDUP_MODES:
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Mode mora biti 'full' ali 'incremental'"}
+            )
+
         if data_type is None or data_type.lower() == "vsi":
             # Obdelaj oba tipa podatkov
-            background_tasks.add_task(
-                deduplication_service.create_all_deduplicated_del_stavbe,
-                ["np", "kpp"]
-            )
-            message = "Dedupliciranje se je začelo za podatke NP in KPP"
+            data_types = ["np", "kpp"]
+            message = "Dedupliciranje za podatke NP in KPP je v čakalni vrsti"
         else:
             # Obdelaj en tip podatkov
-            background_tasks.add_task(
-                deduplication_service.create_deduplicated_del_stavbe,
-                data_type.lower()
-            )
-            message = f"Dedupliciranje se je začelo za podatke {data_type.upper()}"
+            data_types = [data_type.lower()]
+            message = f"Dedupliciranje za podatke {data_type.upper()} je v čakalni vrsti"
+
+        opravilo = enqueue_job("deduplikacija", {"data_types": data_types, "mode": mode})
 
         return JSONResponse(
             status_code=202,
             content={
                 "status": "accepted",
                 "message": message,
+                "opravilo_id": opravilo["opravilo_id"],
             }
         )
 
@@ -123,24 +130,35 @@ def fill_deduplicated_tables(
 
 
 def ingest_energetske_izkaznice(
-    background_tasks: BackgroundTasks,
-    url: str = Query(None, description="Opcijski direktni URL do CSV datoteke")
+    url: str = Query(None, description="Opcijski direktni URL do CSV datoteke"),
+    parser: str = Query("arrow", description="Način branja CSV (arrow ali pandas)"),
+    mode: str = Query("full", description="Način uvoza (full ali incremental)")
 ):
     """
     API endpoint za uvoz energetskih izkaznic.
     Če URL ni podan, bo avtomatsko generiral URL za trenutni mesec.
     """
     try:
-        background_tasks.add_task(
-            ei_ingestion_service.run_ingestion,
-            url=url
-        )
+        if parser not in EI_PARSERS:
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Parser mora biti 'arrow' ali 'pandas'"}
+            )
+
+        if mode not in EI_MODES:
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Mode mora biti 'full' ali 'incremental'"}
+            )
+
+        opravilo = enqueue_job("energetske_izkaznice", {"url": url, "parser": parser, "mode": mode})
         
         return JSONResponse(
             status_code=202,
             content={
                 "status": "accepted",
-                "message": "Uvoz energetskih izkaznic se je začel",
+                "message": "Uvoz energetskih izkaznic je v čakalni vrsti",
+                "opravilo_id": opravilo["opravilo_id"],
                 "note": "Preveri status z /api/energetske-izkaznice/status endpointom"
             }
         )
@@ -152,6 +170,71 @@ def ingest_energetske_izkaznice(
         )
 
 
+def zazeni_tedensko_posodobitev(
+    resume_zagon_id: int = Query(None, description="ID neuspešnega zagona, ki naj se nadaljuje od neuspešnih faz")
+):
+    """
+    API endpoint za ročni zagon tedenske posodobitve ali nadaljevanje neuspešnega zagona.
+    """
+    try:
+        opravilo = enqueue_job(WEEKLY_PIPELINE, {"resume_zagon_id": resume_zagon_id} if resume_zagon_id else {})
+
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "accepted",
+                "message": "Nadaljevanje tedenske posodobitve je v čakalni vrsti" if resume_zagon_id else "Tedenska posodobitev je v čakalni vrsti",
+                "opravilo_id": opravilo["opravilo_id"],
+                "params": {"resume_zagon_id": resume_zagon_id}
+            }
+        )
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": str(e)}
+        )
+
+
+def pipeline_zagoni(
+    limit: int = Query(20, ge=1, le=200, description="Število zadnjih zagonov"),
+    ime: str = Query(None, description="Ime pipeline-a (npr. tedenska_posodobitev, vnos_podatkov)")
+):
+    """
+    Zadnji zagoni vnosa, dedupliciranja in statistik s trajanjem, prebranimi/zapisanimi vrsticami,
+    prenesenimi bajti in prepustnostjo (vrstic/s) po fazah.
+
+    Primer uporabe:
+    - GET /api/pipeline/runs?limit=10&ime=tedenska_posodobitev
+    """
+    result = get_pipeline_runs(limit, ime)
+
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+
+    return result
+
+
+def pipeline_opravilo(
+    opravilo_id: int = Path(..., description="ID opravila iz odgovora ingest endpointa")
+):
+    """
+    Stanje opravila v čakalni vrsti workerja (cakajoce, v_teku, uspesno, napaka) in ID njegovega zagona.
+
+    Primer uporabe:
+    - GET /api/pipeline/opravila/42
+    """
+    try:
+        opravilo = get_job(opravilo_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if opravilo is None:
+        raise HTTPException(status_code=404, detail=f"Opravilo {opravilo_id} ne obstaja")
+
+    return opravilo
+
+
 # =============================================================================
 # DEL STAVBE ENDPOINTI
 # =============================================================================
@@ -311,23 +394,31 @@ def get_cluster_del_stavbe(
 # STATISTIKE ENDPOINTI
 # =============================================================================
 
-def posodobi_statistike(background_tasks: BackgroundTasks):
+def posodobi_statistike(
+    mode: str = Query("full", description="Način posodobitve (full ali incremental za samo spremenjena leta)")
+):
     """
     Napolni/posodobi VSE statistike
     
     Primer uporabe:
     - POST /api/statistike/posodobi
+    - POST /api/statistike/posodobi?mode=incremental
     """
     try:
-        background_tasks.add_task(
-            stats_service.refresh_all_statistics
-        )
+        if mode not in STATS_MODES:
+            return JSONResponse(
+                status_code=400,
+                content={"status": "napaka", "sporocilo": "Mode mora biti 'full' ali 'incremental'"}
+            )
+
+        opravilo = enqueue_job("statistike", {"mode": mode})
         
         return JSONResponse(
             status_code=202,
             content={
                 "status": "sprejeto",
-                "sporocilo": "Posodabljanje vseh statistik se je začelo",
+                "sporocilo": "Posodabljanje vseh statistik je v čakalni vrsti",
+                "opravilo_id": opravilo["opravilo_id"],
                 "regije": "vse",
                 "opomba": "Preveri status z GET /api/statistike/status"
             }
@@ -364,17 +455,52 @@ def vse_statistike(
         if tip_regije not in veljavni_tipi:
             raise ValueError(f"tip_regije mora biti eden od: {', '.join(veljavni_tipi)}")
         
-        # Pridobi vse statistike
-        rezultat = stats_service.get_full_statistics(regija, tip_regije)
+        # Pridobi vse statistike (že kodiran JSON, vrne se brez dekodiranja)
+        rezultat = stats_service.get_full_statistics_document(regija, tip_regije)
         
         if rezultat["status"] == "error":
             raise HTTPException(status_code=404, detail=rezultat["message"])
         
+        return Response(
+            status_code=200,
+            content=rezultat["dokument"],
+            media_type="application/json"
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
+
+
+def batch_statistike(
+    regije: list = Body(..., embed=True, description="Seznam regij [{\"tip_regije\": ..., \"regija\": ...}]"),
+    metrike: list = Body(None, embed=True, description="Izbrane metrike (privzeto vse)"),
+    obdobja: list = Body(None, embed=True, description="Izbrana obdobja: leta in/ali 'zadnjih12m' (privzeto vsa)")
+):
+    """
+    Pridobi statistike več regij naenkrat za primerjavo (en klic namesto enega na regijo)
+    
+    Primer uporabe:
+    - POST /api/statistike/batch
+      {"regije": [{"tip_regije": "obcina", "regija": "LJUBLJANA"}, {"tip_regije": "obcina", "regija": "MARIBOR"}],
+       "metrike": ["povprecna_cena_m2", "stevilo_poslov"], "obdobja": ["zadnjih12m", 2024]}
+    """
+    try:
+        pari, izbrane_metrike, izbrana_obdobja = parse_batch_request(regije, metrike, obdobja)
+
+        rezultat = stats_service.get_batch_statistics(pari, izbrane_metrike, izbrana_obdobja)
+
+        if rezultat["status"] == "error":
+            raise HTTPException(status_code=500, detail=rezultat["message"])
+
         return JSONResponse(
             status_code=200,
             content=rezultat
         )
-        
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
     except HTTPException:
@@ -425,6 +551,143 @@ def splosne_statistike(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
     
+def obdobje_statistike(
+    tip_regije: str = Path(..., description="Tip regije: 'obcina', 'katastrska_obcina', 'slovenija'"),
+    regija: str = Path(..., description="Ime regije"),
+    od: str = Query(None, description="Prvi mesec obdobja (YYYY-MM)"),
+    do: str = Query(None, description="Zadnji mesec obdobja (YYYY-MM), privzeto tekoči mesec"),
+    zadnjih_mesecev: int = Query(None, description="Drseče obdobje: tekoči mesec in N-1 prejšnjih (namesto od/do)")
+):
+    """
+    Pridobi statistike regije za poljubno obdobje mesecev (iz mesečne kocke statistik)
+    
+    Primer uporabe:
+    - GET /api/statistike/obdobje/obcina/LJUBLJANA?od=2023-01&do=2024-06
+    - GET /api/statistike/obdobje/slovenija/SLOVENIJA?zadnjih_mesecev=6
+    """
+    try:
+        # Validiraj tip regije
+        veljavni_tipi = ["obcina", "katastrska_obcina", "slovenija"]
+        if tip_regije not in veljavni_tipi:
+            raise ValueError(f"tip_regije mora biti eden od: {', '.join(veljavni_tipi)}")
+
+        od_mesec, do_mesec = resolve_period(od, do, zadnjih_mesecev, datetime.now().date())
+
+        rezultat = stats_service.get_period_statistics(regija, tip_regije, od_mesec, do_mesec)
+
+        if rezultat["status"] == "error":
+            raise HTTPException(status_code=500, detail=rezultat["message"])
+
+        return JSONResponse(
+            status_code=200,
+            content=rezultat
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
+
+def statistike_bbox(
+    bbox: str = Query(..., description="Bounding box 'west,south,east,north'"),
+    od_leta: int = Query(None, description="Prvo leto (vključno)"),
+    do_leta: int = Query(None, description="Zadnje leto (vključno)")
+):
+    """
+    Pridobi statistike poslov za trenutni pogled zemljevida (iz prostorske mreže statistik)
+    
+    Primer uporabe:
+    - GET /api/statistike/bbox?bbox=14.45,46.03,14.56,46.09&od_leta=2023
+    """
+    try:
+        west, south, east, north = map(float, bbox.split(','))
+
+        rezultat = stats_service.get_area_statistics(west, south, east, north, od_leta=od_leta, do_leta=do_leta)
+
+        if rezultat["status"] == "error":
+            raise HTTPException(status_code=500, detail=rezultat["message"])
+
+        return JSONResponse(
+            status_code=200,
+            content=rezultat
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
+
+def statistike_poligon(
+    polygon: dict = Body(..., embed=True, description="GeoJSON geometrija (Polygon ali MultiPolygon) v WGS84"),
+    od_leta: int = Body(None, embed=True, description="Prvo leto (vključno)"),
+    do_leta: int = Body(None, embed=True, description="Zadnje leto (vključno)")
+):
+    """
+    Pridobi statistike poslov znotraj narisanega poligona (iz prostorske mreže statistik)
+    
+    Primer uporabe:
+    - POST /api/statistike/poligon  {"polygon": {"type": "Polygon", "coordinates": [...]}, "od_leta": 2023}
+    """
+    try:
+        west, south, east, north = polygon_bounds(polygon)
+
+        rezultat = stats_service.get_area_statistics(
+            west, south, east, north, polygon=polygon, od_leta=od_leta, do_leta=do_leta
+        )
+
+        if rezultat["status"] == "error":
+            raise HTTPException(status_code=500, detail=rezultat["message"])
+
+        return JSONResponse(
+            status_code=200,
+            content=rezultat
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
+
+def choropleth_statistike(
+    format: str = Query("json", description="Format odgovora: 'json' ali 'arrow' (Arrow IPC stream)"),
+    vkljuci_katastrske: bool = Query(True, description="Ali naj vključi tudi katastrske občine")
+):
+    """
+    Pridobi število poslov in cene na m² zadnjih 12 mesecev za VSE občine (in KO) kot vzporedne stolpce
+    (regija, posli_*, cena_m2_*) za barvanje zemljevida v enem klicu
+    
+    Primer uporabe:
+    - GET /api/statistike/choropleth
+    - GET /api/statistike/choropleth?format=arrow&vkljuci_katastrske=false
+    """
+    try:
+        if format not in CHOROPLETH_FORMATI:
+            raise ValueError(f"format mora biti eden od: {', '.join(CHOROPLETH_FORMATI)}")
+
+        rezultat = stats_service.get_choropleth_document(format, vkljuci_katastrske)
+
+        if rezultat["status"] == "error":
+            raise HTTPException(status_code=500, detail=rezultat["message"])
+
+        return Response(
+            status_code=200,
+            content=rezultat["dokument"],
+            media_type=CHOROPLETH_FORMATI[format]
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Neveljavni parametri: {str(e)}")
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB napaka: {str(e)}")
+
 def vse_obcine_posli_zadnjih_12m(
     vkljuci_katastrske: bool = Query(
         default=True, 
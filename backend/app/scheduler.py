@@ -1,9 +1,11 @@
 import asyncio
 import logging
-from datetime import datetime
+import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 
-from .routes import ingestion_service, deduplication_service, ei_ingestion_service, stats_service
+from .job_queue import enqueue_job
+from .pipeline import WEEKLY_PIPELINE
 
 logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler()
@@ -11,19 +13,22 @@ scheduler = AsyncIOScheduler()
 
 async def weekly_update():
     logger.info("--------------------------------------------------------")
-    logger.info("Začetek tedenskega posodabljanja podatkov...")
+    logger.info("Vpis tedenskega posodabljanja podatkov v čakalno vrsto...")
     logger.info("--------------------------------------------------------")
     try:
-        current_year = datetime.now().year
-
-        for year in [current_year - 1, current_year]:
-            await ingestion_service.run_ingestion(str(year), "kpp")
-            await ingestion_service.run_ingestion(str(year), "np")
+        # Faze (prenos, staging, core, izkaznice, dedupliciranje, statistike) izvede worker po grafu odvisnosti;
+        # neuspešen zagon se nadaljuje z POST /api/pipeline/tedenska-posodobitev?resume_zagon_id=<id>
+        opravilo = await asyncio.to_thread(enqueue_job, WEEKLY_PIPELINE)
+        logger.info(f"Tedensko posodabljanje vpisano kot opravilo {opravilo['opravilo_id']}.")
+    except Exception as e:
+        logger.error(f"Napaka pri vpisu tedenskega posodabljanja: {e}")
 
-        await asyncio.to_thread(ei_ingestion_service.run_ingestion, url=None)
-        await asyncio.to_thread(deduplication_service.create_all_deduplicated_del_stavbe, ["np", "kpp"])
-        await asyncio.to_thread(stats_service.refresh_all_statistics)
 
-        logger.info("Tedensko posodabljanje zaključeno.")
-    except Exception as e:
-        logger.error(f"Napaka pri tedenskem posodabljanju: {e}")
\ No newline at end of file
+def schedule_weekly_update():
+    """Doda tedensko posodabljanje (sobota ob 4:00) v scheduler worker procesa."""
+    scheduler.add_job(
+        weekly_update,
+        trigger=CronTrigger(day_of_week="sat", hour=4, minute=0, timezone=pytz.timezone("Europe/Ljubljana")),
+        id="weekly_update",
+        replace_existing=True,
+    )
@@ -0,0 +1,36 @@
+-- =============================================================================
+-- POVEZAVE DEDUPLICIRANIH NEPREMIČNIN Z DELI STAVB IN POSLI
+-- =============================================================================
+-- Namen: Za vsako deduplicirano nepremičnino zapiše vse dele stavb poslov, v katerih nastopa
+-- (enako kot nekdanji tabeli povezani_del_stavbe_ids / povezani_posel_ids), z datumom in ceno posla.
+-- Zgodovina poslov se tako bere z index-only scan po (dedup_id, datum) namesto razpakiranja tabel.
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ciljna tabela povezav (<prefix>_del_stavbe_posel ali senčna tabela)
+--   tabela       - deduplicirana (senčna) tabela
+--   del_stavbe   - izvorna tabela delov stavb (core.np_del_stavbe ali core.kpp_del_stavbe)
+--   posel        - izvorna tabela poslov (core.np_posel ali core.kpp_posel)
+--   cena         - stolpec cene posla (najemnina ali cena)
+--   omejitev     - dodaten pogoj za nepremičnine (prazen za vse nepremičnine)
+-- =============================================================================
+
+INSERT INTO {target_table} (dedup_id, del_stavbe_id, posel_id, datum, cena)
+SELECT DISTINCT ON (d.del_stavbe_id, ds.del_stavbe_id)
+    d.del_stavbe_id,
+    ds.del_stavbe_id,
+    ds.posel_id,
+    p.datum_sklenitve,
+    p.{cena}
+-- Omejitev se uporabi v podpoizvedbi, zato se nekvalificirani stolpci nanašajo samo na deduplicirano tabelo
+FROM (
+    SELECT del_stavbe_id, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe
+    FROM {tabela}
+    WHERE TRUE
+      {omejitev}
+) d
+INNER JOIN {del_stavbe} lastni
+    ON lastni.sifra_ko = d.sifra_ko
+    AND lastni.stevilka_stavbe = d.stevilka_stavbe
+    AND lastni.stevilka_dela_stavbe = d.stevilka_dela_stavbe
+INNER JOIN {posel} p ON p.posel_id = lastni.posel_id AND p.leto = lastni.leto
+-- Deli stavb posla so v isti particiji (leto) kot posel
+INNER JOIN {del_stavbe} ds ON ds.posel_id = lastni.posel_id AND ds.leto = lastni.leto;
@@ -0,0 +1,28 @@
+-- =============================================================================
+-- OZNAČEVANJE PODVOJENIH NAJNOVEJŠIH POSLOV MED SHARDI
+-- =============================================================================
+-- Namen: Skripta dedupliciranja doda ' PODV.' nepremičninam, ki si delijo najnovejši posel,
+-- vendar samo znotraj enega sharda (obsega sifra_ko). Ta skripta po vzporednem dedupliciranju
+-- označi še nepremičnine, katerih skupni najnovejši posel je razdeljen med različne shard-e.
+-- Placeholderja (zamenja ju get_sql_query):
+--   tabela     - deduplicirana (senčna) tabela
+--   del_stavbe - izvorna tabela delov stavb (core.np_del_stavbe ali core.kpp_del_stavbe)
+-- =============================================================================
+
+WITH zadnji_posli AS (
+    SELECT d.del_stavbe_id, ds.posel_id
+    FROM {tabela} d
+    INNER JOIN {del_stavbe} ds ON ds.del_stavbe_id = d.najnovejsi_del_stavbe_id
+),
+podvojeni_zadnji_posli AS (
+    SELECT posel_id
+    FROM zadnji_posli
+    GROUP BY posel_id
+    HAVING COUNT(*) > 1
+)
+UPDATE {tabela} d
+SET dodatek_hs = d.dodatek_hs || ' PODV.'
+FROM zadnji_posli zp
+INNER JOIN podvojeni_zadnji_posli pzp ON pzp.posel_id = zp.posel_id
+WHERE d.del_stavbe_id = zp.del_stavbe_id
+  AND d.dodatek_hs NOT LIKE '% PODV.';  -- že označene znotraj sharda (NULL ostane NULL kot v skripti dedupliciranja)
@@ -0,0 +1,41 @@
+-- =============================================================================
+-- POVZETEK STAVB ZA ZEMLJEVID
+-- =============================================================================
+-- Namen: Iz deduplicirane tabele zgradi eno vrstico na stavbo (obcina, sifra_ko, stevilka_stavbe)
+-- in leto zadnjega posla: število enot, centroid (povprečje koordinat enot) ter min/max/povprečje
+-- cene in površine. Zemljevid pri približanem pogledu združi vrstice z zadnje_leto >= filter_leto
+-- in bere posamezne dele stavb samo za stavbe z eno enoto.
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ciljna tabela (<prefix>_stavba ali senčna tabela)
+--   tabela       - deduplicirana (senčna) tabela
+--   cena         - stolpec zadnje cene (zadnja_najemnina ali zadnja_cena)
+--   omejitev     - dodaten pogoj za nepremičnine (prazen za vse stavbe)
+-- =============================================================================
+
+INSERT INTO {target_table} (
+    obcina, sifra_ko, stevilka_stavbe, zadnje_leto,
+    stevilo_enot, del_stavbe_id,
+    min_cena, max_cena, povprecna_cena, stevilo_cen,
+    min_povrsina, max_povrsina, povprecna_povrsina, stevilo_povrsin,
+    centroid
+)
+SELECT
+    obcina,
+    sifra_ko,
+    stevilka_stavbe,
+    zadnje_leto,
+    COUNT(*),
+    MIN(del_stavbe_id),
+    MIN({cena}),
+    MAX({cena}),
+    AVG({cena}),
+    COUNT({cena}),
+    MIN(povrsina_uradna),
+    MAX(povrsina_uradna),
+    AVG(povrsina_uradna),
+    COUNT(povrsina_uradna),
+    ST_SetSRID(ST_MakePoint(AVG(ST_X(coordinates)), AVG(ST_Y(coordinates))), 4326)
+FROM {tabela}
+WHERE zadnje_leto IS NOT NULL
+  {omejitev}
+GROUP BY obcina, sifra_ko, stevilka_stavbe, zadnje_leto;
@@ -0,0 +1,121 @@
+-- =======================================================================
+-- INKREMENTALNA SINHRONIZACIJA ENERGETSKIH IZKAZNIC
+-- =======================================================================
+-- Logika:
+-- 1. Za vsak ei_id izračuna zgoščeno vrednost (md5) vseh njegovih vrstic v staging in core tabeli
+-- 2. Primerja vrednosti po ei_id: novi, spremenjeni in izbrisani ei_id
+-- 3. Zabeleži prizadete stavbe (stare in nove lokacije) v ei_spremenjene_stavbe
+-- 4. Izbriše izbrisane/spremenjene izkaznice in vstavi nove/spremenjene
+-- Začasne tabele se izbrišejo ob koncu transakcije.
+-- =======================================================================
+
+-- KORAK 1: ZGOŠČENE VREDNOSTI PO EI_ID
+-- ====================================
+CREATE TEMP TABLE ei_nove_izkaznice ON COMMIT DROP AS
+SELECT 
+    ei_id,
+    md5(string_agg(
+        ROW(datum_izdelave, velja_do, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe, tip_izkaznice,
+            potrebna_toplota_ogrevanje, dovedena_energija_delovanje, celotna_energija, dovedena_elektricna_energija,
+            primarna_energija, emisije_co2, kondicionirana_povrsina, energijski_razred, epbd_tip)::text,
+        '|' ORDER BY ROW(datum_izdelave, velja_do, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe, tip_izkaznice,
+            potrebna_toplota_ogrevanje, dovedena_energija_delovanje, celotna_energija, dovedena_elektricna_energija,
+            primarna_energija, emisije_co2, kondicionirana_povrsina, energijski_razred, epbd_tip)::text
+    )) as hash_izkaznice
+FROM staging.energetska_izkaznica
+WHERE sifra_ko IS NOT NULL 
+    AND stevilka_stavbe IS NOT NULL 
+    AND stevilka_dela_stavbe IS NOT NULL
+GROUP BY ei_id;
+
+CREATE TEMP TABLE ei_obstojece_izkaznice ON COMMIT DROP AS
+SELECT 
+    ei_id,
+    md5(string_agg(
+        ROW(datum_izdelave, velja_do, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe, tip_izkaznice,
+            potrebna_toplota_ogrevanje, dovedena_energija_delovanje, celotna_energija, dovedena_elektricna_energija,
+            primarna_energija, emisije_co2, kondicionirana_povrsina, energijski_razred, epbd_tip)::text,
+        '|' ORDER BY ROW(datum_izdelave, velja_do, sifra_ko, stevilka_stavbe, stevilka_dela_stavbe, tip_izkaznice,
+            potrebna_toplota_ogrevanje, dovedena_energija_delovanje, celotna_energija, dovedena_elektricna_energija,
+            primarna_energija, emisije_co2, kondicionirana_povrsina, energijski_razred, epbd_tip)::text
+    )) as hash_izkaznice
+FROM core.energetska_izkaznica
+GROUP BY ei_id;
+
+
+-- KORAK 2: SPREMENJENI EI_ID
+-- ==========================
+CREATE TEMP TABLE ei_spremenjene ON COMMIT DROP AS
+SELECT 
+    COALESCE(n.ei_id, o.ei_id) as ei_id,
+    CASE 
+        WHEN o.ei_id IS NULL THEN 'inserted'
+        WHEN n.ei_id IS NULL THEN 'deleted'
+        ELSE 'updated'
+    END as sprememba
+FROM ei_nove_izkaznice n
+FULL JOIN ei_obstojece_izkaznice o ON n.ei_id = o.ei_id
+WHERE n.hash_izkaznice IS DISTINCT FROM o.hash_izkaznice;
+
+
+-- KORAK 3: PRIZADETE STAVBE (pred in po spremembi)
+-- ================================================
+CREATE TEMP TABLE ei_spremenjene_stavbe ON COMMIT DROP AS
+SELECT ei.sifra_ko, ei.stevilka_stavbe
+FROM core.energetska_izkaznica ei
+WHERE ei.ei_id IN (SELECT ei_id FROM ei_spremenjene)
+UNION
+SELECT s.sifra_ko, s.stevilka_stavbe
+FROM staging.energetska_izkaznica s
+WHERE s.ei_id IN (SELECT ei_id FROM ei_spremenjene)
+    AND s.sifra_ko IS NOT NULL 
+    AND s.stevilka_stavbe IS NOT NULL 
+    AND s.stevilka_dela_stavbe IS NOT NULL;
+
+
+-- KORAK 4: ZAPIS SPREMEMB
+-- =======================
+-- Spremenjene izkaznice se zamenjajo v celoti (vse vrstice ei_id)
+DELETE FROM core.energetska_izkaznica
+WHERE ei_id IN (SELECT ei_id FROM ei_spremenjene WHERE sprememba IN ('updated', 'deleted'));
+
+INSERT INTO core.energetska_izkaznica (
+    ei_id, 
+    datum_izdelave, 
+    velja_do, 
+    sifra_ko, 
+    stevilka_stavbe, 
+    stevilka_dela_stavbe, 
+    tip_izkaznice, 
+    potrebna_toplota_ogrevanje,
+    dovedena_energija_delovanje, 
+    celotna_energija, 
+    dovedena_elektricna_energija,
+    primarna_energija, 
+    emisije_co2, 
+    kondicionirana_povrsina,
+    energijski_razred, 
+    epbd_tip
+)
+SELECT 
+    ei_id, 
+    datum_izdelave, 
+    velja_do, 
+    sifra_ko, 
+    stevilka_stavbe, 
+    stevilka_dela_stavbe, 
+    tip_izkaznice, 
+    potrebna_toplota_ogrevanje,
+    dovedena_energija_delovanje, 
+    celotna_energija, 
+    dovedena_elektricna_energija,
+    primarna_energija, 
+    emisije_co2, 
+    kondicionirana_povrsina,
+    energijski_razred, 
+    epbd_tip
+FROM staging.energetska_izkaznica
+WHERE ei_id IN (SELECT ei_id FROM ei_spremenjene WHERE sprememba IN ('inserted', 'updated'))
+    AND sifra_ko IS NOT NULL 
+    AND stevilka_stavbe IS NOT NULL 
+    AND stevilka_dela_stavbe IS NOT NULL;
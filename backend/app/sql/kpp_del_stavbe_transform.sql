@@ -1,4 +1,4 @@
-INSERT INTO core.kpp_del_stavbe (
+INSERT INTO {target_table} (
     posel_id,
     sifra_ko,
     ime_ko,
@@ -86,7 +86,7 @@ AND id_posla IS NOT NULL
 AND (opombe_o_nepremicnini IS NULL OR opombe_o_nepremicnini NOT ILIKE '%prodani solastniški deleži%');
 
 
-UPDATE core.kpp_del_stavbe 
+UPDATE {target_table} 
 SET tip_rabe = CASE 
 
     -- PODRTIJA
@@ -1,4 +1,4 @@
-INSERT INTO core.kpp_posel (
+INSERT INTO {target_table} (
     posel_id,
     vrsta_posla,
     datum_uveljavitve,
@@ -3,16 +3,19 @@
 -- =============================================================================
 -- Namen: Ustvari en zapis za vsako nepremičnino (kombinacija sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
 -- ki ima vsaj en zapis vrste 'stanovanje' ali 'hiša'
+-- Placeholderja (zamenja ju get_sql_query):
+--   target_table - ciljna tabela (deduplicirana tabela ali začasna tabela pri inkrementalnem načinu)
+--   omejitev     - dodaten pogoj za nepremičnine (prazen za vse nepremičnine)
 -- =============================================================================
 
-INSERT INTO core.np_del_stavbe_deduplicated (
+INSERT INTO {target_table} (
     sifra_ko, stevilka_stavbe, stevilka_dela_stavbe, dejanska_raba, vrsta_nepremicnine,
     obcina, naselje, ulica, hisna_stevilka, dodatek_hs, stev_stanovanja,
     povrsina_uradna, povrsina_uporabna,
     leto_izgradnje_stavbe, opremljenost,
     zadnja_najemnina, zadnje_vkljuceno_stroski, zadnje_vkljuceno_ddv, zadnja_stopnja_ddv, zadnje_leto,
     zadnje_stevilo_delov_stavb,
-    povezani_del_stavbe_ids, povezani_posel_ids, najnovejsi_del_stavbe_id, coordinates
+    stevilo_poslov, najnovejsi_del_stavbe_id, coordinates
 )
 WITH 
 
@@ -30,6 +33,7 @@ validne_nepremicnine AS (
       AND sifra_ko IS NOT NULL
       AND stevilka_stavbe IS NOT NULL 
       AND stevilka_dela_stavbe IS NOT NULL
+      {omejitev}
 ),
 
 -- KORAK 2: Zberi vse posel_ids za vsako nepremičnino
@@ -47,7 +51,7 @@ vsi_posel_ids_nepremicnine AS (
         ) as vsi_povezani_posel_ids
     FROM validne_nepremicnine vn
     INNER JOIN core.np_del_stavbe ds USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
-    INNER JOIN core.np_posel p ON ds.posel_id = p.posel_id  -- ✅ DODANO
+    INNER JOIN core.np_posel p ON ds.posel_id = p.posel_id AND ds.leto = p.leto  -- ✅ DODANO
     GROUP BY vn.sifra_ko, vn.stevilka_stavbe, vn.stevilka_dela_stavbe
 ),
 
@@ -75,7 +79,7 @@ najnovejsi_zapisi AS (
         ds.posel_id as najnovejsi_posel_id
     FROM validne_nepremicnine vn
     INNER JOIN core.np_del_stavbe ds USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
-    INNER JOIN core.np_posel p ON ds.posel_id = p.posel_id
+    INNER JOIN core.np_posel p ON ds.posel_id = p.posel_id AND ds.leto = p.leto
     WHERE ds.coordinates IS NOT NULL
     ORDER BY 
         vn.sifra_ko, vn.stevilka_stavbe, vn.stevilka_dela_stavbe,
@@ -88,20 +92,7 @@ najnovejsi_zapisi AS (
         ds.posel_id DESC
 ),
 
--- KORAK 4: Najdi vse povezane dele stavb preko poslov
--- ===================================================
-vsi_povezani_del_stavbe AS (
-    SELECT 
-        vpn.sifra_ko, 
-        vpn.stevilka_stavbe, 
-        vpn.stevilka_dela_stavbe,
-        ARRAY_AGG(DISTINCT ds_vsi.del_stavbe_id ORDER BY ds_vsi.del_stavbe_id) as vsi_povezani_del_stavbe_ids
-    FROM vsi_posel_ids_nepremicnine vpn
-    INNER JOIN core.np_del_stavbe ds_vsi ON ds_vsi.posel_id = ANY(vpn.vsi_povezani_posel_ids)
-    GROUP BY vpn.sifra_ko, vpn.stevilka_stavbe, vpn.stevilka_dela_stavbe
-),
-
--- KORAK 5: Najdi najnovejše podatke poslov
+-- KORAK 4: Najdi najnovejše podatke poslov
 -- ===============================================================
 zadnji_podatki_posel AS (
     SELECT DISTINCT ON (vpn.sifra_ko, vpn.stevilka_stavbe, vpn.stevilka_dela_stavbe)
@@ -127,7 +118,7 @@ zadnji_podatki_posel AS (
             posel.posel_id DESC
 ),
 
--- KORAK 6: Identificiraj podvojene najnovejše posle
+-- KORAK 5: Identificiraj podvojene najnovejše posle
 -- =================================================
 podvojeni_zadnji_posli AS (
     SELECT najnovejsi_posel_id
@@ -175,8 +166,8 @@ SELECT
     zpp.zadnje_stevilo_delov_stavb,
     
     -- Povezave
-    vpds.vsi_povezani_del_stavbe_ids as povezani_del_stavbe_ids,
-    vpn.vsi_povezani_posel_ids as povezani_posel_ids,
+    -- (povezani deli stavb in posli so v <prefix>_del_stavbe_posel)
+    COALESCE(cardinality(vpn.vsi_povezani_posel_ids), 0) as stevilo_poslov,
     nz.najnovejsi_del_stavbe_id,
     
     -- Koordinate
@@ -184,7 +175,6 @@ SELECT
 
 FROM najnovejsi_zapisi nz
 LEFT JOIN vsi_posel_ids_nepremicnine vpn USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
-LEFT JOIN vsi_povezani_del_stavbe vpds USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
 LEFT JOIN zadnji_podatki_posel zpp USING (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
 LEFT JOIN podvojeni_zadnji_posli pzp ON nz.najnovejsi_posel_id = pzp.najnovejsi_posel_id
 
@@ -1,4 +1,4 @@
-INSERT INTO core.np_del_stavbe (
+INSERT INTO {target_table} (
 posel_id, 
 sifra_ko,
 ime_ko, 
@@ -77,7 +77,7 @@ AND stevilka_dela_stavbe IS NOT NULL
 AND id_posla IS NOT NULL;
 
 
-UPDATE core.np_del_stavbe 
+UPDATE {target_table} 
 SET tip_rabe = CASE 
 
     -- PODRTIJA
@@ -0,0 +1,101 @@
+-- =============================================================================
+-- POLNJENJE CACHE-A - NAJEMNE STATISTIKE (LETNO IN ZADNJIH 12 MESECEV)
+-- =============================================================================
+-- Namen: En prehod GROUPING SETS čez vrednosti najemnih poslov (vrednosti_najem.sql) izračuna statistike
+-- katastrskih občin, občin in Slovenije za obe vrsti nepremičnin, vsa leta in zadnjih 12 mesecev.
+-- Vsak najem se razširi v obdobja, v katera šteje: vsa leta najema (med 2008 in tekočim letom) in po
+-- potrebi zadnjih 12 mesecev. Število poslov leta so najemi, sklenjeni v tem letu, aktivni najemi leta pa
+-- vsi najemi, ki v letu trajajo. Kvantili cen se izračunajo v istem prehodu, zato zajemajo iste najeme kot
+-- povprečja (letni kvantili vse najeme, ki v letu trajajo).
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table   - ciljna tabela (stats.statistike_cache ali senčna tabela)
+--   vrednosti      - začasna tabela vrednosti najemnih poslov
+--   omejitev_letno - dodaten pogoj za leto letnih vrstic (AND FALSE, če se letne vrstice ne polnijo)
+--   omejitev_12m   - dodaten pogoj za vrstice zadnjih 12 mesecev (AND FALSE, če se ne polnijo)
+--   gamma          - osnova logaritemskih veder kvantilov
+-- =============================================================================
+
+INSERT INTO {target_table} (
+    tip_regije, ime_regije, vrsta_nepremicnine, tip_posla, tip_obdobja, leto,
+    povprecna_cena_m2, povprecna_skupna_cena, stevilo_poslov, aktivna_v_letu, povprecna_velikost_m2,
+    povprecna_starost_stavbe, cena_m2_count, skupna_cena_count, velikost_m2_count, starost_stavbe_count,
+    mediana_cena_m2, p10_cena_m2, p90_cena_m2, mediana_skupna_cena, p10_skupna_cena, p90_skupna_cena
+)
+SELECT
+    -- DIMENZIJE REGIJE
+    -- ================
+    CASE
+        WHEN GROUPING(v.obcina, v.sifra_ko) = 3 THEN 'slovenija'  -- Oba NULL
+        WHEN GROUPING(v.obcina) = 1 THEN 'katastrska_obcina'  -- obcina=NULL, sifra_ko!=NULL
+        ELSE 'obcina'  -- obcina!=NULL, sifra_ko=NULL
+    END as tip_regije,
+
+    CASE
+        WHEN GROUPING(v.obcina, v.sifra_ko) = 3 THEN 'SLOVENIJA'
+        WHEN GROUPING(v.obcina) = 1 THEN v.sifra_ko::TEXT
+        ELSE v.obcina
+    END as ime_regije,
+
+    -- OSTALE DIMENZIJE
+    -- ================
+    v.vrsta_nepremicnine,
+    'najem' as tip_posla,
+    o.tip_obdobja,
+    o.leto,
+
+    -- AGREGIRANE MERIKE (poenotena imena s prodajo)
+    -- ===========================================
+    ROUND(AVG(v.cena_m2), 2) as povprecna_cena_m2,
+    ROUND(AVG(v.skupna_cena), 2) as povprecna_skupna_cena,
+    SUM(o.sklenjen) as stevilo_poslov,
+    SUM(o.aktivna) as aktivna_v_letu,
+    ROUND(AVG(v.povrsina_uporabna)) as povprecna_velikost_m2,
+    ROUND(AVG(v.starost_stavbe)) as povprecna_starost_stavbe,
+
+    -- COUNT STATISTIKE
+    -- ================
+    COUNT(v.cena_m2) as cena_m2_count,
+    COUNT(v.skupna_cena) as skupna_cena_count,
+    COUNT(v.povrsina_uporabna) as velikost_m2_count,
+    COUNT(v.starost_stavbe) as starost_stavbe_count,
+
+    -- KVANTILI (MEDIANA, P10, P90)
+    -- ============================
+    -- Enaka logaritemska vedra kot skice (quantile_sketch.py): kvantil q je vrednost vedra, v katerem kumulativno
+    -- število doseže q * število vseh vrednosti; vrednost vedra i je 2 * gamma^i / (gamma + 1)
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY b.vedro_cena_m2)) / ({gamma} + 1))::NUMERIC, 2) as mediana_cena_m2,
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.1) WITHIN GROUP (ORDER BY b.vedro_cena_m2)) / ({gamma} + 1))::NUMERIC, 2) as p10_cena_m2,
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.9) WITHIN GROUP (ORDER BY b.vedro_cena_m2)) / ({gamma} + 1))::NUMERIC, 2) as p90_cena_m2,
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY b.vedro_skupna_cena)) / ({gamma} + 1))::NUMERIC, 2) as mediana_skupna_cena,
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.1) WITHIN GROUP (ORDER BY b.vedro_skupna_cena)) / ({gamma} + 1))::NUMERIC, 2) as p10_skupna_cena,
+    ROUND((2 * POWER({gamma}, PERCENTILE_DISC(0.9) WITHIN GROUP (ORDER BY b.vedro_skupna_cena)) / ({gamma} + 1))::NUMERIC, 2) as p90_skupna_cena
+
+FROM {vrednosti} v
+CROSS JOIN LATERAL (
+    -- Vedra pozitivnih vrednosti (NULL se v kvantilih ne upošteva)
+    SELECT
+        CASE WHEN v.cena_m2 > 0 THEN CEIL(LN(v.cena_m2) / LN({gamma}))::INTEGER END as vedro_cena_m2,
+        CASE WHEN v.skupna_cena > 0 THEN CEIL(LN(v.skupna_cena) / LN({gamma}))::INTEGER END as vedro_skupna_cena
+) b
+CROSS JOIN LATERAL (
+    -- Leta najema: najem je aktiven v vsakem letu med začetkom in koncem
+    SELECT
+        'letno' as tip_obdobja,
+        leto,
+        CASE WHEN date_part('year', v.mesec) = leto THEN 1 ELSE 0 END as sklenjen,
+        1 as aktivna
+    FROM generate_series(v.leto_zacetka, v.leto_konca) leto
+    WHERE v.v_letno
+    AND leto BETWEEN 2008 AND EXTRACT(YEAR FROM CURRENT_DATE)
+    {omejitev_letno}
+
+    UNION ALL
+
+    SELECT 'zadnjih12m' as tip_obdobja, NULL::INTEGER as leto, 1 as sklenjen, v.aktivna_v_12m as aktivna
+    WHERE v.v_12m {omejitev_12m}
+) o
+GROUP BY GROUPING SETS (
+    (v.sifra_ko, v.vrsta_nepremicnine, o.tip_obdobja, o.leto),     -- Katastrske občine
+    (v.obcina, v.vrsta_nepremicnine, o.tip_obdobja, o.leto),     -- Občine
+    (v.vrsta_nepremicnine, o.tip_obdobja, o.leto)              -- Slovenija
+);
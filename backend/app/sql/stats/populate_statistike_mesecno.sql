@@ -0,0 +1,48 @@
+-- =============================================================================
+-- POLNJENJE MESEČNE KOCKE
+-- =============================================================================
+-- Namen: Seštevki in števci (aditivne mere) poslov po regiji, mesecu sklenitve in vrsti nepremičnine.
+-- Povprečja za poljubno obdobje so vsota / število čez mesece obdobja. Število aktivnih najemov ni
+-- aditivno po mesecih (najem je aktiven več mesecev), zato ga kocka ne vsebuje.
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ciljna tabela (stats.statistike_mesecno ali senčna tabela)
+--   vrednosti    - začasna tabela vrednosti_prodaja.sql ali vrednosti_najem.sql
+--   omejitev     - dodaten pogoj za mesece (prazen za vse mesece)
+--   tip_posla    - 'prodaja' ali 'najem'
+-- =============================================================================
+
+INSERT INTO {target_table} (
+    tip_regije, ime_regije, vrsta_nepremicnine, tip_posla, mesec, stevilo_poslov,
+    vsota_cena_m2, cena_m2_count, vsota_skupna_cena, skupna_cena_count,
+    vsota_velikost_m2, velikost_m2_count, vsota_starost_stavbe, starost_stavbe_count
+)
+SELECT 
+    CASE 
+        WHEN GROUPING(obcina, sifra_ko) = 3 THEN 'slovenija'
+        WHEN GROUPING(obcina) = 1 THEN 'katastrska_obcina'
+        ELSE 'obcina'
+    END as tip_regije,
+    
+    CASE 
+        WHEN GROUPING(obcina, sifra_ko) = 3 THEN 'SLOVENIJA'
+        WHEN GROUPING(obcina) = 1 THEN sifra_ko::TEXT
+        ELSE obcina
+    END as ime_regije,
+    
+    vrsta_nepremicnine,
+    '{tip_posla}' as tip_posla,
+    mesec,
+    COUNT(*) as stevilo_poslov,
+
+    SUM(cena_m2), COUNT(cena_m2),
+    SUM(skupna_cena), COUNT(skupna_cena),
+    SUM(povrsina_uporabna), COUNT(povrsina_uporabna),
+    SUM(starost_stavbe), COUNT(starost_stavbe)
+    
+FROM {vrednosti}
+WHERE v_kocki {omejitev}
+GROUP BY GROUPING SETS (
+    (sifra_ko, vrsta_nepremicnine, mesec),     -- Katastrske občine
+    (obcina, vrsta_nepremicnine, mesec),     -- Občine  
+    (vrsta_nepremicnine, mesec)              -- Slovenija
+);
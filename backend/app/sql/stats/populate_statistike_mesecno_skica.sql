@@ -0,0 +1,63 @@
+-- =============================================================================
+-- POLNJENJE MESEČNIH SKIC KVANTILOV
+-- =============================================================================
+-- Namen: Za vsako regijo, mesec sklenitve in vrsto nepremičnine zgradi skico porazdelitve cene na m² in
+-- skupne cene: število vrednosti v logaritemskih vedrih (vedro = CEIL(LN(x) / LN(gamma)), relativna napaka
+-- kvantila največ (gamma - 1) / (gamma + 1)). Skice se združujejo s seštevanjem števcev istih veder,
+-- zato se skice občin in Slovenije zgradijo iz veder (obcina, sifra_ko) brez ponovnega branja poslov,
+-- skice obdobij pa iz skic mesecev.
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ciljna tabela (stats.statistike_mesecno_skica ali senčna tabela)
+--   vrednosti    - začasna tabela vrednosti_prodaja.sql ali vrednosti_najem.sql
+--   omejitev     - dodaten pogoj za mesece (prazen za vse mesece)
+--   tip_posla    - 'prodaja' ali 'najem'
+--   gamma        - osnova logaritemskih veder
+-- =============================================================================
+
+INSERT INTO {target_table} (
+    tip_regije, ime_regije, vrsta_nepremicnine, tip_posla, mesec, metrika, vedra, stevci
+)
+-- Vedra na najnižjem nivoju (občina, KO)
+WITH osnovna_vedra AS (
+    SELECT obcina, sifra_ko, vrsta_nepremicnine, mesec, metrika, vedro, COUNT(*) as stevilo
+    FROM {vrednosti} v
+    CROSS JOIN LATERAL (VALUES
+        ('cena_m2', v.cena_m2),
+        ('skupna_cena', v.skupna_cena)
+    ) m(metrika, vrednost)
+    CROSS JOIN LATERAL (SELECT CEIL(LN(m.vrednost) / LN({gamma}))::INTEGER as vedro) b
+    WHERE m.vrednost > 0 AND v.v_kocki {omejitev}
+    GROUP BY obcina, sifra_ko, vrsta_nepremicnine, mesec, metrika, vedro
+),
+
+-- Združevanje skic KO -> občina -> Slovenija (seštevanje števcev veder)
+zdruzena_vedra AS (
+    SELECT 
+        CASE 
+            WHEN GROUPING(obcina, sifra_ko) = 3 THEN 'slovenija'
+            WHEN GROUPING(obcina) = 1 THEN 'katastrska_obcina'
+            ELSE 'obcina'
+        END as tip_regije,
+        
+        CASE 
+            WHEN GROUPING(obcina, sifra_ko) = 3 THEN 'SLOVENIJA'
+            WHEN GROUPING(obcina) = 1 THEN sifra_ko::TEXT
+            ELSE obcina
+        END as ime_regije,
+
+        vrsta_nepremicnine, mesec, metrika, vedro,
+        SUM(stevilo) as stevilo
+    FROM osnovna_vedra
+    GROUP BY GROUPING SETS (
+        (sifra_ko, vrsta_nepremicnine, mesec, metrika, vedro),     -- Katastrske občine
+        (obcina, vrsta_nepremicnine, mesec, metrika, vedro),     -- Občine  
+        (vrsta_nepremicnine, mesec, metrika, vedro)              -- Slovenija
+    )
+)
+
+SELECT 
+    tip_regije, ime_regije, vrsta_nepremicnine, '{tip_posla}' as tip_posla, mesec, metrika,
+    ARRAY_AGG(vedro ORDER BY vedro),
+    ARRAY_AGG(stevilo::INTEGER ORDER BY vedro)
+FROM zdruzena_vedra
+GROUP BY tip_regije, ime_regije, vrsta_nepremicnine, mesec, metrika;
@@ -0,0 +1,69 @@
+-- =============================================================================
+-- POLNJENJE PROSTORSKE MREŽE STATISTIK
+-- =============================================================================
+-- Namen: Aditivni seštevki in števci ter skica kvantilov cene na m² po celicah pravokotne mreže
+-- (velikost x velikost stopinj v WGS84), letu sklenitve in vrsti nepremičnine. Statistike poljubnega
+-- območja (bbox ali poligon) so vsote celic območja, mediana pa kvantil združenih skic celic.
+-- Celica (celica_x, celica_y) pokriva [celica_x * velikost, (celica_x + 1) * velikost) po dolžini in
+-- enako po širini.
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ciljna tabela (stats.statistike_mreza ali senčna tabela)
+--   vrednosti    - začasna tabela vrednosti_prodaja.sql ali vrednosti_najem.sql
+--   omejitev     - dodaten pogoj za mesece (prazen za vse mesece)
+--   tip_posla    - 'prodaja' ali 'najem'
+--   gamma        - osnova logaritemskih veder skic
+--   velikost     - velikost celice v stopinjah
+-- =============================================================================
+
+INSERT INTO {target_table} (
+    celica_x, celica_y, tip_posla, vrsta_nepremicnine, leto, stevilo_poslov,
+    vsota_cena_m2, cena_m2_count, vsota_velikost_m2, velikost_m2_count, vedra, stevci
+)
+WITH celice AS (
+    SELECT 
+        FLOOR(ST_X(coordinates) / {velikost})::INTEGER as celica_x,
+        FLOOR(ST_Y(coordinates) / {velikost})::INTEGER as celica_y,
+        vrsta_nepremicnine,
+        date_part('year', mesec)::INTEGER as leto,
+        cena_m2,
+        povrsina_uporabna
+    FROM {vrednosti}
+    WHERE coordinates IS NOT NULL AND v_kocki {omejitev}
+),
+
+vsote AS (
+    SELECT 
+        celica_x, celica_y, vrsta_nepremicnine, leto,
+        COUNT(*) as stevilo_poslov,
+        SUM(cena_m2) as vsota_cena_m2, COUNT(cena_m2) as cena_m2_count,
+        SUM(povrsina_uporabna) as vsota_velikost_m2, COUNT(povrsina_uporabna) as velikost_m2_count
+    FROM celice
+    GROUP BY celica_x, celica_y, vrsta_nepremicnine, leto
+),
+
+vedra AS (
+    SELECT 
+        celica_x, celica_y, vrsta_nepremicnine, leto,
+        CEIL(LN(cena_m2) / LN({gamma}))::INTEGER as vedro,
+        COUNT(*) as stevilo
+    FROM celice
+    WHERE cena_m2 > 0
+    GROUP BY celica_x, celica_y, vrsta_nepremicnine, leto, vedro
+),
+
+skice AS (
+    SELECT 
+        celica_x, celica_y, vrsta_nepremicnine, leto,
+        ARRAY_AGG(vedro ORDER BY vedro) as vedra,
+        ARRAY_AGG(stevilo::INTEGER ORDER BY vedro) as stevci
+    FROM vedra
+    GROUP BY celica_x, celica_y, vrsta_nepremicnine, leto
+)
+
+SELECT 
+    v.celica_x, v.celica_y, '{tip_posla}' as tip_posla, v.vrsta_nepremicnine, v.leto, v.stevilo_poslov,
+    v.vsota_cena_m2, v.cena_m2_count, v.vsota_velikost_m2, v.velikost_m2_count,
+    COALESCE(s.vedra, ARRAY[]::INTEGER[]),
+    COALESCE(s.stevci, ARRAY[]::INTEGER[])
+FROM vsote v
+LEFT JOIN skice s USING (celica_x, celica_y, vrsta_nepremicnine, leto);
@@ -0,0 +1,169 @@
+-- =============================================================================
+-- VREDNOSTI NAJEMNIH POSLOV (EN PREGLED TRANSAKCIJ)
+-- =============================================================================
+-- Namen: Začasna tabela z enim zapisom na del stavbe (obcina, sifra_ko, vrsta_nepremicnine, mesec sklenitve,
+-- leta najema, cena_m2 (najemnina na m²), skupna_cena (najemnina), povrsina_uporabna, starost_stavbe,
+-- coordinates) za vse statistike najema: letne statistike po letih najema in statistike zadnjih 12 mesecev
+-- (populate_statistike_cache_najem.sql), mesečno kocko, mesečne skice kvantilov in prostorsko mrežo.
+-- Transakcije se preberejo enkrat, vsi agregati berejo začasno tabelo.
+-- Zastavice:
+--   v_letno       - najem šteje v letne statistike (datumi po 2008-01-01)
+--   v_kocki       - najem šteje v mesečno kocko, skice in mrežo (v_letno in sklenjen do danes)
+--   v_12m         - najem je sklenjen, začet ali aktiven v zadnjih 12 mesecih
+--   aktivna_v_12m - najem je aktiven v zadnjih 12 mesecih
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ime začasne tabele (izbriše se ob koncu transakcije)
+--   omejitev     - dodaten pogoj za posle (prazen za vse posle, pri inkrementalni osvežitvi spremenjena leta)
+-- =============================================================================
+
+CREATE TEMP TABLE {target_table} ON COMMIT DROP AS
+
+-- KORAK 1: PRIPRAVA OSNOVNIH NAJEMNIH PODATKOV
+-- ============================================
+WITH konstante AS (
+    SELECT DATE '2008-01-01' as MIN_DATUM
+), najemni_podatki AS (
+    SELECT
+        -- Identifikatorji regij
+        n.obcina,
+        n.sifra_ko,
+        np.posel_id,
+
+        -- Vrsta nepremičnine
+        CASE
+            WHEN n.vrsta_nepremicnine = 1 THEN 'hisa'
+            WHEN n.vrsta_nepremicnine = 2 THEN 'stanovanje'
+            ELSE 'drugo'
+        END as vrsta_nepremicnine,
+
+        -- CENOVNI PODATKI
+        -- ==============
+        CASE
+            WHEN np.najemnina IS NOT NULL
+            AND np.najemnina > 0
+            AND np.najemnina < 2000
+            THEN np.najemnina
+            ELSE NULL
+        END as najemnina_osnovna,
+
+        -- VELIKOSTNI PODATKI
+        -- ==================
+        CASE
+            WHEN n.povrsina_uporabna IS NOT NULL
+            AND n.povrsina_uporabna > 5
+            THEN n.povrsina_uporabna
+            ELSE NULL
+        END as povrsina_uporabna,
+
+        -- STAROST STAVBE
+        -- ==============
+        CASE
+            WHEN n.leto_izgradnje_stavbe IS NOT NULL
+            THEN date_part('year', np.datum_uveljavitve) - n.leto_izgradnje_stavbe
+            ELSE NULL
+        END as starost_stavbe,
+
+        -- DATUMI, LETA NAJEMA IN LOKACIJA
+        -- ===============================
+        date_trunc('month', np.datum_sklenitve)::DATE as mesec,
+        EXTRACT(YEAR FROM np.datum_zacetka_najemanja)::INTEGER as leto_zacetka,
+        CASE
+            WHEN np.datum_zakljucka_najema IS NOT NULL
+            THEN EXTRACT(YEAR FROM np.datum_zakljucka_najema)::INTEGER
+            ELSE EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER  -- Za aktivne najeme
+        END as leto_konca,
+        n.coordinates,
+
+        -- ZASTAVICE OBDOBIJ
+        -- =================
+        (
+            np.datum_zacetka_najemanja > k.MIN_DATUM
+            AND (np.datum_zakljucka_najema IS NULL OR np.datum_zakljucka_najema > k.MIN_DATUM)
+            AND np.datum_uveljavitve > k.MIN_DATUM
+            AND np.datum_sklenitve > k.MIN_DATUM
+        ) as v_letno,
+
+        (
+            np.datum_zacetka_najemanja > k.MIN_DATUM
+            AND (np.datum_zakljucka_najema IS NULL OR np.datum_zakljucka_najema > k.MIN_DATUM)
+            AND np.datum_uveljavitve > k.MIN_DATUM
+            AND np.datum_sklenitve > k.MIN_DATUM
+            AND np.datum_sklenitve <= CURRENT_DATE
+        ) as v_kocki,
+
+        (
+            -- Novi najemi sklenjeni v zadnjih 12 mesecih
+            np.datum_sklenitve >= CURRENT_DATE - INTERVAL '12 months'
+            -- Ali najemi, ki so se začeli v zadnjih 12 mesecih
+            OR np.datum_zacetka_najemanja >= CURRENT_DATE - INTERVAL '12 months'
+            -- Ali najemi, ki so bili aktivni v zadnjih 12 mesecih
+            OR (np.datum_zacetka_najemanja < CURRENT_DATE
+                AND (np.datum_zakljucka_najema IS NULL
+                     OR np.datum_zakljucka_najema >= CURRENT_DATE - INTERVAL '12 months'))
+        ) as v_12m,
+
+        CASE
+            WHEN np.datum_zacetka_najemanja <= CURRENT_DATE
+                AND (np.datum_zakljucka_najema IS NULL
+                     OR np.datum_zakljucka_najema >= CURRENT_DATE - INTERVAL '12 months')
+            THEN 1
+            ELSE 0
+        END as aktivna_v_12m
+
+    FROM core.np_del_stavbe n
+    JOIN core.np_posel np ON n.posel_id = np.posel_id AND n.leto = np.leto
+    CROSS JOIN konstante k
+    WHERE
+        -- FILTRIRANJE PODATKOV
+        -- ===================
+        np.vrsta_posla IN (1,2)  -- Samo najemni posli
+        AND n.sifra_ko IS NOT NULL
+        AND n.obcina IS NOT NULL
+        AND np.datum_uveljavitve IS NOT NULL
+        AND n.vrsta_nepremicnine IN (1, 2) -- ni vkljucenih sob (16) ker mislim da bi prevec vplivalo na podatke
+        AND np.datum_zacetka_najemanja IS NOT NULL
+        AND np.datum_sklenitve IS NOT NULL
+        {omejitev}
+),
+
+-- KORAK 2: IZRAČUN KOLIKO VALIDNIH NEPREMIČNIN JE V POSLU IN DELITEV NAJEMNINE S TEM ŠTEVILOM
+-- ==========================================================================================
+filtered_posli AS (
+    SELECT
+        posel_id,
+        COUNT(DISTINCT (obcina, sifra_ko, vrsta_nepremicnine)) as stevilo_delov_stavb
+    FROM najemni_podatki
+    WHERE v_letno OR v_12m
+    GROUP BY posel_id
+),
+
+vsi_posli AS (
+    SELECT
+        posel_id,
+        COUNT(*) as skupno_stevilo_delov_stavb
+    FROM core.np_del_stavbe
+    WHERE posel_id IN (SELECT posel_id FROM filtered_posli)
+    GROUP BY posel_id
+)
+
+SELECT
+    np.obcina, np.sifra_ko, np.vrsta_nepremicnine, np.povrsina_uporabna, np.starost_stavbe, np.mesec,
+    np.leto_zacetka, np.leto_konca, np.coordinates, np.v_letno, np.v_kocki, np.v_12m, np.aktivna_v_12m,
+
+    -- PORAZDELJENA NAJEMNINA
+    -- ======================
+    np.najemnina_osnovna / ps.stevilo_delov_stavb as skupna_cena,
+
+    -- PORAZDELJENA NAJEMNINA NA M2
+    -- ============================
+    CASE
+        WHEN np.povrsina_uporabna IS NOT NULL
+        THEN (np.najemnina_osnovna / ps.stevilo_delov_stavb) / np.povrsina_uporabna
+        ELSE NULL
+    END as cena_m2
+
+FROM najemni_podatki np
+JOIN filtered_posli ps ON np.posel_id = ps.posel_id
+JOIN vsi_posli vsip ON np.posel_id = vsip.posel_id
+WHERE ps.stevilo_delov_stavb <= 15
+AND vsip.skupno_stevilo_delov_stavb <= 25;
@@ -0,0 +1,131 @@
+-- =============================================================================
+-- VREDNOSTI PRODAJNIH POSLOV (EN PREGLED TRANSAKCIJ)
+-- =============================================================================
+-- Namen: Začasna tabela z enim zapisom na del stavbe (obcina, sifra_ko, vrsta_nepremicnine, mesec sklenitve,
+-- cena_m2, skupna_cena, povrsina_uporabna, starost_stavbe, coordinates) za vse statistike prodaje: letne
+-- statistike in statistike zadnjih 12 mesecev (populate_statistike_cache_prodaja.sql), mesečno kocko,
+-- mesečne skice kvantilov in prostorsko mrežo. Transakcije se preberejo enkrat, vsi agregati berejo
+-- začasno tabelo.
+-- Zastavice:
+--   v_letno - posel šteje v letne statistike (leto sklenitve med 2007 in tekočim letom)
+--   v_kocki - posel šteje v mesečno kocko, skice in mrežo (pri prodaji enako kot v_letno)
+--   v_12m   - posel je sklenjen v zadnjih 12 mesecih
+-- Placeholderji (zamenja jih get_sql_query):
+--   target_table - ime začasne tabele (izbriše se ob koncu transakcije)
+--   omejitev     - dodaten pogoj za posle (prazen za vse posle, pri inkrementalni osvežitvi spremenjena leta)
+-- =============================================================================
+
+CREATE TEMP TABLE {target_table} ON COMMIT DROP AS
+
+-- KORAK 1: PRIPRAVA OSNOVNIH PRODAJNIH PODATKOV
+-- =============================================
+WITH prodajni_podatki AS (
+    SELECT
+        -- Identifikatorji
+        k.obcina,
+        k.sifra_ko,
+        kp.posel_id,
+
+        CASE
+            WHEN k.vrsta_nepremicnine = 1 THEN 'hisa'
+            WHEN k.vrsta_nepremicnine = 2 THEN 'stanovanje'
+            ELSE 'drugo'
+        END as vrsta_nepremicnine,
+
+        -- CENOVNI PODATKI
+        -- ==============
+        CASE
+            WHEN kp.cena IS NOT NULL
+            AND kp.cena > 5000
+            AND kp.cena < 5400000
+            THEN kp.cena
+            ELSE NULL
+        END as cena_osnovna,
+
+        -- VELIKOSTNI PODATKI
+        -- ==================
+        CASE
+            WHEN k.povrsina_uporabna IS NOT NULL
+            AND k.povrsina_uporabna > 5
+            THEN k.povrsina_uporabna
+            ELSE NULL
+        END as povrsina_uporabna,
+
+        -- STAROST STAVBE
+        -- ==============
+        CASE
+            WHEN k.leto_izgradnje_stavbe IS NOT NULL
+            THEN date_part('year', kp.datum_sklenitve) - k.leto_izgradnje_stavbe
+            ELSE NULL
+        END as starost_stavbe,
+
+        -- DATUMI IN LOKACIJA
+        -- ==================
+        date_trunc('month', kp.datum_sklenitve)::DATE as mesec,
+        k.coordinates,
+
+        -- ZASTAVICE OBDOBIJ
+        -- =================
+        date_part('year', kp.datum_sklenitve) BETWEEN 2007 AND EXTRACT(YEAR FROM CURRENT_DATE) as v_letno,
+        date_part('year', kp.datum_sklenitve) BETWEEN 2007 AND EXTRACT(YEAR FROM CURRENT_DATE) as v_kocki,
+        kp.datum_sklenitve >= CURRENT_DATE - INTERVAL '12 months' as v_12m
+
+    FROM core.kpp_del_stavbe k
+    JOIN core.kpp_posel kp ON k.posel_id = kp.posel_id AND k.leto = kp.leto
+    WHERE
+        -- FILTRIRANJE PODATKOV
+        -- ===================
+        kp.vrsta_posla IN (1,2)
+        AND k.sifra_ko IS NOT NULL
+        AND k.obcina IS NOT NULL
+        AND kp.datum_sklenitve IS NOT NULL
+        AND (
+            date_part('year', kp.datum_sklenitve) BETWEEN 2007 AND EXTRACT(YEAR FROM CURRENT_DATE)
+            OR kp.datum_sklenitve >= CURRENT_DATE - INTERVAL '12 months'
+        )
+        {omejitev}
+        AND k.vrsta_nepremicnine IN (1, 2)
+        AND k.tip_rabe = 'bivalno'
+        AND k.prodani_delez = '1/1'
+),
+
+-- KORAK 2: IZRAČUN KOLIKO VALIDNIH NEPREMIČNIN JE V POSLU IN DELITEV CENE S TEM ŠTEVILOM
+-- =====================================================================================
+filtered_posli AS (
+    SELECT
+        posel_id,
+        COUNT(*) as bivalno_stevilo_delov_stavb
+    FROM prodajni_podatki
+    GROUP BY posel_id
+),
+
+vsi_posli AS (
+    SELECT
+        posel_id,
+        COUNT(*) as celotno_stevilo_delov_stavb
+    FROM core.kpp_del_stavbe
+    WHERE posel_id IN (SELECT posel_id FROM prodajni_podatki)
+    GROUP BY posel_id
+)
+
+SELECT
+    pp.obcina, pp.sifra_ko, pp.vrsta_nepremicnine, pp.povrsina_uporabna, pp.starost_stavbe, pp.mesec, pp.coordinates,
+    pp.v_letno, pp.v_kocki, pp.v_12m,
+
+    -- PORAZDELJENA CENA
+    -- =================
+    pp.cena_osnovna / ps.bivalno_stevilo_delov_stavb as skupna_cena,
+
+    -- PORAZDELJENA CENA NA M2
+    -- =======================
+    CASE
+        WHEN pp.povrsina_uporabna IS NOT NULL
+        THEN (pp.cena_osnovna / ps.bivalno_stevilo_delov_stavb) / pp.povrsina_uporabna
+        ELSE NULL
+    END as cena_m2
+
+FROM prodajni_podatki pp
+JOIN filtered_posli ps ON pp.posel_id = ps.posel_id
+JOIN vsi_posli vsip ON pp.posel_id = vsip.posel_id
+WHERE ps.bivalno_stevilo_delov_stavb <= 15
+AND vsip.celotno_stevilo_delov_stavb <= 25;
@@ -1,17 +1,25 @@
 import os
+import re
 from .logging_utils import setup_logger
 from sqlalchemy import text
 
 logger = setup_logger("sql", "sql.log", "SQL")
 
-def get_sql_query(filename):
-    """Prebere SQL poizvedbo iz datoteke."""
+def get_sql_query(filename, **placeholders):
+    """Prebere SQL poizvedbo iz datoteke.
+
+    Če so podani placeholders, se v poizvedbi zamenjajo oznake oblike {ime}
+    (npr. {target_table} v transform skriptah).
+    """
     sql_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
     query_path = os.path.join(sql_dir, filename)
-    
+
     with open(query_path, 'r', encoding='utf-8') as f:
         query = f.read()
-    
+
+    if placeholders:
+        query = query.format(**placeholders)
+
     return query
 
 def execute_sql_file(engine, filename, params=None):
@@ -85,6 +93,82 @@ def execute_sql_count(engine, schema, table):
             logger.error(f"Izvirna napaka: {str(e.orig)}")
         raise
 
+def record_row_count(conn, schema, table, count):
+    """Zapiše natančno število vrstic tabele (iz rowcount stavka, ki je tabelo napolnil).
+    
+    Klic naj bo v isti transakciji kot stavek, ki je tabelo napolnil.
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Ime tabele (pri particioniranih tabelah ime particije)
+        count: Število vrstic
+    """
+    conn.execute(text("""
+        INSERT INTO pipeline.stevilo_vrstic (tabela, stevilo, posodobljeno)
+        VALUES (:tabela, :stevilo, NOW())
+        ON CONFLICT (tabela) DO UPDATE SET stevilo = EXCLUDED.stevilo, posodobljeno = EXCLUDED.posodobljeno
+    """), {"tabela": f"{schema}.{table}", "stevilo": count})
+
+def adjust_row_count(conn, schema, table, delta):
+    """Prišteje spremembo (vstavljene - izbrisane vrstice) k zabeleženemu številu vrstic tabele.
+    
+    Če število še ni zabeleženo, se začne pri oceni iz pg_class.reltuples.
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Ime tabele (pri particioniranih tabelah ime particije)
+        delta: Sprememba števila vrstic
+    """
+    conn.execute(text("""
+        INSERT INTO pipeline.stevilo_vrstic (tabela, stevilo, posodobljeno)
+        SELECT :tabela, GREATEST(COALESCE(c.reltuples, 0), 0)::BIGINT + :delta, NOW()
+        FROM (SELECT 1) x
+        LEFT JOIN pg_class c ON c.oid = to_regclass(:tabela)
+        ON CONFLICT (tabela) DO UPDATE SET
+            stevilo = pipeline.stevilo_vrstic.stevilo + :delta,
+            posodobljeno = EXCLUDED.posodobljeno
+    """), {"tabela": f"{schema}.{table}", "delta": delta})
+
+def get_row_count(conn, schema, table):
+    """Vrne število vrstic tabele brez pregledovanja tabele.
+    
+    Uporabi zabeleženo število iz pipeline.stevilo_vrstic, sicer oceno pg_class.reltuples.
+    Pri particionirani tabeli se seštejejo njene particije.
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Ime tabele
+        
+    Returns:
+        Število vrstic v tabeli
+    """
+    try:
+        result = conn.execute(text("""
+            WITH tabele AS (
+                SELECT c.oid, c.reltuples
+                FROM pg_class c
+                WHERE c.oid = to_regclass(:tabela) AND c.relkind <> 'p'
+                UNION ALL
+                SELECT c.oid, c.reltuples
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(:tabela)
+            )
+            SELECT COALESCE(SUM(COALESCE(sv.stevilo, GREATEST(t.reltuples, 0)::BIGINT)), 0)
+            FROM tabele t
+            JOIN pg_class c ON c.oid = t.oid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pipeline.stevilo_vrstic sv ON sv.tabela = n.nspname || '.' || c.relname
+        """), {"tabela": f"{schema}.{table}"}).scalar()
+        logger.info(f"Število vrstic v {schema}.{table}: {result}")
+        return int(result)
+    except Exception as e:
+        logger.error(f"Napaka pri branju števila vrstic {schema}.{table}: {str(e)}")
+        raise
+
 def execute_sql_query(engine, query, params=None):
     """Izvede poljubno SQL poizvedbo.
     
@@ -130,4 +214,136 @@ def execute_sql_query(engine, query, params=None):
                 raise
     except Exception as e:
         logger.error(f"Napaka povezave pri izvajanju SQL poizvedbe: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def get_index_definitions(conn, schema, table):
+    """Vrne definicije indeksov tabele, ki ne pripadajo omejitvam (PK, unique).
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Ime tabele
+        
+    Returns:
+        Seznam slovarjev z ključema 'name' in 'definition' (pg_indexes.indexdef)
+    """
+    rows = conn.execute(text("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = :schema
+          AND i.tablename = :table
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = format('%I.%I', i.schemaname, i.indexname)::regclass
+          )
+        ORDER BY i.indexname
+    """), {"schema": schema, "table": table}).fetchall()
+
+    return [{"name": row[0], "definition": row[1]} for row in rows]
+
+def get_constraint_definitions(conn, schema, table, types=('p', 'u')):
+    """Vrne definicije omejitev tabele (privzeto PK in unique).
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Ime tabele
+        types: Tipi omejitev iz pg_constraint.contype
+        
+    Returns:
+        Seznam slovarjev z ključema 'name' in 'definition' (pg_get_constraintdef)
+    """
+    rows = conn.execute(text("""
+        SELECT con.conname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+          AND c.relname = :table
+          AND con.contype = ANY(:types)
+        ORDER BY con.conname
+    """), {"schema": schema, "table": table, "types": list(types)}).fetchall()
+
+    return [{"name": row[0], "definition": row[1]} for row in rows]
+
+def clone_index_definition(definition, target_table, index_name=None):
+    """Prepiše definicijo indeksa (pg_indexes.indexdef) za drugo tabelo.
+    
+    Args:
+        definition: Izvirna definicija, npr. 'CREATE INDEX idx ON ONLY core.t USING btree (a)'
+        target_table: Tabela, na kateri naj se indeks ustvari
+        index_name: Ime novega indeksa; če ni podano, ga izbere PostgreSQL
+        
+    Returns:
+        CREATE INDEX stavek za ciljno tabelo
+    """
+    def replace(match):
+        unique = match.group(1) or ''
+        name = f"{index_name} " if index_name else ''
+        return f"CREATE {unique}INDEX {name}ON {target_table} "
+
+    return re.sub(r'^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ ', replace, definition, count=1)
+
+def clone_indexes_and_constraints(conn, schema, source_table, target_table, suffix):
+    """Na ciljni tabeli ustvari enake PK/unique omejitve in indekse kot na izvorni tabeli.
+    
+    Imenom omejitev in indeksov se doda suffix, da ne pride do konflikta z imeni na izvorni tabeli.
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme obeh tabel
+        source_table: Tabela, s katere se prepišejo definicije
+        target_table: Tabela, na kateri se ustvarijo
+        suffix: Pripona imen (npr. '_novo')
+    """
+    for constraint in get_constraint_definitions(conn, schema, source_table):
+        conn.execute(text(f"ALTER TABLE {schema}.{target_table} ADD CONSTRAINT {constraint['name']}{suffix} {constraint['definition']}"))
+
+    for index in get_index_definitions(conn, schema, source_table):
+        conn.execute(text(clone_index_definition(index['definition'], f"{schema}.{target_table}", f"{index['name']}{suffix}")))
+
+    logger.info(f"Indeksi in omejitve {schema}.{source_table} ustvarjeni na {schema}.{target_table}")
+
+def swap_shadow_table(conn, schema, table, shadow_table, suffix):
+    """Zamenja tabelo z njeno senčno tabelo s preimenovanjem in izbriše staro tabelo.
+    
+    Klic mora biti znotraj transakcije klicatelja, da bralci vidijo samo staro ali samo novo tabelo.
+    Senčna tabela mora imeti omejitve in indekse z imeni <ime><suffix> (clone_indexes_and_constraints),
+    ki se po zamenjavi preimenujejo v izvirna imena. Sekvence (SERIAL) se prenesejo na novo tabelo.
+    
+    Args:
+        conn: SQLAlchemy povezava
+        schema: Ime sheme
+        table: Tabela, ki jo bralci uporabljajo
+        shadow_table: Senčna tabela z novimi podatki
+        suffix: Pripona imen omejitev in indeksov senčne tabele
+    """
+    old_table = f"{table}_staro"
+    constraints = get_constraint_definitions(conn, schema, table)
+    indexes = get_index_definitions(conn, schema, table)
+    sequences = conn.execute(text("""
+        SELECT column_name, pg_get_serial_sequence(format('%I.%I', table_schema, table_name), column_name)
+        FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+    """), {"schema": schema, "table": table}).fetchall()
+
+    # Stara tabela in njeni indeksi dobijo pripono _staro, da se sprostijo imena
+    for constraint in constraints:
+        conn.execute(text(f"ALTER TABLE {schema}.{table} RENAME CONSTRAINT {constraint['name']} TO {constraint['name']}_staro"))
+    for index in indexes:
+        conn.execute(text(f"ALTER INDEX {schema}.{index['name']} RENAME TO {index['name']}_staro"))
+    conn.execute(text(f"ALTER TABLE {schema}.{table} RENAME TO {old_table}"))
+
+    conn.execute(text(f"ALTER TABLE {schema}.{shadow_table} RENAME TO {table}"))
+    for constraint in constraints:
+        conn.execute(text(f"ALTER TABLE {schema}.{table} RENAME CONSTRAINT {constraint['name']}{suffix} TO {constraint['name']}"))
+    for index in indexes:
+        conn.execute(text(f"ALTER INDEX {schema}.{index['name']}{suffix} RENAME TO {index['name']}"))
+
+    # Sekvenca je v lasti stolpca stare tabele in bi se izbrisala skupaj z njo
+    for column, sequence in sequences:
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {schema}.{table}.{column}"))
+
+    conn.execute(text(f"DROP TABLE {schema}.{old_table}"))
+    logger.info(f"Tabela {schema}.{table} zamenjana s senčno tabelo {schema}.{shadow_table}")
@@ -0,0 +1,396 @@
+"""
+Indeks statistik v pomnilniku API procesa.
+
+Celoten stats.statistike_cache se naloži enkrat in preoblikuje v končne odgovore endpointov
+(splošne statistike po regiji, posli in cene na m² za vse občine), zato endpointi statistik
+ne berejo baze. Podatki zemljevida vseh občin in KO (choropleth) so vzporedni stolpci, ob nalaganju indeksa
+kodirani v JSON in Arrow IPC. Odgovori /api/statistike/vse so že ob posodobitvi statistik zapisani kot kodiran JSON
+v stats.statistike_dokument in se naložijo kot bajti, ki se vrnejo brez dekodiranja. Cache se spremeni samo ob posodobitvi statistik (tedensko), ki poveča
+stats.statistike_verzija; indeks preveri verzijo največ vsakih STATS_INDEX_CHECK_INTERVAL_S sekund
+in se ob spremembi zgradi na novo ter zamenja v celoti (bralci vidijo staro ali novo verzijo).
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import pyarrow as pa
+from sqlalchemy import text
+
+from .logging_utils import setup_logger
+
+logger = setup_logger("statistics", "statistics.log", "STATS")
+
+# Največji zamik (v sekundah) med posodobitvijo statistik v workerju in novimi podatki v API procesu
+STATS_INDEX_CHECK_INTERVAL_S = float(os.environ.get("STATS_INDEX_CHECK_INTERVAL_S", "60"))
+
+# Leto, za katero se vračajo splošne statistike
+SPLOSNE_LETO = 2025
+
+TIPI_REGIJ_OBCIN = ["obcina", "katastrska_obcina"]
+
+# Formati odgovora /api/statistike/choropleth in njihovi media type
+CHOROPLETH_FORMATI = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Metrike, ki jih lahko izbere /api/statistike/batch (privzeto vse); celoštevilske se vrnejo kot int
+BATCH_METRIKE = [
+    "povprecna_cena_m2", "povprecna_skupna_cena",
+    "mediana_cena_m2", "p10_cena_m2", "p90_cena_m2", "mediana_skupna_cena", "p10_skupna_cena", "p90_skupna_cena",
+    "stevilo_poslov", "aktivna_v_letu", "povprecna_velikost_m2", "povprecna_starost_stavbe",
+]
+BATCH_CELOSTEVILSKE_METRIKE = {"stevilo_poslov", "aktivna_v_letu"}
+
+# Stolpci cache, iz katerih se gradijo odgovori (indeks in dokumenti)
+CACHE_ROWS_QUERY = """
+    SELECT
+        tip_regije, ime_regije, vrsta_nepremicnine, tip_posla, tip_obdobja, leto,
+        povprecna_cena_m2, povprecna_skupna_cena, stevilo_poslov, aktivna_v_letu,
+        povprecna_velikost_m2, povprecna_starost_stavbe,
+        mediana_cena_m2, p10_cena_m2, p90_cena_m2, mediana_skupna_cena, p10_skupna_cena, p90_skupna_cena
+    FROM stats.statistike_cache
+"""
+
+
+def _float_or_none(value):
+    return float(value) if value else None
+
+
+def _quantiles(row) -> Dict[str, Optional[float]]:
+    """Mediana, p10 in p90 cene na m² in skupne cene vrstice cache"""
+    return {
+        stolpec: _float_or_none(getattr(row, stolpec))
+        for stolpec in ("mediana_cena_m2", "p10_cena_m2", "p90_cena_m2", "mediana_skupna_cena", "p10_skupna_cena", "p90_skupna_cena")
+    }
+
+
+def build_full_statistics(rows: list) -> Dict[str, Any]:
+    """Organizira vrstice cache ene regije po prodaja/najem × stanovanje/hisa × letno/zadnjih12m"""
+    statistike = {
+        "prodaja": {
+            "stanovanje": {"letno": [], "zadnjih12m": None},
+            "hisa": {"letno": [], "zadnjih12m": None}
+        },
+        "najem": {
+            "stanovanje": {"letno": [], "zadnjih12m": None},
+            "hisa": {"letno": [], "zadnjih12m": None}
+        },
+    }
+
+    # Letni podatki od najnovejšega leta naprej
+    for row in sorted(rows, key=lambda r: -(r.leto or 0)):
+        podatek = {
+            "leto": row.leto,
+            "cene": {
+                "povprecna_cena_m2": _float_or_none(row.povprecna_cena_m2),
+                "povprecna_skupna_cena": _float_or_none(row.povprecna_skupna_cena),
+                **_quantiles(row),
+            },
+            "aktivnost": {
+                "stevilo_poslov": row.stevilo_poslov,
+                "aktivna_v_letu": row.aktivna_v_letu
+            },
+            "lastnosti": {
+                "povprecna_velikost_m2": _float_or_none(row.povprecna_velikost_m2),
+                "povprecna_starost_stavbe": row.povprecna_starost_stavbe,
+            }
+        }
+
+        if row.tip_obdobja == "letno":
+            statistike[row.tip_posla][row.vrsta_nepremicnine]["letno"].append(podatek)
+        else:  # zadnjih12m
+            statistike[row.tip_posla][row.vrsta_nepremicnine]["zadnjih12m"] = podatek
+
+    return statistike
+
+
+def group_by_region(rows: list) -> Dict[Tuple[str, str], List]:
+    """Razdeli vrstice cache po ključu regije (tip_regije, ime_regije)"""
+    po_regijah: Dict[Tuple[str, str], List] = {}
+    for row in rows:
+        po_regijah.setdefault((row.tip_regije, row.ime_regije), []).append(row)
+    return po_regijah
+
+
+def encode_document(document: Dict[str, Any]) -> bytes:
+    """Kodira odgovor enako kot JSONResponse (UTF-8, brez presledkov), da se lahko vrne brez ponovnega kodiranja"""
+    return json.dumps(document, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_full_documents(rows: list) -> Dict[Tuple[str, str], bytes]:
+    """Za vsako regijo zgradi celoten odgovor /api/statistike/vse in ga kodira v JSON"""
+    return {
+        kljuc: encode_document({"status": "success", "statistike": build_full_statistics(vrstice)})
+        for kljuc, vrstice in group_by_region(rows).items()
+    }
+
+
+def build_batch_statistics(rows: list, metrike: List[str], obdobja: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Kompaktne statistike regije za primerjavo: {tip_posla: {vrsta: {obdobje: {metrika: vrednost}}}}, kjer je
+    obdobje "zadnjih12m" ali leto kot niz. obdobja: izbrana obdobja v enaki obliki (None za vsa).
+    """
+    statistike: Dict[str, Any] = {}
+    for row in sorted(rows, key=lambda r: -(r.leto or 0)):
+        obdobje = "zadnjih12m" if row.tip_obdobja == "zadnjih12m" else str(row.leto)
+        if obdobja is not None and obdobje not in obdobja:
+            continue
+
+        statistike.setdefault(row.tip_posla, {}).setdefault(row.vrsta_nepremicnine, {})[obdobje] = {
+            metrika: (getattr(row, metrika) if metrika in BATCH_CELOSTEVILSKE_METRIKE else _float_or_none(getattr(row, metrika)))
+            for metrika in metrike
+        }
+
+    return statistike
+
+
+def build_general_statistics(regija: str, tip_regije: str, rows: list) -> Optional[Dict[str, Any]]:
+    """Splošne statistike regije za leto SPLOSNE_LETO; None, če regija za to leto nima podatkov"""
+    rows = [row for row in rows if row.tip_obdobja == "letno" and row.leto == SPLOSNE_LETO]
+    if not rows:
+        return None
+
+    splosne = {
+        "regija": regija,
+        "tip_regije": tip_regije,
+        "obdobje": "zadnjih_12_mesecev",
+        "pregled": {},
+    }
+
+    for row in sorted(rows, key=lambda r: (r.tip_posla, r.vrsta_nepremicnine)):
+        splosne["pregled"][f"{row.tip_posla}_{row.vrsta_nepremicnine}"] = {
+            "tip_posla": row.tip_posla,
+            "vrsta_nepremicnine": row.vrsta_nepremicnine,
+            "povprecna_cena_m2": _float_or_none(row.povprecna_cena_m2),
+            "povprecna_skupna_cena": _float_or_none(row.povprecna_skupna_cena),
+            **_quantiles(row),
+            "stevilo_poslov": row.stevilo_poslov,
+            "aktivna_v_letu": row.aktivna_v_letu,
+            "povprecna_velikost_m2": _float_or_none(row.povprecna_velikost_m2),
+            "povprecna_starost_stavbe": row.povprecna_starost_stavbe
+        }
+
+    return splosne
+
+
+def build_posli_zadnjih_12m(rows: list) -> Dict[str, Any]:
+    """Število poslov zadnjih 12 mesecev po regijah enega tipa (vrstice tipa obdobja zadnjih12m)"""
+    regije = {}
+
+    for row in rows:
+        if row.ime_regije not in regije:
+            regije[row.ime_regije] = {
+                "name": row.ime_regije,
+                "prodaja": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
+                "najem": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
+                "skupaj_vsi_posli": 0
+            }
+
+        regija = regije[row.ime_regije]
+        if row.tip_posla not in regija or row.vrsta_nepremicnine not in regija[row.tip_posla]:
+            continue
+        stevilo = row.stevilo_poslov or 0
+        regija[row.tip_posla][row.vrsta_nepremicnine] += stevilo
+        regija[row.tip_posla]["skupaj"] += stevilo
+        regija["skupaj_vsi_posli"] += stevilo
+
+    return regije
+
+
+def build_cene_m2_zadnjih_12m(rows: list) -> Dict[str, Any]:
+    """
+    Povprečne cene na m² zadnjih 12 mesecev po regijah enega tipa, s tehtanim povprečjem
+    stanovanj in hiš glede na število poslov
+    """
+    skupine = {}
+    for row in rows:
+        if row.povprecna_cena_m2 is None or not row.stevilo_poslov or row.stevilo_poslov <= 0:
+            continue
+        skupina = skupine.setdefault((row.ime_regije, row.tip_posla, row.vrsta_nepremicnine), {"cene": [], "posli": 0})
+        skupina["cene"].append(float(row.povprecna_cena_m2))
+        skupina["posli"] += row.stevilo_poslov
+
+    regije = {}
+    for (ime_regije, tip_posla, vrsta_nep), skupina in skupine.items():
+        if ime_regije not in regije:
+            regije[ime_regije] = {
+                "name": ime_regije,
+                "prodaja": {
+                    "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
+                    "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
+                    "skupna_povprecna_cena_m2": 0,
+                    "skupaj_poslov": 0
+                },
+                "najem": {
+                    "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
+                    "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
+                    "skupna_povprecna_cena_m2": 0,
+                    "skupaj_poslov": 0
+                }
+            }
+
+        if tip_posla not in regije[ime_regije] or vrsta_nep not in regije[ime_regije][tip_posla]:
+            continue
+        regije[ime_regije][tip_posla][vrsta_nep]["cena_m2"] = sum(skupina["cene"]) / len(skupina["cene"])
+        regije[ime_regije][tip_posla][vrsta_nep]["stevilo_poslov"] = skupina["posli"]
+        regije[ime_regije][tip_posla]["skupaj_poslov"] += skupina["posli"]
+
+    # Tehtano povprečje stanovanj in hiš
+    for regija in regije.values():
+        for tip_posla in ["prodaja", "najem"]:
+            stanovanje = regija[tip_posla]["stanovanje"]
+            hisa = regija[tip_posla]["hisa"]
+            skupaj_poslov = stanovanje["stevilo_poslov"] + hisa["stevilo_poslov"]
+
+            if skupaj_poslov > 0:
+                skupna_cena_m2 = (
+                    (stanovanje["cena_m2"] * stanovanje["stevilo_poslov"] + hisa["cena_m2"] * hisa["stevilo_poslov"]) / skupaj_poslov
+                )
+                regija[tip_posla]["skupna_povprecna_cena_m2"] = round(skupna_cena_m2, 2)
+
+    return regije
+
+
+def build_choropleth(posli: Dict[str, Any], cene: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Vzporedni stolpci za zemljevid regij enega tipa (regija, število poslov in cene na m² zadnjih 12 mesecev
+    po tipu posla in vrsti nepremičnine ter skupaj) iz build_posli_zadnjih_12m in build_cene_m2_zadnjih_12m.
+    Manjkajoča cena je None.
+    """
+    regije = sorted(set(posli) | set(cene))
+    stolpci = {"regija": regije}
+
+    for tip_posla in ("prodaja", "najem"):
+        posli_tipa = [posli[r][tip_posla] if r in posli else None for r in regije]
+        cene_tipa = [cene[r][tip_posla] if r in cene else None for r in regije]
+
+        for vrsta in ("stanovanje", "hisa"):
+            stolpci[f"posli_{tip_posla}_{vrsta}"] = [p[vrsta] if p else 0 for p in posli_tipa]
+        stolpci[f"posli_{tip_posla}"] = [p["skupaj"] if p else 0 for p in posli_tipa]
+
+        for vrsta in ("stanovanje", "hisa"):
+            stolpci[f"cena_m2_{tip_posla}_{vrsta}"] = [round(c[vrsta]["cena_m2"], 2) if c and c[vrsta]["cena_m2"] else None for c in cene_tipa]
+        stolpci[f"cena_m2_{tip_posla}"] = [(c["skupna_povprecna_cena_m2"] or None) if c else None for c in cene_tipa]
+
+    return stolpci
+
+
+def encode_choropleth_arrow(choropleth: Dict[str, Dict[str, list]], verzija: int) -> bytes:
+    """Kodira stolpce choropleth vseh tipov regij v eno tabelo Arrow IPC (stream) s stolpcem tip_regije"""
+    tipi = list(choropleth)
+    stolpci = {"tip_regije": pa.array([tip for tip in tipi for _ in choropleth[tip]["regija"]]).dictionary_encode()}
+    for ime in choropleth[tipi[0]]:
+        vrednosti = [v for tip in tipi for v in choropleth[tip][ime]]
+        if ime == "regija":
+            stolpci[ime] = pa.array(vrednosti, pa.string())
+        elif ime.startswith("posli_"):
+            stolpci[ime] = pa.array(vrednosti, pa.int32())
+        else:
+            stolpci[ime] = pa.array(vrednosti, pa.float32())
+
+    tabela = pa.table(stolpci).replace_schema_metadata({"obdobje": "zadnjih_12_mesecev", "verzija": str(verzija)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().to_pybytes()
+
+
+class StatisticsIndex:
+    """
+    Nespremenljiv indeks ene verzije cache statistik, ključ regije je (tip_regije, ime_regije).
+    documents so kodirani odgovori /api/statistike/vse iz stats.statistike_dokument.
+    """
+
+    def __init__(self, rows: list, documents: Dict[Tuple[str, str], bytes] = None, verzija: int = 0):
+        self.verzija = verzija
+        self.documents = documents or {}
+
+        self.general = {}
+        self.rows_by_region = group_by_region(rows)
+        for (tip_regije, ime_regije), vrstice in self.rows_by_region.items():
+            splosne = build_general_statistics(ime_regije, tip_regije, vrstice)
+            if splosne is not None:
+                self.general[(tip_regije, ime_regije)] = splosne
+
+        zadnjih_12m = [row for row in rows if row.tip_obdobja == "zadnjih12m"]
+        self.posli_12m = {
+            tip_regije: build_posli_zadnjih_12m([row for row in zadnjih_12m if row.tip_regije == tip_regije])
+            for tip_regije in TIPI_REGIJ_OBCIN
+        }
+        self.cene_m2_12m = {
+            tip_regije: build_cene_m2_zadnjih_12m([row for row in zadnjih_12m if row.tip_regije == tip_regije])
+            for tip_regije in TIPI_REGIJ_OBCIN
+        }
+
+        # Kodirani odgovori /api/statistike/choropleth po (format, vkljuci_katastrske)
+        self.choropleth = {}
+        for vkljuci_katastrske in (True, False):
+            choropleth = {
+                tip_regije: build_choropleth(self.posli_12m[tip_regije], self.cene_m2_12m[tip_regije])
+                for tip_regije in TIPI_REGIJ_OBCIN
+                if vkljuci_katastrske or tip_regije == "obcina"
+            }
+            self.choropleth[("json", vkljuci_katastrske)] = encode_document(
+                {"status": "success", "obdobje": "zadnjih_12_mesecev", "verzija": verzija, **choropleth}
+            )
+            self.choropleth[("arrow", vkljuci_katastrske)] = encode_choropleth_arrow(choropleth, verzija)
+
+        self.stevilo_zapisov = len(rows)
+
+
+class StatisticsIndexHolder:
+    """Hrani trenutni StatisticsIndex in ga ob spremembi stats.statistike_verzija zgradi na novo."""
+
+    def __init__(self, engine, check_interval: float = STATS_INDEX_CHECK_INTERVAL_S):
+        self.engine = engine
+        self.check_interval = check_interval
+        self._index: Optional[StatisticsIndex] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> StatisticsIndex:
+        """
+        Vrne trenutni indeks. Ob preteku intervala preveri verzijo cache in po potrebi naloži novo verzijo;
+        če baza ni dosegljiva, ostane obstoječi indeks (napaka se sproži samo, če indeksa še ni).
+        """
+        index = self._index
+        if index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return index
+
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._index
+            try:
+                self._reload_if_changed()
+            except Exception as e:
+                if self._index is None:
+                    logger.error(f"Napaka pri nalaganju indeksa statistik: {str(e)}")
+                    raise
+                logger.warning(f"Preverjanje verzije statistik ni uspelo, uporabljam verzijo {self._index.verzija}: {str(e)}")
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self):
+        """Ob naslednjem klicu get() preveri verzijo ne glede na interval"""
+        self._checked_at = 0.0
+
+    def _reload_if_changed(self):
+        with self.engine.connect() as conn:
+            verzija = conn.execute(text("SELECT verzija FROM stats.statistike_verzija")).scalar() or 0
+            if self._index is not None and self._index.verzija == verzija:
+                return
+
+            start = time.perf_counter()
+            rows = conn.execute(text(CACHE_ROWS_QUERY)).fetchall()
+            documents = {
+                (row.tip_regije, row.ime_regije): bytes(row.dokument)
+                for row in conn.execute(text("SELECT tip_regije, ime_regije, dokument FROM stats.statistike_dokument"))
+            }
+
+        # Nov indeks se zgradi v celoti, nato se zamenja referenca
+        self._index = StatisticsIndex(rows, documents, verzija)
+        logger.info(f"Indeks statistik naložen: verzija {verzija}, {len(rows)} zapisov, "
+                    f"{len(documents)} dokumentov v {time.perf_counter() - start:.2f} s")
@@ -1,16 +1,258 @@
-from typing import Dict, Any
+import json
+import math
+from datetime import date, datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
 from sqlalchemy import text
-from .logging_utils import setup_logger
-from .sql_utils import get_sql_query
+from .logging_utils import setup_logger, timed_phase
+from .sql_utils import get_sql_query, record_row_count, adjust_row_count, get_row_count, clone_indexes_and_constraints, swap_shadow_table
 from .database import get_engine
+from .deduplication import SHADOW_SUFFIX
+from .statistics_index import StatisticsIndexHolder, CACHE_ROWS_QUERY, BATCH_METRIKE, render_full_documents, build_batch_statistics
+from .quantile_sketch import SKICA_GAMMA, merge_sketches, sketch_quantile, sketch_quantiles
 
 logger = setup_logger("statistics", "statistics.log", "STATS")
 
+# Statistike po tipu posla: (skripta začasne tabele vrednosti poslov, skripta polnjenja cache z GROUPING SETS,
+# pogoj za posle spremenjenih let in pogoj za posle zadnjih 12 mesecev pri inkrementalni osvežitvi)
+STATS_IZRACUNI = {
+    "prodaja": (
+        "stats/vrednosti_prodaja.sql", "stats/populate_statistike_cache_prodaja.sql",
+        "date_part('year', kp.datum_sklenitve) IN ({leta})",
+        "kp.datum_sklenitve >= CURRENT_DATE - INTERVAL '12 months'"
+    ),
+    "najem": (
+        "stats/vrednosti_najem.sql", "stats/populate_statistike_cache_najem.sql",
+        # Letne statistike leta zajemajo vse najeme, ki v letu trajajo, kocka pa najeme, sklenjene v letu
+        "(date_part('year', np.datum_sklenitve) IN ({leta}) OR (EXTRACT(YEAR FROM np.datum_zacetka_najemanja) <= {do_leta}"
+        " AND COALESCE(EXTRACT(YEAR FROM np.datum_zakljucka_najema), EXTRACT(YEAR FROM CURRENT_DATE)) >= {od_leta}))",
+        "(np.datum_sklenitve >= CURRENT_DATE - INTERVAL '12 months' OR np.datum_zacetka_najemanja >= CURRENT_DATE - INTERVAL '12 months'"
+        " OR np.datum_zakljucka_najema IS NULL OR np.datum_zakljucka_najema >= CURRENT_DATE - INTERVAL '12 months')"
+    ),
+}
+
+# Agregati iz začasne tabele vrednosti: tabela -> (skripta polnjenja, izraz leta sklenitve vrstice za inkrementalno osvežitev)
+STATS_AGREGATI = {
+    "statistike_mesecno": ("stats/populate_statistike_mesecno.sql", "date_part('year', mesec)::INTEGER"),
+    "statistike_mesecno_skica": ("stats/populate_statistike_mesecno_skica.sql", "date_part('year', mesec)::INTEGER"),
+    "statistike_mreza": ("stats/populate_statistike_mreza.sql", "leto"),
+}
+
+# Tabele, ki se ob polni posodobitvi zgradijo kot senčne tabele in zamenjajo v isti transakciji
+STATS_CACHE_TABLES = ["statistike_cache"] + list(STATS_AGREGATI)
+
+# Velikost celice prostorske mreže statistik v stopinjah (≈ 550 m po širini in 390 m po dolžini v Sloveniji)
+STATS_MREZA_VELIKOST = 0.005
+
+# Največ regij v enem klicu /api/statistike/batch
+STATS_BATCH_MAX_REGIJ = 200
+
+# full: celoten cache, incremental: samo leta iz stats.spremenjena_leta (in zadnjih 12 mesecev)
+STATS_MODES = ["full", "incremental"]
+
+
+def needs_12m_refresh(okno_12m: date, danes: date, leta: Iterable[int]) -> bool:
+    """Statistike zadnjih 12 mesecev je treba preračunati, če se je okno premaknilo ali so se spremenila leta v oknu."""
+    if okno_12m != danes:
+        return True
+    return any(leto >= danes.year - 1 for leto in leta)
+
+
+def _parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Neveljaven mesec '{value}', pričakovan format YYYY-MM")
+
+
+def _add_months(mesec: date, n: int) -> date:
+    leto, indeks = divmod(mesec.year * 12 + mesec.month - 1 + n, 12)
+    return date(leto, indeks + 1, 1)
+
+
+def resolve_period(od: Optional[str], do: Optional[str], zadnjih_mesecev: Optional[int], danes: date) -> Tuple[date, date]:
+    """
+    Vrne prvi in zadnji mesec obdobja (oba vključno) iz od/do (YYYY-MM, do privzeto tekoči mesec) ali iz
+    zadnjih_mesecev (tekoči mesec in N-1 prejšnjih); ob neveljavnih parametrih sproži ValueError.
+    """
+    tekoci_mesec = danes.replace(day=1)
+
+    if zadnjih_mesecev is not None:
+        if od or do:
+            raise ValueError("zadnjih_mesecev ni mogoče podati skupaj z od/do")
+        if zadnjih_mesecev < 1:
+            raise ValueError("zadnjih_mesecev mora biti vsaj 1")
+        return _add_months(tekoci_mesec, -(zadnjih_mesecev - 1)), tekoci_mesec
+
+    if not od:
+        raise ValueError("Podaj od (YYYY-MM) ali zadnjih_mesecev")
+
+    od_mesec = _parse_month(od)
+    do_mesec = _parse_month(do) if do else tekoci_mesec
+    if od_mesec > do_mesec:
+        raise ValueError("od mora biti pred do")
+    return od_mesec, do_mesec
+
+
+def build_period_statistics(rows: list, sketch_rows: list = ()) -> Dict[str, Any]:
+    """
+    Organizira seštete vrstice mesečne kocke po prodaja/najem × stanovanje/hisa (povprečja = vsota / število);
+    mediano, p10 in p90 cen izračuna iz združenih mesečnih skic (vrstice tip_posla, vrsta_nepremicnine,
+    metrika, vedra, stevci)
+    """
+    skice = {}
+    for row in sketch_rows:
+        skice.setdefault((row.tip_posla, row.vrsta_nepremicnine, row.metrika), []).append((row.vedra, row.stevci))
+
+    statistike = {
+        tip_posla: {vrsta: None for vrsta in ("stanovanje", "hisa")}
+        for tip_posla in ("prodaja", "najem")
+    }
+
+    def povprecje(vsota, stevilo, decimalke):
+        return round(float(vsota) / stevilo, decimalke) if stevilo else None
+
+    for row in rows:
+        if row.vrsta_nepremicnine not in statistike[row.tip_posla]:
+            continue
+
+        cene = {
+            "povprecna_cena_m2": povprecje(row.vsota_cena_m2, row.cena_m2_count, 2),
+            "povprecna_skupna_cena": povprecje(row.vsota_skupna_cena, row.skupna_cena_count, 2),
+        }
+        for metrika in ("cena_m2", "skupna_cena"):
+            kvantili = sketch_quantiles(merge_sketches(skice.get((row.tip_posla, row.vrsta_nepremicnine, metrika), [])))
+            for ime, vrednost in kvantili.items():
+                cene[f"{ime}_{metrika}"] = vrednost
+
+        statistike[row.tip_posla][row.vrsta_nepremicnine] = {
+            "cene": cene,
+            "aktivnost": {
+                "stevilo_poslov": int(row.stevilo_poslov),
+            },
+            "lastnosti": {
+                "povprecna_velikost_m2": povprecje(row.vsota_velikost_m2, row.velikost_m2_count, 0),
+                "povprecna_starost_stavbe": povprecje(row.vsota_starost_stavbe, row.starost_stavbe_count, 0),
+            }
+        }
+
+    return statistike
+
+
+def parse_batch_request(regije: list, metrike: list = None, obdobja: list = None) -> Tuple[list, list, Optional[set]]:
+    """
+    Preveri zahtevo /api/statistike/batch in vrne (seznam parov (tip_regije, regija), metrike, obdobja kot množico
+    nizov ali None za vsa); ob neveljavni zahtevi sproži ValueError
+    """
+    if not regije:
+        raise ValueError("regije ne sme biti prazen seznam")
+    if len(regije) > STATS_BATCH_MAX_REGIJ:
+        raise ValueError(f"največ {STATS_BATCH_MAX_REGIJ} regij v enem klicu")
+
+    pari = []
+    for regija in regije:
+        if not isinstance(regija, dict) or not regija.get("tip_regije") or not regija.get("regija"):
+            raise ValueError("vsaka regija mora imeti tip_regije in regija")
+        if regija["tip_regije"] not in ("obcina", "katastrska_obcina", "slovenija"):
+            raise ValueError(f"neveljaven tip_regije '{regija['tip_regije']}'")
+        pari.append((regija["tip_regije"], str(regija["regija"])))
+
+    if metrike is None:
+        metrike = BATCH_METRIKE
+    neznane = [metrika for metrika in metrike if metrika not in BATCH_METRIKE]
+    if neznane or not metrike:
+        raise ValueError(f"metrike morajo biti izmed: {', '.join(BATCH_METRIKE)}")
+
+    if obdobja is not None:
+        izbrana = set()
+        for obdobje in obdobja:
+            if obdobje == "zadnjih12m":
+                izbrana.add(obdobje)
+            elif str(obdobje).isdigit():
+                izbrana.add(str(int(obdobje)))
+            else:
+                raise ValueError(f"neveljavno obdobje '{obdobje}' (leto ali 'zadnjih12m')")
+        obdobja = izbrana
+
+    return pari, list(metrike), obdobja
+
+
+def grid_cell_range(west: float, south: float, east: float, north: float,
+                    velikost: float = STATS_MREZA_VELIKOST) -> Tuple[int, int, int, int]:
+    """Obseg celic mreže (x_min, y_min, x_max, y_max), ki prekrivajo bbox; ob neveljavnem bbox sproži ValueError"""
+    if west >= east or south >= north:
+        raise ValueError("bbox mora biti 'west,south,east,north' z west < east in south < north")
+    return (
+        math.floor(west / velikost), math.floor(south / velikost),
+        math.floor(east / velikost), math.floor(north / velikost)
+    )
+
+
+def polygon_bounds(polygon: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    """Bbox (west, south, east, north) GeoJSON geometrije Polygon ali MultiPolygon"""
+    if not isinstance(polygon, dict) or polygon.get("type") not in ("Polygon", "MultiPolygon"):
+        raise ValueError("poligon mora biti GeoJSON geometrija tipa Polygon ali MultiPolygon")
+
+    def seznam(vrednost):
+        return isinstance(vrednost, (list, tuple))
+
+    def stevilo(vrednost):
+        return isinstance(vrednost, (int, float)) and not isinstance(vrednost, bool) and math.isfinite(vrednost)
+
+    # Polygon je seznam obročev, MultiPolygon seznam poligonov
+    poligoni = polygon.get("coordinates") or []
+    if polygon["type"] == "Polygon":
+        poligoni = [poligoni]
+    if not seznam(poligoni) or not all(seznam(p) for p in poligoni):
+        raise ValueError("koordinate poligona morajo biti seznam obročev")
+
+    obroci = [obroc for p in poligoni for obroc in p]
+    # GeoJSON obroč je zaprt in ima vsaj 4 točke
+    if not obroci or not all(seznam(obroc) and len(obroc) >= 4 for obroc in obroci):
+        raise ValueError("vsak obroč poligona mora biti seznam vsaj 4 točk")
+
+    tocke = [tocka for obroc in obroci for tocka in obroc]
+    if not all(seznam(tocka) and len(tocka) >= 2 and stevilo(tocka[0]) and stevilo(tocka[1]) for tocka in tocke):
+        raise ValueError("točke poligona morajo biti pari števil [lng, lat]")
+
+    return (
+        min(t[0] for t in tocke), min(t[1] for t in tocke),
+        max(t[0] for t in tocke), max(t[1] for t in tocke)
+    )
+
+
+def build_area_statistics(rows: list, bucket_rows: list) -> Dict[str, Any]:
+    """
+    Statistike območja iz seštetih celic mreže (vrstice tip_posla, vrsta_nepremicnine in vsote) in združenih
+    skic cene na m² (vrstice tip_posla, vrsta_nepremicnine, vedro, stevilo)
+    """
+    skice = {}
+    for row in bucket_rows:
+        skice.setdefault((row.tip_posla, row.vrsta_nepremicnine), {})[row.vedro] = int(row.stevilo)
+
+    statistike = {
+        tip_posla: {vrsta: None for vrsta in ("stanovanje", "hisa")}
+        for tip_posla in ("prodaja", "najem")
+    }
+
+    for row in rows:
+        if row.vrsta_nepremicnine not in statistike[row.tip_posla]:
+            continue
+        statistike[row.tip_posla][row.vrsta_nepremicnine] = {
+            "stevilo_poslov": int(row.stevilo_poslov),
+            "povprecna_cena_m2": round(float(row.vsota_cena_m2) / row.cena_m2_count, 2) if row.cena_m2_count else None,
+            "mediana_cena_m2": sketch_quantile(skice.get((row.tip_posla, row.vrsta_nepremicnine), {}), 0.5),
+            "povprecna_velikost_m2": round(float(row.vsota_velikost_m2) / row.velikost_m2_count) if row.velikost_m2_count else None,
+        }
+
+    return statistike
+
 
 class StatisticsService:
     
     def __init__(self):
         self.engine = get_engine()
+        # Endpointi statistik berejo iz indeksa v pomnilniku, ki sledi stats.statistike_verzija
+        self.index = StatisticsIndexHolder(self.engine)
 
 
     def refresh_all_statistics(self) -> Dict[str, Any]:
@@ -23,17 +265,17 @@ class StatisticsService:
             logger.info("=" * 60)
             
             logger.info("Posodabljam statistike za vse regije")
+            timings = {}
             
-            # 1. Posodobi materialized views
-            self._create_materialized_views()
-            
-            # 2. Počisti cache
-            self._clear_cache()
+            # 1. Napolni nov cache z vsemi statistikami (bralci med polnjenjem vidijo prejšnje podatke) in ga
+            #    zamenjaj z obstoječim
+            count = self.warm_cache(timings)
             
-            # 3. Polni cache z vsemi statistikami
-            self._populate_all_cache()
-            
-            # 4. Preveri rezultate
+            # 2. Indeks v tem procesu naj ob naslednji zahtevi naloži novo verzijo (API procesi jo zaznajo
+            #    ob naslednjem preverjanju verzije)
+            self.index.invalidate()
+
+            # 3. Preveri rezultate
             status = self.get_statistics_status()
             
             logger.info("=" * 60)
@@ -43,13 +285,74 @@ class StatisticsService:
             return {
                 "status": "success", 
                 "message": "Vse statistike uspešno posodobljene", 
-                "details": status["statistics"]
+                "details": status["statistics"],
+                "zapisanih": count,
+                "casi": timings
             }
             
         except Exception as e:
             logger.error(f"Napaka pri posodabljanju statistik: {str(e)}")
             return {"status": "error", "message": str(e)}
 
+    def update_statistics(self) -> Dict[str, Any]:
+        """
+        Inkrementalno posodobi cache statistik: preračuna samo letne statistike let iz stats.spremenjena_leta
+        (zabeleži jih vnos podatkov) in statistike zadnjih 12 mesecev, če se je okno premaknilo ali so se
+        spremenila leta v oknu. Enota preračuna je leto, ker so statistike občin in Slovenije za leto odvisne
+        od vseh poslov leta. Cache se posodobi v eni transakciji skupaj z dokumenti in verzijo.
+        """
+        try:
+            timings = {}
+
+            with self.engine.connect() as conn:
+                stanje = conn.execute(text("SELECT verzija, okno_12m, CURRENT_DATE AS danes FROM stats.statistike_verzija")).fetchone()
+                spremenjena = conn.execute(text("SELECT tip_posla, leto FROM stats.spremenjena_leta ORDER BY tip_posla, leto")).fetchall()
+
+            if stanje.verzija == 0:
+                logger.info("Cache statistik še ni napolnjen, izvajam polno posodobitev")
+                return self.refresh_all_statistics()
+
+            leta = {}
+            for row in spremenjena:
+                leta.setdefault(row.tip_posla, []).append(row.leto)
+            osvezi_12m = needs_12m_refresh(stanje.okno_12m, stanje.danes, [leto for leta_posla in leta.values() for leto in leta_posla])
+
+            if not leta and not osvezi_12m:
+                logger.info("Statistike so že posodobljene")
+                return {"status": "success", "message": "Statistike so že posodobljene", "details": {}, "zapisanih": 0, "casi": timings}
+
+            logger.info(f"Inkrementalna posodobitev statistik: leta {leta}, zadnjih 12 mesecev: {osvezi_12m}")
+
+            with timed_phase(logger, "cache_posodobitev", timings):
+                count = self._update_cache(leta, osvezi_12m, timings)
+
+            self.index.invalidate()
+
+            return {
+                "status": "success",
+                "message": "Statistike inkrementalno posodobljene",
+                "details": {"spremenjena_leta": leta, "zadnjih12m": osvezi_12m},
+                "zapisanih": count,
+                "casi": timings
+            }
+
+        except Exception as e:
+            logger.error(f"Napaka pri inkrementalni posodobitvi statistik: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def warm_cache(self, timings: Dict[str, float] = None) -> int:
+        """
+        Napolni senčni cache statistik, mesečno kocko in mesečne skice kvantilov ter jih v kratki transakciji
+        zamenja z obstoječimi (skupaj z dokumenti in novo verzijo), zato endpointi med polnjenjem vračajo
+        prejšnje statistike. Vrne število zapisov cache.
+        """
+        timings = {} if timings is None else timings
+        with timed_phase(logger, "cache_polnjenje", timings):
+            counts = self._build_cache_shadow(timings)
+        with timed_phase(logger, "cache_zamenjava", timings):
+            self._swap_cache(counts, timings)
+        return counts["statistike_cache"]
+
     def get_statistics_status(self) -> Dict[str, Any]:
         """
         Status statistik
@@ -57,8 +360,6 @@ class StatisticsService:
         try:
             with self.engine.connect() as conn:
                 # Osnovne statistike o cache
-                cache_count = conn.execute(text("SELECT COUNT(*) FROM stats.statistike_cache")).scalar()
-                
                 regions_count = conn.execute(text(
                     "SELECT COUNT(DISTINCT ime_regije) FROM stats.statistike_cache"
                 )).scalar()
@@ -77,22 +378,23 @@ class StatisticsService:
                 result = conn.execute(text(razdelitev_query))
                 razdelitev = [{"tip_posla": row.tip_posla, "tip_obdobja": row.tip_obdobja, "stevilo": row.stevilo} 
                            for row in result.fetchall()]
+                cache_count = sum(r["stevilo"] for r in razdelitev)
                 
-                # Materialized views
+                # Agregati (zabeleženo število ali ocena iz pg_class, brez pregledovanja)
                 try:
-                    mv_prodajne_count = conn.execute(text("SELECT COUNT(*) FROM stats.mv_prodajne_statistike")).scalar()
-                    mv_najemne_count = conn.execute(text("SELECT COUNT(*) FROM stats.mv_najemne_statistike")).scalar()
+                    mesecni_count = get_row_count(conn, 'stats', 'statistike_mesecno')
+                    mreza_count = get_row_count(conn, 'stats', 'statistike_mreza')
                 except:
-                    mv_prodajne_count = 0
-                    mv_najemne_count = 0
+                    mesecni_count = 0
+                    mreza_count = 0
                 
                 return {
                     "status": "success",
                     "statistics": {
                         "cache_zapisov": cache_count,
                         "stevilo_regij": regions_count,
-                        "mv_prodajni_zapisi": mv_prodajne_count,
-                        "mv_najemni_zapisi": mv_najemne_count,
+                        "mesecni_zapisi": mesecni_count,
+                        "celice_mreze": mreza_count,
                         "razdelitev_po_tipih": razdelitev
                     }
                 }
@@ -101,236 +403,189 @@ class StatisticsService:
             logger.error(f"Napaka pri pridobivanju statusa: {str(e)}")
             return {"status": "error", "message": str(e)}
 
-    def get_full_statistics(self, regija: str, tip_regije: str = "obcina") -> Dict[str, Any]:
+    def get_full_statistics_document(self, regija: str, tip_regije: str = "obcina") -> Dict[str, Any]:
         """
-        Pridobi VSE statistike za določeno regijo/KO/Slovenijo
+        Pridobi VSE statistike za določeno regijo/KO/Slovenijo kot že kodiran JSON odgovor
+        ({"status": "success", "statistike": ...}) v ključu "dokument"
         """
         try:
-            with self.engine.connect() as conn:
-                # Pridobi vse statistike za regijo
-                query = """
-                SELECT *
-                FROM stats.statistike_cache 
-                WHERE tip_regije = :tip_regije AND ime_regije = :regija
-                ORDER BY tip_posla, vrsta_nepremicnine, tip_obdobja, leto DESC
-                """
-                
-                result = conn.execute(text(query), {"tip_regije": tip_regije, "regija": regija})
-                rows = result.fetchall()
-                
-                if not rows:
-                    return {"status": "error", "message": f"Statistike za regijo '{regija}' niso najdene"}
-                
-                # Organiziraj podatke po strukturah
-                statistike = {
-                    "prodaja": {
-                        "stanovanje": {"letno": [], "zadnjih12m": None},
-                        "hisa": {"letno": [], "zadnjih12m": None}
-                    },
-                    "najem": {
-                        "stanovanje": {"letno": [], "zadnjih12m": None},
-                        "hisa": {"letno": [], "zadnjih12m": None}
-                    },
-                }
-                
-                for row in rows:
-                    # Struktura podatkov za vsak zapis
-                    podatek = {
-                        "leto": row.leto,
-                        "cene": {
-                            "povprecna_cena_m2": float(row.povprecna_cena_m2) if row.povprecna_cena_m2 else None,
-                            "povprecna_skupna_cena": float(row.povprecna_skupna_cena) if row.povprecna_skupna_cena else None,
-                        },
-                        "aktivnost": {
-                            "stevilo_poslov": row.stevilo_poslov,
-                            "aktivna_v_letu": row.aktivna_v_letu
-                        },
-                        "lastnosti": {
-                            "povprecna_velikost_m2": float(row.povprecna_velikost_m2) if row.povprecna_velikost_m2 else None,
-                            "povprecna_starost_stavbe": row.povprecna_starost_stavbe,
-                        }
-                    }
-                    
-                    # Razporedi v ustrezno kategorijo
-                    tip_trans = row.tip_posla
-                    vrsta_nep = row.vrsta_nepremicnine
-                    tip_obd = row.tip_obdobja
-                    
-                    if tip_obd == "letno":
-                        statistike[tip_trans][vrsta_nep]["letno"].append(podatek)
-                    else:  # zadnjih12m
-                        statistike[tip_trans][vrsta_nep]["zadnjih12m"] = podatek
-                    
-                return {"status": "success", "statistike": statistike}
-                
+            dokument = self.index.get().documents.get((tip_regije, regija))
+            if dokument is None:
+                return {"status": "error", "message": f"Statistike za regijo '{regija}' niso najdene"}
+
+            return {"status": "success", "dokument": dokument}
+
         except Exception as e:
             logger.error(f"Napaka pri pridobivanju statistik za regijo {regija}: {str(e)}")
             return {"status": "error", "message": str(e)}
 
-    def get_general_statistics(self, regija: str, tip_regije: str = "obcina") -> Dict[str, Any]:
+    def get_batch_statistics(self, regije: list, metrike: list, obdobja: Optional[set] = None) -> Dict[str, Any]:
         """
-        Pridobi samo splošne/ključne statistike za regijo
+        Pridobi izbrane metrike in obdobja za več regij naenkrat (iz indeksa statistik v pomnilniku) za primerjavo
+        regij v enem klicu; regije brez statistik imajo statistike None
         """
         try:
-            with self.engine.connect() as conn:
-                query = """
-                SELECT 
-                    ime_regije,
-                    vrsta_nepremicnine,
-                    tip_posla,
-                    povprecna_cena_m2,
-                    povprecna_skupna_cena,
-                    stevilo_poslov,
-                    aktivna_v_letu,
-                    povprecna_velikost_m2,
-                    povprecna_starost_stavbe
-                FROM stats.statistike_cache 
-                WHERE tip_regije = :tip_regije 
-                  AND ime_regije = :regija
-                  AND tip_obdobja = 'letno'
-                  AND leto = 2025
-                ORDER BY tip_posla, vrsta_nepremicnine
-                """
-                
-                result = conn.execute(text(query), {"tip_regije": tip_regije, "regija": regija})
-                rows = result.fetchall()
-                
-                if not rows:
-                    return {"status": "error", "message": f"Splošne statistike za regijo '{regija}' niso najdene"}
-                
-                splosne = {
-                    "regija": regija,
+            rows_by_region = self.index.get().rows_by_region
+            rezultati = []
+            for tip_regije, regija in regije:
+                vrstice = rows_by_region.get((tip_regije, regija))
+                rezultati.append({
                     "tip_regije": tip_regije,
-                    "obdobje": "zadnjih_12_mesecev",
-                    "pregled": {},
-                }
-                
-                for row in rows:
-                    key = f"{row.tip_posla}_{row.vrsta_nepremicnine}"
-                    splosne["pregled"][key] = {
-                        "tip_posla": row.tip_posla,
-                        "vrsta_nepremicnine": row.vrsta_nepremicnine,
-                        "povprecna_cena_m2": float(row.povprecna_cena_m2) if row.povprecna_cena_m2 else None,
-                        "povprecna_skupna_cena": float(row.povprecna_skupna_cena) if row.povprecna_skupna_cena else None,
-                        "stevilo_poslov": row.stevilo_poslov,
-                        "aktivna_v_letu": row.aktivna_v_letu,
-                        "povprecna_velikost_m2": float(row.povprecna_velikost_m2) if row.povprecna_velikost_m2 else None,
-                        "povprecna_starost_stavbe": row.povprecna_starost_stavbe
-                    }
-                
-                return {"status": "success", "splosne_statistike": splosne}
-                
+                    "regija": regija,
+                    "statistike": build_batch_statistics(vrstice, metrike, obdobja) if vrstice else None
+                })
+
+            return {"status": "success", "metrike": metrike, "rezultati": rezultati}
+
+        except Exception as e:
+            logger.error(f"Napaka pri pridobivanju statistik več regij: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def get_general_statistics(self, regija: str, tip_regije: str = "obcina") -> Dict[str, Any]:
+        """
+        Pridobi samo splošne/ključne statistike za regijo (iz indeksa statistik v pomnilniku)
+        """
+        try:
+            splosne = self.index.get().general.get((tip_regije, regija))
+            if splosne is None:
+                return {"status": "error", "message": f"Splošne statistike za regijo '{regija}' niso najdene"}
+
+            return {"status": "success", "splosne_statistike": splosne}
+
         except Exception as e:
             logger.error(f"Napaka pri pridobivanju splošnih statistik za regijo {regija}: {str(e)}")
             return {"status": "error", "message": str(e)}
 
+    def get_period_statistics(self, regija: str, tip_regije: str, od: date, do: date) -> Dict[str, Any]:
+        """
+        Statistike regije za obdobje od-do (prva dneva mesecev, oba vključno) iz vsot vrstic mesečne kocke
+        in združenih mesečnih skic kvantilov
+        """
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT
+                        tip_posla, vrsta_nepremicnine,
+                        SUM(stevilo_poslov) AS stevilo_poslov,
+                        SUM(vsota_cena_m2) AS vsota_cena_m2, SUM(cena_m2_count) AS cena_m2_count,
+                        SUM(vsota_skupna_cena) AS vsota_skupna_cena, SUM(skupna_cena_count) AS skupna_cena_count,
+                        SUM(vsota_velikost_m2) AS vsota_velikost_m2, SUM(velikost_m2_count) AS velikost_m2_count,
+                        SUM(vsota_starost_stavbe) AS vsota_starost_stavbe, SUM(starost_stavbe_count) AS starost_stavbe_count
+                    FROM stats.statistike_mesecno
+                    WHERE tip_regije = :tip_regije AND ime_regije = :regija
+                      AND mesec BETWEEN :od AND :do
+                    GROUP BY tip_posla, vrsta_nepremicnine
+                """), {"tip_regije": tip_regije, "regija": regija, "od": od, "do": do}).fetchall()
+
+                sketch_rows = conn.execute(text("""
+                    SELECT tip_posla, vrsta_nepremicnine, metrika, vedra, stevci
+                    FROM stats.statistike_mesecno_skica
+                    WHERE tip_regije = :tip_regije AND ime_regije = :regija
+                      AND mesec BETWEEN :od AND :do
+                """), {"tip_regije": tip_regije, "regija": regija, "od": od, "do": do}).fetchall()
+
+            return {
+                "status": "success",
+                "regija": regija,
+                "tip_regije": tip_regije,
+                "obdobje": {"od": od.strftime("%Y-%m"), "do": do.strftime("%Y-%m")},
+                "statistike": build_period_statistics(rows, sketch_rows)
+            }
+
+        except Exception as e:
+            logger.error(f"Napaka pri pridobivanju statistik obdobja za regijo {regija}: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def get_area_statistics(self, west: float, south: float, east: float, north: float,
+                            polygon: Dict[str, Any] = None, od_leta: int = None, do_leta: int = None) -> Dict[str, Any]:
+        """
+        Statistike poljubnega območja na zemljevidu (bbox ali poligon) iz vsot celic prostorske mreže brez branja
+        poslov. Upoštevajo se cele celice, ki prekrivajo bbox, pri poligonu pa celice s središčem v poligonu,
+        zato je natančnost meje območja velikost celice (STATS_MREZA_VELIKOST).
+        """
+        try:
+            x_min, y_min, x_max, y_max = grid_cell_range(west, south, east, north)
+
+            pogoji = ["celica_x BETWEEN :x_min AND :x_max", "celica_y BETWEEN :y_min AND :y_max"]
+            params = {"x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max, "velikost": STATS_MREZA_VELIKOST}
+            if od_leta is not None:
+                pogoji.append("leto >= :od_leta")
+                params["od_leta"] = od_leta
+            if do_leta is not None:
+                pogoji.append("leto <= :do_leta")
+                params["do_leta"] = do_leta
+            if polygon is not None:
+                pogoji.append("""ST_Contains(
+                    ST_SetSRID(ST_GeomFromGeoJSON(:poligon), 4326),
+                    ST_SetSRID(ST_MakePoint((celica_x + 0.5) * :velikost, (celica_y + 0.5) * :velikost), 4326)
+                )""")
+                params["poligon"] = json.dumps(polygon)
+            where = " AND ".join(pogoji)
+
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(f"""
+                    SELECT
+                        tip_posla, vrsta_nepremicnine,
+                        SUM(stevilo_poslov) AS stevilo_poslov,
+                        SUM(vsota_cena_m2) AS vsota_cena_m2, SUM(cena_m2_count) AS cena_m2_count,
+                        SUM(vsota_velikost_m2) AS vsota_velikost_m2, SUM(velikost_m2_count) AS velikost_m2_count
+                    FROM stats.statistike_mreza
+                    WHERE {where}
+                    GROUP BY tip_posla, vrsta_nepremicnine
+                """), params).fetchall()
+
+                bucket_rows = conn.execute(text(f"""
+                    SELECT m.tip_posla, m.vrsta_nepremicnine, u.vedro, SUM(u.stevilo) AS stevilo
+                    FROM stats.statistike_mreza m
+                    CROSS JOIN LATERAL UNNEST(m.vedra, m.stevci) u(vedro, stevilo)
+                    WHERE {where}
+                    GROUP BY m.tip_posla, m.vrsta_nepremicnine, u.vedro
+                """), params).fetchall()
+
+            return {
+                "status": "success",
+                "obmocje": {"bbox": [west, south, east, north], "poligon": polygon is not None},
+                "velikost_celice": STATS_MREZA_VELIKOST,
+                "statistike": build_area_statistics(rows, bucket_rows)
+            }
+
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Napaka pri pridobivanju statistik območja: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    def get_choropleth_document(self, format: str = "json", vkljuci_katastrske: bool = True) -> Dict[str, Any]:
+        """
+        Pridobi podatke zemljevida vseh občin (in KO) za zadnjih 12 mesecev kot vzporedne stolpce, že kodirane
+        ob nalaganju indeksa statistik (JSON ali Arrow IPC), v ključu "dokument"
+        """
+        try:
+            return {"status": "success", "dokument": self.index.get().choropleth[(format, vkljuci_katastrske)]}
+
+        except Exception as e:
+            logger.error(f"Napaka pri pridobivanju podatkov zemljevida: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
     def get_all_obcine_posli_zadnjih_12m(self, vkljuci_katastrske: bool = True) -> Dict[str, Any]:
         """
         Pridobi število poslov za zadnjih 12 mesecev za VSE občine + VSE katastrske občine
         Frontend bo filtriral katere se prikažejo
         """
         try:
-            with self.engine.connect() as conn:
-                # Osnovni query za občine - zadnjih 12 mesecev
-                query_obcine = """
-                SELECT 
-                    ime_regije,
-                    tip_posla,
-                    vrsta_nepremicnine,
-                    'obcina' as tip_regije_oznaka,
-                    SUM(stevilo_poslov) as skupaj_poslov
-                FROM stats.statistike_cache 
-                WHERE tip_obdobja = 'zadnjih12m'
-                    AND tip_regije = 'obcina'
-                GROUP BY ime_regije, tip_posla, vrsta_nepremicnine
-                """
-                
-                result_obcine = conn.execute(text(query_obcine))
-                rows_obcine = result_obcine.fetchall()
-                
-                # Organizacija podatkov po občinah
-                obcine_data = {}
-                
-                for row in rows_obcine:
-                    obcina_name = row.ime_regije
-                    tip_posla = row.tip_posla
-                    vrsta_nep = row.vrsta_nepremicnine
-                    stevilo = row.skupaj_poslov or 0
-                    
-                    if obcina_name not in obcine_data:
-                        obcine_data[obcina_name] = {
-                            "name": obcina_name,
-                            "prodaja": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
-                            "najem": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
-                            "skupaj_vsi_posli": 0
-                        }
-                    
-                    if tip_posla in obcine_data[obcina_name] and vrsta_nep in obcine_data[obcina_name][tip_posla]:
-                        obcine_data[obcina_name][tip_posla][vrsta_nep] = stevilo
-                        obcine_data[obcina_name][tip_posla]["skupaj"] += stevilo
-                        obcine_data[obcina_name]["skupaj_vsi_posli"] += stevilo
-
-                # Inicializiraj result
-                result = {
-                    "status": "success",
-                    "obdobje": "zadnjih_12_mesecev",
-                    "vkljucene_katastrske": vkljuci_katastrske,
-                    "obcine_posli": obcine_data,
-                    "katastrske_obcine_posli": {},
-                    "skupaj_regij": len(obcine_data)
-                }
-                
-                # Dodaj VSE katastrske občine če je zahtevano
-                if vkljuci_katastrske:
-                    query_katastrske = """
-                    SELECT 
-                        ime_regije,
-                        tip_posla,
-                        vrsta_nepremicnine,
-                        'katastrska_obcina' as tip_regije_oznaka,
-                        SUM(stevilo_poslov) as skupaj_poslov
-                    FROM stats.statistike_cache 
-                    WHERE tip_obdobja = 'zadnjih12m'
-                        AND tip_regije = 'katastrska_obcina'
-                    GROUP BY ime_regije, tip_posla, vrsta_nepremicnine
-                    ORDER BY ime_regije, tip_posla, vrsta_nepremicnine
-                    """
-                    
-                    try:
-                        result_katastrske = conn.execute(text(query_katastrske))
-                        rows_katastrske = result_katastrske.fetchall()
-                        
-                        katastrske_data = {}
-                        
-                        for row in rows_katastrske:
-                            kataster_name = row.ime_regije
-                            tip_posla = row.tip_posla
-                            vrsta_nep = row.vrsta_nepremicnine
-                            stevilo = row.skupaj_poslov or 0
-                            
-                            if kataster_name not in katastrske_data:
-                                katastrske_data[kataster_name] = {
-                                    "name": kataster_name,
-                                    "prodaja": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
-                                    "najem": {"stanovanje": 0, "hisa": 0, "skupaj": 0},
-                                    "skupaj_vsi_posli": 0
-                                }
-                            
-                            if tip_posla in katastrske_data[kataster_name] and vrsta_nep in katastrske_data[kataster_name][tip_posla]:
-                                katastrske_data[kataster_name][tip_posla][vrsta_nep] = stevilo
-                                katastrske_data[kataster_name][tip_posla]["skupaj"] += stevilo
-                                katastrske_data[kataster_name]["skupaj_vsi_posli"] += stevilo
-
-                        result["katastrske_obcine_posli"] = katastrske_data
-                        result["skupaj_regij"] = len(obcine_data) + len(katastrske_data)
-                        
-                    except Exception as e:
-                        print(f"Error processing katastrske občine: {str(e)}")
-                        # Nadaljuj brez katastrskih občin
-                        pass
-                
-                return result
-            
+            index = self.index.get()
+            obcine_data = index.posli_12m["obcina"]
+            katastrske_data = index.posli_12m["katastrska_obcina"] if vkljuci_katastrske else {}
+
+            return {
+                "status": "success",
+                "obdobje": "zadnjih_12_mesecev",
+                "vkljucene_katastrske": vkljuci_katastrske,
+                "obcine_posli": obcine_data,
+                "katastrske_obcine_posli": katastrske_data,
+                "skupaj_regij": len(obcine_data) + len(katastrske_data)
+            }
+
         except Exception as e:
             return {
                 "status": "error", 
@@ -344,169 +599,19 @@ class StatisticsService:
         Frontend bo filtriral katere se prikažejo
         """
         try:
-            with self.engine.connect() as conn:
-                # Osnovni query za občine - zadnjih 12 mesecev
-                query_obcine = """
-                SELECT 
-                    ime_regije,
-                    tip_posla,
-                    vrsta_nepremicnine,
-                    'obcina' as tip_regije_oznaka,
-                    AVG(povprecna_cena_m2) as povprecna_cena_m2,
-                    SUM(stevilo_poslov) as skupaj_poslov
-                FROM stats.statistike_cache 
-                WHERE tip_obdobja = 'zadnjih12m'
-                    AND tip_regije = 'obcina'
-                    AND povprecna_cena_m2 IS NOT NULL
-                    AND stevilo_poslov > 0
-                GROUP BY ime_regije, tip_posla, vrsta_nepremicnine
-                """
-                
-                result_obcine = conn.execute(text(query_obcine))
-                rows_obcine = result_obcine.fetchall()
-                
-                # Organizacija podatkov po občinah
-                obcine_data = {}
-                
-                for row in rows_obcine:
-                    obcina_name = row.ime_regije
-                    tip_posla = row.tip_posla
-                    vrsta_nep = row.vrsta_nepremicnine
-                    cena_m2 = float(row.povprecna_cena_m2) if row.povprecna_cena_m2 else 0
-                    stevilo_poslov = row.skupaj_poslov or 0
-                    
-                    if obcina_name not in obcine_data:
-                        obcine_data[obcina_name] = {
-                            "name": obcina_name,
-                            "prodaja": {
-                                "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
-                                "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
-                                "skupna_povprecna_cena_m2": 0,
-                                "skupaj_poslov": 0
-                            },
-                            "najem": {
-                                "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
-                                "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
-                                "skupna_povprecna_cena_m2": 0,
-                                "skupaj_poslov": 0
-                            }
-                        }
-                    
-                    # Shrani podatke po vrstah nepremičnin
-                    if tip_posla in obcine_data[obcina_name] and vrsta_nep in obcine_data[obcina_name][tip_posla]:
-                        obcine_data[obcina_name][tip_posla][vrsta_nep]["cena_m2"] = cena_m2
-                        obcine_data[obcina_name][tip_posla][vrsta_nep]["stevilo_poslov"] = stevilo_poslov
-                        obcine_data[obcina_name][tip_posla]["skupaj_poslov"] += stevilo_poslov
-                
-                # Izračunaj tehtano povprečje za vsako občino
-                for obcina_name, obcina_data in obcine_data.items():
-                    for tip_posla in ["prodaja", "najem"]:
-                        stanovanje_cena = obcina_data[tip_posla]["stanovanje"]["cena_m2"]
-                        stanovanje_posli = obcina_data[tip_posla]["stanovanje"]["stevilo_poslov"]
-                        hisa_cena = obcina_data[tip_posla]["hisa"]["cena_m2"]
-                        hisa_posli = obcina_data[tip_posla]["hisa"]["stevilo_poslov"]
-                        
-                        skupaj_poslov = stanovanje_posli + hisa_posli
-                        
-                        if skupaj_poslov > 0:
-                            # Tehtano povprečje
-                            skupna_cena_m2 = (
-                                (stanovanje_cena * stanovanje_posli + hisa_cena * hisa_posli) / skupaj_poslov
-                            )
-                            obcine_data[obcina_name][tip_posla]["skupna_povprecna_cena_m2"] = round(skupna_cena_m2, 2)
+            index = self.index.get()
+            obcine_data = index.cene_m2_12m["obcina"]
+            katastrske_data = index.cene_m2_12m["katastrska_obcina"] if vkljuci_katastrske else {}
+
+            return {
+                "status": "success",
+                "obdobje": "zadnjih_12_mesecev",
+                "vkljucene_katastrske": vkljuci_katastrske,
+                "obcine_cene": obcine_data,
+                "katastrske_obcine_cene": katastrske_data,
+                "skupaj_regij": len(obcine_data) + len(katastrske_data)
+            }
 
-                # Inicializiraj result
-                result = {
-                    "status": "success",
-                    "obdobje": "zadnjih_12_mesecev",
-                    "vkljucene_katastrske": vkljuci_katastrske,
-                    "obcine_cene": obcine_data,
-                    "katastrske_obcine_cene": {},
-                    "skupaj_regij": len(obcine_data)
-                }
-                
-                # Dodaj VSE katastrske občine če je zahtevano
-                if vkljuci_katastrske:
-                    query_katastrske = """
-                    SELECT 
-                        ime_regije,
-                        tip_posla,
-                        vrsta_nepremicnine,
-                        'katastrska_obcina' as tip_regije_oznaka,
-                        AVG(povprecna_cena_m2) as povprecna_cena_m2,
-                        SUM(stevilo_poslov) as skupaj_poslov
-                    FROM stats.statistike_cache 
-                    WHERE tip_obdobja = 'zadnjih12m'
-                        AND tip_regije = 'katastrska_obcina'
-                        AND povprecna_cena_m2 IS NOT NULL
-                        AND stevilo_poslov > 0
-                    GROUP BY ime_regije, tip_posla, vrsta_nepremicnine
-                    ORDER BY ime_regije, tip_posla, vrsta_nepremicnine
-                    """
-                    
-                    try:
-                        result_katastrske = conn.execute(text(query_katastrske))
-                        rows_katastrske = result_katastrske.fetchall()
-                        
-                        katastrske_data = {}
-                        
-                        for row in rows_katastrske:
-                            kataster_name = row.ime_regije
-                            tip_posla = row.tip_posla
-                            vrsta_nep = row.vrsta_nepremicnine
-                            cena_m2 = float(row.povprecna_cena_m2) if row.povprecna_cena_m2 else 0
-                            stevilo_poslov = row.skupaj_poslov or 0
-                            
-                            if kataster_name not in katastrske_data:
-                                katastrske_data[kataster_name] = {
-                                    "name": kataster_name,
-                                    "prodaja": {
-                                        "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
-                                        "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
-                                        "skupna_povprecna_cena_m2": 0,
-                                        "skupaj_poslov": 0
-                                    },
-                                    "najem": {
-                                        "stanovanje": {"cena_m2": 0, "stevilo_poslov": 0},
-                                        "hisa": {"cena_m2": 0, "stevilo_poslov": 0},
-                                        "skupna_povprecna_cena_m2": 0,
-                                        "skupaj_poslov": 0
-                                    }
-                                }
-                            
-                            # Shrani podatke po vrstah nepremičnin
-                            if tip_posla in katastrske_data[kataster_name] and vrsta_nep in katastrske_data[kataster_name][tip_posla]:
-                                katastrske_data[kataster_name][tip_posla][vrsta_nep]["cena_m2"] = cena_m2
-                                katastrske_data[kataster_name][tip_posla][vrsta_nep]["stevilo_poslov"] = stevilo_poslov
-                                katastrske_data[kataster_name][tip_posla]["skupaj_poslov"] += stevilo_poslov
-                        
-                        # Izračunaj tehtano povprečje za vsako katastrsko občino
-                        for kataster_name, kataster_data in katastrske_data.items():
-                            for tip_posla in ["prodaja", "najem"]:
-                                stanovanje_cena = kataster_data[tip_posla]["stanovanje"]["cena_m2"]
-                                stanovanje_posli = kataster_data[tip_posla]["stanovanje"]["stevilo_poslov"]
-                                hisa_cena = kataster_data[tip_posla]["hisa"]["cena_m2"]
-                                hisa_posli = kataster_data[tip_posla]["hisa"]["stevilo_poslov"]
-                                
-                                skupaj_poslov = stanovanje_posli + hisa_posli
-                                
-                                if skupaj_poslov > 0:
-                                    # Tehtano povprečje
-                                    skupna_cena_m2 = (
-                                        (stanovanje_cena * stanovanje_posli + hisa_cena * hisa_posli) / skupaj_poslov
-                                    )
-                                    katastrske_data[kataster_name][tip_posla]["skupna_povprecna_cena_m2"] = round(skupna_cena_m2, 2)
-
-                        result["katastrske_obcine_cene"] = katastrske_data
-                        result["skupaj_regij"] = len(obcine_data) + len(katastrske_data)
-                        
-                    except Exception as e:
-                        print(f"Error processing katastrske občine: {str(e)}")
-                        # Nadaljuj brez katastrskih občin
-                        pass
-                
-                return result
-            
         except Exception as e:
             return {
                 "status": "error", 
@@ -515,64 +620,217 @@ class StatisticsService:
 
     # POMOŽNE METODE
     
-    def _create_materialized_views(self):
-        """Ustvari materialized views."""
+    def _build_cache_shadow(self, timings: Dict[str, float]) -> Dict[str, int]:
+        """
+        Napolni senčne tabele STATS_CACHE_TABLES: za vsak tip posla enkrat prebere transakcije v začasno tabelo
+        vrednosti, iz nje z enim prehodom GROUPING SETS napolni letne statistike in statistike zadnjih 12 mesecev
+        vseh regij (skupaj s kvantili cen) ter agregate STATS_AGREGATI; vrne število zapisov po tabelah.
+        """
+        shadows = {table: f"stats.{table}{SHADOW_SUFFIX}" for table in STATS_CACHE_TABLES}
+
         with self.engine.connect() as conn:
             trans = conn.begin()
             try:
-                logger.info("Posodabljam materialized views...")
-                
-                sales_mv_sql = get_sql_query('stats/create_mv_prodajne_stats.sql')
-                conn.execute(text(sales_mv_sql))
-                
-                rental_mv_sql = get_sql_query('stats/create_mv_najemne_stats.sql')
-                conn.execute(text(rental_mv_sql))
-                
-                sales_mv_sql_12m = get_sql_query('stats/create_mv_prodajne_stats_12m.sql')
-                conn.execute(text(sales_mv_sql_12m))
-                
-                rental_mv_sql_12m = get_sql_query('stats/create_mv_najemne_stats_12m.sql')
-                conn.execute(text(rental_mv_sql_12m))
-                
+                logger.info(f"Polnim {shadows['statistike_cache']} z vsemi statistikami...")
+                for table, shadow in shadows.items():
+                    conn.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+                    conn.execute(text(f"CREATE TABLE {shadow} (LIKE stats.{table} INCLUDING DEFAULTS)"))
+
+                counts = {table: 0 for table in STATS_CACHE_TABLES}
+                for tip_posla in STATS_IZRACUNI:
+                    with timed_phase(logger, f"vrednosti_{tip_posla}", timings):
+                        vrednosti = self._fill_values(conn, tip_posla, "")
+                    with timed_phase(logger, f"statistike_{tip_posla}", timings):
+                        counts["statistike_cache"] += self._fill_cache(conn, tip_posla, vrednosti, shadows["statistike_cache"], "", "")
+                    with timed_phase(logger, f"agregati_{tip_posla}", timings):
+                        for table, count in self._fill_aggregates(conn, tip_posla, vrednosti, "", shadows).items():
+                            counts[table] += count
+
+                # Indeksi se zgradijo po vnosu podatkov
+                for table in STATS_CACHE_TABLES:
+                    clone_indexes_and_constraints(conn, 'stats', table, f"{table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                    conn.execute(text(f"ANALYZE {shadows[table]}"))
+
                 trans.commit()
-                logger.info("Materialized views uspešno ustvarjeni")
-                
+                logger.info(
+                    f"Vstavljena statistika: {counts['statistike_cache']} zapisov cache, "
+                    f"{counts['statistike_mesecno']} mesečnih zapisov, {counts['statistike_mesecno_skica']} mesečnih skic, "
+                    f"{counts['statistike_mreza']} celic mreže"
+                )
+                return counts
+
             except Exception as e:
                 trans.rollback()
+                logger.error(f"Napaka pri polnjenju senčnega cache: {str(e)}")
                 raise
 
-    def _clear_cache(self):
-        """Počisti celoten cache."""
+    def _swap_cache(self, counts: Dict[str, int], timings: Dict[str, float]):
+        """
+        V eni transakciji zamenja tabele STATS_CACHE_TABLES s senčnimi tabelami, zapiše dokumente in poveča
+        verzijo statistik, zato bralci vidijo samo staro ali samo novo verzijo.
+        """
         with self.engine.connect() as conn:
             trans = conn.begin()
             try:
-                conn.execute(text("TRUNCATE TABLE stats.statistike_cache"))
-                logger.info("Počiščen celoten cache")
-                
+                for table in STATS_CACHE_TABLES:
+                    swap_shadow_table(conn, 'stats', table, f"{table}{SHADOW_SUFFIX}", SHADOW_SUFFIX)
+                    record_row_count(conn, 'stats', table, counts[table])
+
+                with timed_phase(logger, "dokumenti", timings):
+                    self._render_documents(conn)
+
+                # Polna posodobitev zajame vse spremembe, zabeležene pred branjem transakcij
+                conn.execute(text("DELETE FROM stats.spremenjena_leta"))
+                verzija = self._bump_version(conn, okno_12m=True)
+
                 trans.commit()
-                
+                logger.info(f"Cache statistik zamenjan, verzija {verzija}")
+
             except Exception as e:
                 trans.rollback()
+                logger.error(f"Napaka pri zamenjavi cache statistik: {str(e)}")
                 raise
 
-    def _populate_all_cache(self):
-        """Polni cache z vsemi statistikami za vse regije."""
+    def _update_cache(self, leta: Dict[str, list], osvezi_12m: bool, timings: Dict[str, float]) -> int:
+        """
+        V eni transakciji zamenja letne vrstice cache ter mesece kocke in skic za spremenjena leta (in po
+        potrebi vrstice zadnjih 12 mesecev), zapiše dokumente, poveča
+        verzijo in izbriše obdelana leta iz stats.spremenjena_leta.
+        Vrne število zapisanih vrstic cache.
+        """
         with self.engine.connect() as conn:
             trans = conn.begin()
             try:
-                logger.info("Polnim cache z vsemi statistikami...")
-                
-                sales_sql = get_sql_query('stats/populate_statistike_cache.sql')
-                result_letno = conn.execute(text(sales_sql))
+                deleted = 0
+                inserted = 0
 
-                sales_sql_12m = get_sql_query('stats/populate_statistike_cache_12m.sql')
-                result_12m = conn.execute(text(sales_sql_12m))
+                for tip_posla, (_, _, pogoj_leta, pogoj_12m) in STATS_IZRACUNI.items():
+                    leta_posla = leta.get(tip_posla, [])
+                    if not leta_posla and not osvezi_12m:
+                        continue
+                    seznam_let = ", ".join(str(int(leto)) for leto in leta_posla)
+
+                    # Transakcije se preberejo samo za spremenjena leta in po potrebi zadnjih 12 mesecev
+                    pogoji = []
+                    if leta_posla:
+                        pogoji.append(pogoj_leta.format(leta=seznam_let, od_leta=min(leta_posla), do_leta=max(leta_posla)))
+                    if osvezi_12m:
+                        pogoji.append(pogoj_12m)
+                    with timed_phase(logger, f"vrednosti_{tip_posla}", timings):
+                        vrednosti = self._fill_values(conn, tip_posla, f"AND ({' OR '.join(pogoji)})")
+
+                    if leta_posla:
+                        deleted += conn.execute(text("""
+                            DELETE FROM stats.statistike_cache
+                            WHERE tip_obdobja = 'letno' AND tip_posla = :tip_posla AND leto = ANY(:leta)
+                        """), {"tip_posla": tip_posla, "leta": leta_posla}).rowcount
+                    if osvezi_12m:
+                        deleted += conn.execute(text("""
+                            DELETE FROM stats.statistike_cache WHERE tip_obdobja = 'zadnjih12m' AND tip_posla = :tip_posla
+                        """), {"tip_posla": tip_posla}).rowcount
+                    with timed_phase(logger, f"statistike_{tip_posla}", timings):
+                        inserted += self._fill_cache(
+                            conn, tip_posla, vrednosti, "stats.statistike_cache",
+                            f"AND leto IN ({seznam_let})" if leta_posla else "AND FALSE",
+                            "" if osvezi_12m else "AND FALSE"
+                        )
+
+                    if leta_posla:
+                        aggregates_deleted = {}
+                        for table, (_, leto_vrstice) in STATS_AGREGATI.items():
+                            aggregates_deleted[table] = conn.execute(text(f"""
+                                DELETE FROM stats.{table}
+                                WHERE tip_posla = :tip_posla AND {leto_vrstice} = ANY(:leta)
+                            """), {"tip_posla": tip_posla, "leta": leta_posla}).rowcount
+                        with timed_phase(logger, f"agregati_{tip_posla}", timings):
+                            aggregates_inserted = self._fill_aggregates(
+                                conn, tip_posla, vrednosti, f"AND date_part('year', mesec)::INTEGER IN ({seznam_let})",
+                                {table: f"stats.{table}" for table in STATS_AGREGATI}
+                            )
+                        for table in STATS_AGREGATI:
+                            adjust_row_count(conn, 'stats', table, aggregates_inserted[table] - aggregates_deleted[table])
+
+                    if leta_posla:
+                        conn.execute(text("DELETE FROM stats.spremenjena_leta WHERE tip_posla = :tip_posla AND leto = ANY(:leta)"),
+                                     {"tip_posla": tip_posla, "leta": leta_posla})
+
+                adjust_row_count(conn, 'stats', 'statistike_cache', inserted - deleted)
+
+                with timed_phase(logger, "dokumenti", timings):
+                    self._render_documents(conn)
+
+                verzija = self._bump_version(conn, okno_12m=osvezi_12m)
 
-                logger.info(f"Vstavljena statistika: {result_letno.rowcount} letnih zapisov, {result_12m.rowcount} zadnjih 12 mesecev zapisov")
-                
                 trans.commit()
-                logger.info("Vsi cache podatki uspešno naloženi")
-                
+                logger.info(f"Cache statistik posodobljen ({inserted} vstavljenih, {deleted} izbrisanih vrstic), verzija {verzija}")
+                return inserted
+
             except Exception as e:
                 trans.rollback()
-                raise
\ No newline at end of file
+                logger.error(f"Napaka pri posodobitvi cache statistik: {str(e)}")
+                raise
+
+    def _fill_values(self, conn, tip_posla: str, omejitev: str) -> str:
+        """
+        Prebere transakcije tipa posla (omejitev: dodaten pogoj za posle) v začasno tabelo vrednosti, ki jo nato
+        berejo vsi izračuni statistik v transakciji klicatelja; vrne ime začasne tabele.
+        """
+        vrednosti = f"vrednosti_{tip_posla}"
+        conn.execute(text(f"DROP TABLE IF EXISTS {vrednosti}"))
+        conn.execute(text(get_sql_query(STATS_IZRACUNI[tip_posla][0], target_table=vrednosti, omejitev=omejitev)))
+        conn.execute(text(f"ANALYZE {vrednosti}"))
+        return vrednosti
+
+    def _fill_cache(self, conn, tip_posla: str, vrednosti: str, target_table: str, omejitev_letno: str, omejitev_12m: str) -> int:
+        """
+        Z enim prehodom GROUPING SETS čez začasno tabelo vrednosti napolni letne statistike in statistike zadnjih
+        12 mesecev tipa posla (povprečja, števce in kvantile cen) za vse regije in obe vrsti nepremičnin;
+        vrne število zapisov.
+        """
+        return conn.execute(text(get_sql_query(
+            STATS_IZRACUNI[tip_posla][1], target_table=target_table, vrednosti=vrednosti,
+            omejitev_letno=omejitev_letno, omejitev_12m=omejitev_12m, gamma=SKICA_GAMMA
+        ))).rowcount
+
+    def _fill_aggregates(self, conn, tip_posla: str, vrednosti: str, omejitev: str, target_tables: Dict[str, str]) -> Dict[str, int]:
+        """
+        Napolni agregate STATS_AGREGATI (mesečna kocka, mesečne skice, prostorska mreža) tipa posla iz začasne tabele
+        vrednosti v ciljne tabele (omejitev: pogoj za mesece); vrne število zapisov po tabelah.
+        """
+        return {
+            table: conn.execute(text(get_sql_query(
+                sql_file, target_table=target_tables[table], vrednosti=vrednosti, omejitev=omejitev, tip_posla=tip_posla,
+                gamma=SKICA_GAMMA, velikost=STATS_MREZA_VELIKOST
+            ))).rowcount
+            for table, (sql_file, _) in STATS_AGREGATI.items()
+        }
+
+    def _bump_version(self, conn, okno_12m: bool) -> int:
+        """Poveča verzijo statistik (v transakciji klicatelja); okno_12m: statistike zadnjih 12 mesecev so za danes."""
+        return conn.execute(text("""
+            UPDATE stats.statistike_verzija
+            SET verzija = verzija + 1,
+                posodobljeno = NOW(),
+                okno_12m = CASE WHEN :okno_12m THEN CURRENT_DATE ELSE okno_12m END
+            RETURNING verzija
+        """), {"okno_12m": okno_12m}).scalar()
+
+    def _render_documents(self, conn) -> int:
+        """
+        Iz napolnjenega cache zgradi kodirane odgovore /api/statistike/vse za vse regije in jih zapiše
+        v stats.statistike_dokument (v transakciji klicatelja); vrne število dokumentov.
+        """
+        documents = render_full_documents(conn.execute(text(CACHE_ROWS_QUERY)).fetchall())
+
+        # DELETE namesto TRUNCATE: nalaganje indeksa v API procesih do potrditve bere prejšnje dokumente
+        conn.execute(text("DELETE FROM stats.statistike_dokument"))
+        if documents:
+            conn.execute(
+                text("INSERT INTO stats.statistike_dokument (tip_regije, ime_regije, dokument) VALUES (:tip_regije, :ime_regije, :dokument)"),
+                [{"tip_regije": tip_regije, "ime_regije": ime_regije, "dokument": dokument}
+                 for (tip_regije, ime_regije), dokument in documents.items()]
+            )
+        record_row_count(conn, 'stats', 'statistike_dokument', len(documents))
+
+        logger.info(f"Zapisanih {len(documents)} dokumentov statistik ({sum(len(d) for d in documents.values()):,} bajtov)")
+        return len(documents)
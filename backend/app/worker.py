@@ -0,0 +1,129 @@
+"""
+Worker proces za vnos podatkov, dedupliciranje in statistike.
+
+Zagon: python -m app.worker
+
+API endpointi in tedenski scheduler opravila samo vpišejo v pipeline.opravilo; worker jih izvaja zaporedno
+pod advisory zaklepom pipeline-a, zato težka opravila (pandas, ekstrakcija, SQL transformacije) ne tečejo
+v API procesu in se dva zagona, ki uporabljata skupne staging tabele, nikoli ne prekrivata.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+from typing import Dict, Any
+
+from .database import get_engine
+from .data_ingestion import DataIngestionService
+from .deduplication import DeduplicationService
+from .energetska_izkaznica_ingestion import EnergetskaIzkaznicaIngestionService
+from .statistics_service import StatisticsService
+from .maintenance import MaintenanceService
+from .logging_utils import setup_logger
+from .job_queue import pipeline_lock, claim_next_job, finish_job
+from .pipeline import (
+    WEEKLY_PIPELINE,
+    PipelineRunner,
+    build_weekly_pipeline,
+    build_ingestion_stage,
+    build_deduplication_stage,
+    build_ei_stage,
+    build_statistics_stage
+)
+from .scheduler import scheduler, schedule_weekly_update
+
+logger = setup_logger("pipeline", "pipeline.log", "PIPELINE")
+
+# Premor med preverjanji čakalne vrste (v sekundah), ko ni opravil ali zaklep drži drug worker
+POLL_INTERVAL_S = float(os.environ.get("WORKER_POLL_INTERVAL_S", "10"))
+
+
+class PipelineWorker:
+    """Prevzema opravila iz čakalne vrste in jih izvaja s PipelineRunner-jem."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL_S):
+        self.engine = get_engine()
+        self.poll_interval = poll_interval
+        self.ingestion_service = DataIngestionService()
+        self.deduplication_service = DeduplicationService()
+        self.ei_ingestion_service = EnergetskaIzkaznicaIngestionService()
+        self.stats_service = StatisticsService()
+        self.maintenance_service = MaintenanceService()
+
+    async def run_forever(self):
+        """Izvaja opravila, dokler proces ne prejme ukaza za ustavitev."""
+        logger.info(f"Worker zagnan (PID {os.getpid()}), preverjanje čakalne vrste vsakih {self.poll_interval} s")
+        while True:
+            try:
+                ran = await self.run_next_job()
+            except Exception as e:
+                logger.error(f"Napaka v workerju: {str(e)}")
+                ran = False
+
+            if not ran:
+                await asyncio.sleep(self.poll_interval)
+
+    async def run_next_job(self) -> bool:
+        """Pod zaklepom pipeline-a izvede eno čakajoče opravilo; vrne True, če je bilo opravilo izvedeno."""
+        with pipeline_lock(self.engine) as acquired:
+            if not acquired:
+                logger.info("Zaklep pipeline-a drži drug worker, čakam")
+                return False
+
+            job = await asyncio.to_thread(claim_next_job, self.engine)
+            if job is None:
+                return False
+
+            logger.info(f"Prevzeto opravilo {job['opravilo_id']} ({job['vrsta']}), parametri: {job['parametri']}")
+            try:
+                runner = self.build_runner(job["vrsta"], job["parametri"])
+                rezultat = await runner.run(job["parametri"].get("resume_zagon_id"))
+            except Exception as e:
+                logger.error(f"Opravilo {job['opravilo_id']} ni uspelo: {str(e)}")
+                await asyncio.to_thread(finish_job, self.engine, job["opravilo_id"], None, str(e))
+                return True
+
+            await asyncio.to_thread(finish_job, self.engine, job["opravilo_id"], rezultat)
+            logger.info(f"Opravilo {job['opravilo_id']} končano: {rezultat['message']}")
+            return True
+
+    def build_runner(self, vrsta: str, parametri: Dict[str, Any]) -> PipelineRunner:
+        """Sestavi pipeline za vrsto opravila; ob neznani vrsti sproži ValueError."""
+        if vrsta == WEEKLY_PIPELINE:
+            current_year = datetime.now().year
+            stages = build_weekly_pipeline(
+                [current_year - 1, current_year],
+                self.ingestion_service,
+                self.ei_ingestion_service,
+                self.deduplication_service,
+                self.stats_service,
+                self.maintenance_service
+            )
+        elif vrsta == "vnos_podatkov":
+            stages = [build_ingestion_stage(
+                self.ingestion_service, parametri["data_type"], parametri["years"], parametri["mode"], parametri["bulk"]
+            )]
+        elif vrsta == "deduplikacija":
+            stages = [build_deduplication_stage(self.deduplication_service, parametri["data_types"], parametri["mode"])]
+        elif vrsta == "energetske_izkaznice":
+            stages = [build_ei_stage(self.ei_ingestion_service, parametri["url"], parametri["parser"], parametri["mode"])]
+        elif vrsta == "statistike":
+            stages = [build_statistics_stage(self.stats_service, parametri.get("mode", "full"))]
+        else:
+            raise ValueError(f"Neznana vrsta opravila: {vrsta}")
+
+        return PipelineRunner(vrsta, stages)
+
+
+async def main():
+    worker = PipelineWorker()
+    schedule_weekly_update()
+    scheduler.start()
+    try:
+        await worker.run_forever()
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
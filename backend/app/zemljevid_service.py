@@ -5,7 +5,7 @@ from difflib import SequenceMatcher
 
 from .models import EnergetskaIzkaznica
 
-from .clustering_utils import calculate_cluster_resolution, get_deduplicated_del_stavbe_model, get_del_stave_model, get_posel_model, serialize_list_to_json, apply_del_stavbe_filters, serialize_to_json
+from .clustering_utils import calculate_cluster_resolution, get_deduplicated_del_stavbe_model, get_del_stave_model, get_posel_model, get_del_stavbe_posel_model, get_stavba_model, serialize_list_to_json, apply_del_stavbe_filters, has_unit_filters, serialize_to_json, DEFAULT_FILTER_LETO
 
 
 class DelStavbeService:
@@ -151,6 +151,74 @@ class DelStavbeService:
         """
         Pridobi deduplicirane nepremičnine združene po: občina + sifra_ko + stevilka_stavbe (naredi cluster za vsako stavbo znotraj občine)
         Uporabljeno ko si zoomed in
+
+        Stavbe se berejo iz povzetka <prefix>_stavba (ena vrstica na stavbo in leto zadnjega posla), posamezni
+        deli stavb pa samo za stavbe z eno enoto. Pri filtrih po ceni ali površini se stavbe združijo iz delov stavb.
+        """
+        if has_unit_filters(filters):
+            return DelStavbeService._get_building_clustered_from_units(west, south, east, north, db, data_source, filters)
+
+        StavbaModel = get_stavba_model(data_source)
+        bbox_geom = ST_SetSRID(ST_MakeEnvelope(west, south, east, north), 4326)
+        filter_leto = (filters or {}).get('filter_leto', DEFAULT_FILTER_LETO)
+
+        # Združevanje let zadnjega posla: centroid in povprečja so utežena s številom enot
+        stevilo_enot = func.sum(StavbaModel.stevilo_enot)
+        stevilo_cen = func.nullif(func.sum(StavbaModel.stevilo_cen), 0)
+        stevilo_povrsin = func.nullif(func.sum(StavbaModel.stevilo_povrsin), 0)
+        stavbe = db.query(
+            StavbaModel.obcina,
+            StavbaModel.sifra_ko,
+            StavbaModel.stevilka_stavbe,
+            stevilo_enot.label('stevilo_enot'),
+            func.min(StavbaModel.del_stavbe_id).label('del_stavbe_id'),
+            (func.sum(ST_X(StavbaModel.centroid) * StavbaModel.stevilo_enot) / stevilo_enot).label('lng'),
+            (func.sum(ST_Y(StavbaModel.centroid) * StavbaModel.stevilo_enot) / stevilo_enot).label('lat'),
+            func.min(StavbaModel.min_cena).label('min_cena'),
+            func.max(StavbaModel.max_cena).label('max_cena'),
+            (func.sum(StavbaModel.povprecna_cena * StavbaModel.stevilo_cen) / stevilo_cen).label('povprecna_cena'),
+            func.min(StavbaModel.min_povrsina).label('min_povrsina'),
+            func.max(StavbaModel.max_povrsina).label('max_povrsina'),
+            (func.sum(StavbaModel.povprecna_povrsina * StavbaModel.stevilo_povrsin) / stevilo_povrsin).label('povprecna_povrsina')
+        ).filter(
+            ST_Intersects(StavbaModel.centroid, bbox_geom),
+            StavbaModel.zadnje_leto >= filter_leto
+        ).group_by(
+            StavbaModel.obcina,
+            StavbaModel.sifra_ko,
+            StavbaModel.stevilka_stavbe
+        ).all()
+
+        # Posamezni deli stavb samo za stavbe z eno enoto
+        single_ids = [stavba.del_stavbe_id for stavba in stavbe if stavba.stevilo_enot == 1]
+        single_del_stavbe = {}
+        if single_ids:
+            DeduplicatedModel = get_deduplicated_del_stavbe_model(data_source)
+            base_query = DelStavbeService._build_del_stavbe_query(db, DeduplicatedModel, data_source)
+            for ds in base_query.filter(DeduplicatedModel.del_stavbe_id.in_(single_ids)).all():
+                single_del_stavbe[ds.del_stavbe_id] = ds
+
+        # Generiraj features
+        features = []
+        for stavba in stavbe:
+            if stavba.stevilo_enot == 1:
+                ds = single_del_stavbe.get(stavba.del_stavbe_id)
+                if ds is None:  # povzetek in deduplicirana tabela se razlikujeta le med posodobitvijo
+                    continue
+                features.append(DelStavbeService._create_del_stavbe_feature_json(ds, data_source))
+            else:
+                features.append(DelStavbeService._create_building_feature_json(dict(stavba._mapping), stavba.stevilo_enot, data_source))
+
+        return {
+            "type": "FeatureCollection",
+            "features": features
+        }
+
+
+    @staticmethod
+    def _get_building_clustered_from_units(west: float, south: float, east: float, north: float, db: Session, data_source: str, filters: dict):
+        """
+        Združevanje po stavbah iz posameznih delov stavb (filtri po ceni ali površini niso v povzetku stavb)
         """
 
         DeduplicatedModel = get_deduplicated_del_stavbe_model(data_source)
@@ -178,30 +246,24 @@ class DelStavbeService:
             if len(del_stavbe) == 1:
                 feature = DelStavbeService._create_del_stavbe_feature_json(del_stavbe[0], data_source)
             else:
-
-                avg_lng = sum(float(p.lng) for p in del_stavbe) / len(del_stavbe)
-                avg_lat = sum(float(p.lat) for p in del_stavbe) / len(del_stavbe)
-
+                cene = [float(c) for c in (ds.zadnja_najemnina if data_source.lower() == "np" else ds.zadnja_cena for ds in del_stavbe) if c is not None]
+                povrsine = [float(ds.povrsina_uradna) for ds in del_stavbe if ds.povrsina_uradna is not None]
                 first_ds = del_stavbe[0]  # Vsi v isti stavbi imajo iste osnovne podatke
-                
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [avg_lng, avg_lat]
-                    },
-                    "properties": {
-                        "type": "cluster",
-                        "cluster_type": "building",
-                        "point_count": len(del_stavbe),
-                        "cluster_id": f"b_{first_ds.obcina}_{first_ds.sifra_ko}_{first_ds.stevilka_stavbe}",
-                        "obcina": first_ds.obcina,
-                        "sifra_ko": first_ds.sifra_ko,
-                        "stevilka_stavbe": first_ds.stevilka_stavbe,
-                        "data_source": data_source,
-                        "deduplicated_ids": [ds.del_stavbe_id for ds in del_stavbe]
-                    }
+
+                stavba = {
+                    "obcina": first_ds.obcina,
+                    "sifra_ko": first_ds.sifra_ko,
+                    "stevilka_stavbe": first_ds.stevilka_stavbe,
+                    "lng": sum(float(p.lng) for p in del_stavbe) / len(del_stavbe),
+                    "lat": sum(float(p.lat) for p in del_stavbe) / len(del_stavbe),
+                    "min_cena": min(cene) if cene else None,
+                    "max_cena": max(cene) if cene else None,
+                    "povprecna_cena": sum(cene) / len(cene) if cene else None,
+                    "min_povrsina": min(povrsine) if povrsine else None,
+                    "max_povrsina": max(povrsine) if povrsine else None,
+                    "povprecna_povrsina": sum(povrsine) / len(povrsine) if povrsine else None
                 }
+                feature = DelStavbeService._create_building_feature_json(stavba, len(del_stavbe), data_source)
             
             features.append(feature)
         
@@ -271,6 +333,7 @@ class DelStavbeService:
         DeduplicatedModel = get_deduplicated_del_stavbe_model(data_source)
         DelStavbeModel = get_del_stave_model(data_source)
         PoselModel = get_posel_model(data_source)
+        PovezavaModel = get_del_stavbe_posel_model(data_source)
 
         
         # Pridobi deduplicirani zapis nepremičnine
@@ -286,16 +349,19 @@ class DelStavbeService:
             return None
         
 
-        # Pridobi vse povezane del_stavbe zapise, povezane posle, reprezentativni (zadnji) del stavbe in energetske izkaznice
+        # Pridobi vse povezane del_stavbe zapise, povezane posle, reprezentativni (zadnji) del stavbe in energetske izkaznice.
+        # Povezave se berejo iz tabele <prefix>_del_stavbe_posel (index-only scan po dedup_id)
+        povezave = db.query(PovezavaModel).filter(PovezavaModel.dedup_id == deduplicated_id)
+
         vsi_povezani_deli_stavb = db.query(DelStavbeModel).filter(
-            DelStavbeModel.del_stavbe_id.in_(dedup_del_stavbe[0].povezani_del_stavbe_ids)
+            DelStavbeModel.del_stavbe_id.in_(povezave.with_entities(PovezavaModel.del_stavbe_id))
         ).order_by(
             DelStavbeModel.stevilka_stavbe.asc().nulls_last(),
             DelStavbeModel.stevilka_dela_stavbe.asc().nulls_last()
         ).all()
 
         vsi_posli = db.query(PoselModel).filter(
-            PoselModel.posel_id.in_(dedup_del_stavbe[0].povezani_posel_ids)
+            PoselModel.posel_id.in_(povezave.with_entities(PovezavaModel.posel_id))
         ).order_by(
             PoselModel.datum_sklenitve.desc().nulls_last(),
             PoselModel.datum_uveljavitve.desc().nulls_last()
@@ -333,8 +399,8 @@ class DelStavbeService:
 
                 "reprezentativni_del_stavbe": serialize_to_json(representative_del_stavbe),  
                 
-                "stevilo_poslov": len(dedup_del_stavbe[0].povezani_posel_ids),
-                "ima_vec_poslov": len(dedup_del_stavbe[0].povezani_posel_ids) > 1,
+                "stevilo_poslov": dedup_del_stavbe[0].stevilo_poslov,
+                "ima_vec_poslov": dedup_del_stavbe[0].stevilo_poslov > 1,
                 
                 "povezani_deli_stavb": serialize_list_to_json(vsi_povezani_deli_stavb),
                 "povezani_posli": serialize_list_to_json(vsi_posli),
@@ -708,8 +774,7 @@ class DelStavbeService:
             DeduplicatedModel.zadnje_stevilo_delov_stavb,
             DeduplicatedModel.energetske_izkaznice,
             DeduplicatedModel.energijski_razred,
-            DeduplicatedModel.povezani_posel_ids,
-            DeduplicatedModel.povezani_del_stavbe_ids,
+            DeduplicatedModel.stevilo_poslov,
             ST_X(DeduplicatedModel.coordinates).label('lng'),
             ST_Y(DeduplicatedModel.coordinates).label('lat')
         )
@@ -735,6 +800,40 @@ class DelStavbeService:
 
 
 
+    @staticmethod
+    def _create_building_feature_json(stavba: dict, point_count: int, data_source: str):
+        """
+        Helper za kreiranje cluster feature responsa stavbe
+        """
+
+        def to_float(value):
+            return float(value) if value is not None else None
+
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [float(stavba['lng']), float(stavba['lat'])]
+            },
+            "properties": {
+                "type": "cluster",
+                "cluster_type": "building",
+                "point_count": point_count,
+                "cluster_id": f"b_{stavba['obcina']}_{stavba['sifra_ko']}_{stavba['stevilka_stavbe']}",
+                "obcina": stavba['obcina'],
+                "sifra_ko": stavba['sifra_ko'],
+                "stevilka_stavbe": stavba['stevilka_stavbe'],
+                "data_source": data_source,
+                "min_cena": to_float(stavba['min_cena']),
+                "max_cena": to_float(stavba['max_cena']),
+                "povprecna_cena": to_float(stavba['povprecna_cena']),
+                "min_povrsina": to_float(stavba['min_povrsina']),
+                "max_povrsina": to_float(stavba['max_povrsina']),
+                "povprecna_povrsina": to_float(stavba['povprecna_povrsina'])
+            }
+        }
+
+
     @staticmethod
     def _create_del_stavbe_feature_json(del_stavbe, data_source: str):
         """
@@ -764,7 +863,7 @@ class DelStavbeService:
                 "zadnja_stopnja_ddv": float(del_stavbe.zadnja_stopnja_ddv) if del_stavbe.zadnja_stopnja_ddv else None,
             }
         
-        stevilo_poslov = len(del_stavbe.povezani_posel_ids) if del_stavbe.povezani_posel_ids else 0
+        stevilo_poslov = del_stavbe.stevilo_poslov or 0
         
         return {
             "type": "Feature",
@@ -6,7 +6,8 @@ from datetime import date
 from app.clustering_utils import (
     calculate_cluster_resolution,
     serialize_to_json,
-    serialize_list_to_json
+    serialize_list_to_json,
+    has_unit_filters
 )
 
 def test_calculate_cluster_resolution():
@@ -51,4 +52,11 @@ def test_serialize_to_json_none():
 def test_serialize_list_empty():
     """Test serializacije praznega seznama"""
     assert serialize_list_to_json([]) == []
-    assert serialize_list_to_json(None) == []
\ No newline at end of file
+    assert serialize_list_to_json(None) == []
+
+def test_has_unit_filters():
+    """Test da povzetek stavb zadošča samo za filter po letu"""
+    assert not has_unit_filters(None)
+    assert not has_unit_filters({"filter_leto": 2024})
+    assert has_unit_filters({"filter_leto": 2024, "max_cena": 800.0})
+    assert has_unit_filters({"min_povrsina": 40.0})
@@ -0,0 +1,15 @@
+from app.deduplication import split_sifra_ko_ranges
+
+def test_split_sifra_ko_ranges_balanced():
+    """Test delitve katastrskih občin na obsege s podobnim številom vrstic"""
+    counts = [(1, 10), (2, 10), (3, 10), (4, 10)]
+
+    assert split_sifra_ko_ranges(counts, 2) == [(1, 2), (3, 4)]
+    assert split_sifra_ko_ranges(counts, 8) == [(1, 1), (2, 2), (3, 3), (4, 4)]
+
+def test_split_sifra_ko_ranges_large_ko():
+    """Test velike katastrske občine, ki sama zapolni shard"""
+    counts = [(5, 100), (7, 1), (9, 1)]
+
+    assert split_sifra_ko_ranges(counts, 2) == [(5, 5), (7, 9)]
+    assert split_sifra_ko_ranges([], 4) == []
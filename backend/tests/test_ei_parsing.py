@@ -0,0 +1,18 @@
+import pyarrow as pa
+from datetime import date
+
+from app.energetska_izkaznica_ingestion import EnergetskaIzkaznicaIngestionService
+
+def test_parse_slovenian_number():
+    """Test pretvorbe števil v slovenskem zapisu"""
+    values = pa.array(['1.234,56', '12,5', '-3', 'abc', None])
+
+    result = EnergetskaIzkaznicaIngestionService.parse_slovenian_number(values).to_pylist()
+    assert result == [1234.56, 12.5, -3.0, None, None]
+
+def test_parse_slovenian_date():
+    """Test pretvorbe datumov in zavrnitve neobstoječih datumov"""
+    values = pa.array(['01.02.2020', '5.3.2021', '31.02.2021', '', None])
+
+    result = EnergetskaIzkaznicaIngestionService.parse_slovenian_date(values).to_pylist()
+    assert result == [date(2020, 2, 1), date(2021, 3, 5), None, None, None]
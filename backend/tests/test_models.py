@@ -1,4 +1,4 @@
-from app.models import NpDelStavbe, KppDelStavbe, NpPosel, KppPosel
+from app.models import NpDelStavbe, KppDelStavbe, NpPosel, KppPosel, NpDelStavbePosel, KppDelStavbePosel, NpStavba, KppStavba
 
 def test_np_del_stavbe_model():
     """Test da NP model ima pričakovane atribute"""
@@ -25,4 +25,21 @@ def test_kpp_posel_model():
     """Test da KPP posel model ima pričakovane atribute"""
     assert hasattr(KppPosel, 'posel_id')
     assert hasattr(KppPosel, 'cena')  # KPP specific
-    assert KppPosel.__tablename__ == "kpp_posel"
\ No newline at end of file
+    assert KppPosel.__tablename__ == "kpp_posel"
+
+def test_del_stavbe_posel_models():
+    """Test da tabeli povezav nepremičnin s posli imata pričakovane atribute"""
+    for model in (NpDelStavbePosel, KppDelStavbePosel):
+        for attr in ('dedup_id', 'del_stavbe_id', 'posel_id', 'datum', 'cena'):
+            assert hasattr(model, attr)
+    assert NpDelStavbePosel.__tablename__ == "np_del_stavbe_posel"
+    assert KppDelStavbePosel.__tablename__ == "kpp_del_stavbe_posel"
+
+
+def test_stavba_models():
+    """Test da povzetka stavb imata ključ stavbe, število enot in centroid"""
+    for model in (NpStavba, KppStavba):
+        for attr in ('obcina', 'sifra_ko', 'stevilka_stavbe', 'zadnje_leto', 'stevilo_enot', 'del_stavbe_id', 'centroid'):
+            assert hasattr(model, attr)
+    assert NpStavba.__tablename__ == "np_stavba"
+    assert KppStavba.__tablename__ == "kpp_stavba"
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+
+from app.pipeline import PipelineRunner, PipelineStage, validate_stages, compute_fingerprint, stage_metrics, build_weekly_pipeline
+
+def noop(inputs):
+    return {}
+
+def test_validate_stages_order():
+    """Test topološkega vrstnega reda faz"""
+    stages = [
+        PipelineStage("core", noop, depends_on=["staging"]),
+        PipelineStage("prenos", noop),
+        PipelineStage("staging", noop, depends_on=["prenos"]),
+    ]
+
+    assert validate_stages(stages) == ["prenos", "staging", "core"]
+
+def test_validate_stages_errors():
+    """Test zavrnitve neznanih odvisnosti in ciklov"""
+    with pytest.raises(ValueError):
+        validate_stages([PipelineStage("a", noop, depends_on=["b"])])
+
+    with pytest.raises(ValueError):
+        validate_stages([PipelineStage("a", noop, depends_on=["b"]), PipelineStage("b", noop, after=["a"])])
+
+def test_stage_metrics_throughput():
+    """Test izračuna prepustnosti iz prebranih ali zapisanih vrstic"""
+    assert stage_metrics({"vrstice_prebrane": 1000, "vrstice_zapisane": 10}, 2.0)["vrstic_na_sekundo"] == 500.0
+    assert stage_metrics({"vrstice_zapisane": 10}, 4.0)["vrstic_na_sekundo"] == 2.5
+    assert stage_metrics({"bajti": 100}, 1.0) == {"vrstice_prebrane": None, "vrstice_zapisane": None, "bajti": 100, "vrstic_na_sekundo": None}
+
+class InMemoryRunner(PipelineRunner):
+    """Runner, ki faze beleži v pomnilnik namesto v pipeline shemo"""
+
+    def __init__(self, stages, last_success=None):
+        super().__init__("test", stages)
+        self.last_success = last_success or {}
+        self.statuses = {}
+
+    def _start_run(self, resume_zagon_id):
+        return 1, {}
+
+    def _finish_run(self, zagon_id, status):
+        self.status = status
+
+    def _get_last_success(self, stage_name):
+        return self.last_success.get(stage_name)
+
+    def _record_stage_start(self, zagon_id, stage_name, input_fingerprint):
+        self.statuses[stage_name] = "v_teku"
+
+    def _record_stage(self, zagon_id, stage_name, status, *args, **kwargs):
+        self.statuses[stage_name] = status
+
+def test_runner_skip_and_block():
+    """Test preskoka nespremenjene faze in blokiranja faz za neuspešno fazo"""
+    def fail(inputs):
+        raise RuntimeError("napaka")
+
+    stages = [
+        PipelineStage("prenos", lambda inputs: {"odtis": "abc"}, always_run=True),
+        PipelineStage("staging", noop, depends_on=["prenos"]),
+        PipelineStage("ei", fail),
+        PipelineStage("statistike", noop, depends_on=["staging", "ei"]),
+    ]
+    skipped_fingerprint = compute_fingerprint({}, ["abc"])
+    runner = InMemoryRunner(stages, {"staging": {"vhodni_odtis": skipped_fingerprint, "odtis": "x", "rezultat": {}}})
+
+    result = asyncio.run(runner.run())
+
+    assert result["status"] == "error"
+    assert runner.statuses == {"prenos": "uspesno", "staging": "preskoceno", "ei": "napaka", "statistike": "blokirano"}
+
+def test_weekly_pipeline_maintenance_tables():
+    """Test da vzdrževanje obdela samo tabele, ki so jih odvisne faze spremenile"""
+    class FakeMaintenance:
+        def run_maintenance(self, vacuum_tables):
+            self.args = vacuum_tables
+            return {"casi": {}, "napake": {}}
+
+    maintenance = FakeMaintenance()
+    stages = {stage.name: stage for stage in build_weekly_pipeline([2024], None, None, None, None, maintenance)}
+    assert "vzdrzevanje" in validate_stages(list(stages.values()))
+
+    stages["vzdrzevanje"].func({
+        "core_np_2024": {"vrstice_zapisane": 5},
+        "core_kpp_2024": {"vrstice_zapisane": 0},
+        "dedup_np": {"vrstice_zapisane": 3},
+        "dedup_kpp": {"vrstice_zapisane": 0},
+        "ei_propagacija": {"vrstice_zapisane": 1},
+    })
+    assert maintenance.args == [
+        "core.np_posel_2024", "core.np_del_stavbe_2024", "core.np_spremenjene_nepremicnine",
+        "core.np_del_stavbe_deduplicated", "core.np_del_stavbe_posel", "core.np_stavba", "core.energetska_izkaznica"
+    ]
@@ -0,0 +1,28 @@
+from app.quantile_sketch import SKICA_RELATIVNA_NAPAKA, build_sketch, merge_sketches, sketch_quantile, sketch_quantiles
+
+
+def test_sketch_quantile_relative_error():
+    """Test relativne napake kvantilov skice in odpornosti mediane na posamezne zelo drage posle"""
+    values = [1000 + 10 * i for i in range(101)] + [50000, 80000]
+    sketch = build_sketch(values)
+
+    mediana = sketch_quantile(sketch, 0.5)
+    assert abs(mediana - 1510) / 1510 <= SKICA_RELATIVNA_NAPAKA
+    assert sketch_quantile({}, 0.5) is None
+    assert build_sketch([None, 0, -5]) == {}
+
+
+def test_merge_sketches_equals_sketch_of_union():
+    """Test združevanja skic (npr. KO -> občina, meseci -> leto) brez ponovnega branja vrednosti"""
+    a = [1200, 2500, 3100, 4000]
+    b = [900, 2600, 7000]
+    sketch_a = build_sketch(a)
+    sketch_b = build_sketch(b)
+
+    merged = merge_sketches([
+        (sorted(sketch_a), [sketch_a[k] for k in sorted(sketch_a)]),
+        (sorted(sketch_b), [sketch_b[k] for k in sorted(sketch_b)]),
+    ])
+
+    assert merged == build_sketch(a + b)
+    assert sketch_quantiles(merged) == sketch_quantiles(build_sketch(a + b))
@@ -37,4 +37,66 @@ def test_property_details_not_found(mock_service, client):
     mock_service.return_value = None
     
     response = client.get("/property-details/999?data_source=np")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+
+def test_ingest_invalid_mode(client):
+    """Test napačnega mode parametra pri vnosu podatkov"""
+    response = client.post("/api/deli-stavb/ingest?data_type=np&start_year=2024&end_year=2024&mode=invalid")
+    assert response.status_code == 400
+
+
+@patch('app.routes.get_pipeline_runs')
+def test_pipeline_runs(mock_runs, client):
+    """Test seznama zagonov pipeline-a"""
+    mock_runs.return_value = {"status": "success", "runs": []}
+
+    response = client.get("/api/pipeline/runs?limit=5")
+    assert response.status_code == 200
+    mock_runs.assert_called_once_with(5, None)
+
+
+@patch('app.routes.enqueue_job')
+def test_ingest_enqueues_job(mock_enqueue, client):
+    """Test da vnos podatkov samo vpiše opravilo v čakalno vrsto workerja"""
+    mock_enqueue.return_value = {"opravilo_id": 7, "novo": True}
+
+    response = client.post("/api/deli-stavb/ingest?data_type=np&start_year=2023&end_year=2024&mode=merge")
+    assert response.status_code == 202
+    assert response.json()["opravilo_id"] == 7
+    mock_enqueue.assert_called_once_with(
+        "vnos_podatkov", {"data_type": "np", "years": [2023, 2024], "mode": "merge", "bulk": False}
+    )
+
+
+@patch('app.routes.get_job')
+def test_pipeline_opravilo_not_found(mock_job, client):
+    """Test ko opravilo ne obstaja"""
+    mock_job.return_value = None
+
+    response = client.get("/api/pipeline/opravila/999")
+    assert response.status_code == 404
+
+
+def test_obdobje_statistike_invalid_period(client):
+    """Test napačnega obdobja pri statistikah za obdobje"""
+    response = client.get("/api/statistike/obdobje/obcina/LJUBLJANA?od=2024-01&zadnjih_mesecev=6")
+    assert response.status_code == 400
+
+
+def test_statistike_bbox_invalid(client):
+    """Test obrnjenega bbox parametra pri statistikah pogleda"""
+    response = client.get("/api/statistike/bbox?bbox=15,46,14,47")
+    assert response.status_code == 400
+
+
+def test_choropleth_invalid_format(client):
+    """Test nepodprtega formata podatkov zemljevida"""
+    response = client.get("/api/statistike/choropleth?format=xml")
+    assert response.status_code == 400
+
+
+def test_batch_statistike_invalid(client):
+    """Test prazne zahteve za statistike več regij"""
+    response = client.post("/api/statistike/batch", json={"regije": []})
+    assert response.status_code == 400
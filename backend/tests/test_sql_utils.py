@@ -0,0 +1,21 @@
+from app.sql_utils import clone_index_definition, get_sql_query
+
+def test_clone_index_definition_partitioned():
+    """Test prepisa indeksa particionirane tabele na drugo tabelo"""
+    definition = "CREATE INDEX idx_np_del_stavbe_coordinates ON ONLY core.np_del_stavbe USING gist (coordinates)"
+
+    result = clone_index_definition(definition, "core.np_del_stavbe_2024_novo")
+    assert result == "CREATE INDEX ON core.np_del_stavbe_2024_novo USING gist (coordinates)"
+
+def test_clone_index_definition_named():
+    """Test prepisa indeksa z novim imenom"""
+    definition = "CREATE UNIQUE INDEX uq_idx ON core.tabela USING btree (a, b) WHERE (a IS NOT NULL)"
+
+    result = clone_index_definition(definition, "core.tabela_novo", "uq_idx_novo")
+    assert result == "CREATE UNIQUE INDEX uq_idx_novo ON core.tabela_novo USING btree (a, b) WHERE (a IS NOT NULL)"
+
+def test_get_sql_query_placeholders():
+    """Test zamenjave ciljne tabele v transform skripti"""
+    query = get_sql_query("np_posel_transform.sql", target_table="core.np_posel_2024_novo")
+    assert "INSERT INTO core.np_posel_2024_novo" in query
+    assert "{target_table}" not in query
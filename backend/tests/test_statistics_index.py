@@ -0,0 +1,98 @@
+import json
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+from app.statistics_index import StatisticsIndex, render_full_documents, build_batch_statistics
+
+
+def _row(tip_regije, ime_regije, tip_posla, vrsta, tip_obdobja, leto, cena_m2, posli):
+    return SimpleNamespace(
+        tip_regije=tip_regije, ime_regije=ime_regije, vrsta_nepremicnine=vrsta, tip_posla=tip_posla,
+        tip_obdobja=tip_obdobja, leto=leto, povprecna_cena_m2=cena_m2, povprecna_skupna_cena=None,
+        stevilo_poslov=posli, aktivna_v_letu=0, povprecna_velikost_m2=None, povprecna_starost_stavbe=None,
+        mediana_cena_m2=cena_m2, p10_cena_m2=None, p90_cena_m2=None,
+        mediana_skupna_cena=None, p10_skupna_cena=None, p90_skupna_cena=None
+    )
+
+
+def test_statistics_index_full_and_general():
+    """Test dokumentov po regijah: letni podatki od najnovejšega leta, splošne statistike samo za 2025"""
+    rows = [
+        _row("obcina", "LJUBLJANA", "prodaja", "stanovanje", "letno", 2024, 3500, 10),
+        _row("obcina", "LJUBLJANA", "prodaja", "stanovanje", "letno", 2025, 3800, 12),
+        _row("obcina", "LJUBLJANA", "prodaja", "stanovanje", "zadnjih12m", None, 3700, 11),
+        _row("obcina", "KOPER", "najem", "hisa", "letno", 2023, 12, 2),
+    ]
+    documents = render_full_documents(rows)
+    index = StatisticsIndex(rows, documents, verzija=3)
+
+    dokument = json.loads(index.documents[("obcina", "LJUBLJANA")])
+    assert dokument["status"] == "success"
+    full = dokument["statistike"]
+    assert [p["leto"] for p in full["prodaja"]["stanovanje"]["letno"]] == [2025, 2024]
+    assert full["prodaja"]["stanovanje"]["zadnjih12m"]["cene"]["povprecna_cena_m2"] == 3700.0
+    assert full["prodaja"]["stanovanje"]["zadnjih12m"]["cene"]["mediana_cena_m2"] == 3700.0
+    assert full["najem"]["hisa"] == {"letno": [], "zadnjih12m": None}
+
+    assert index.general[("obcina", "LJUBLJANA")]["pregled"]["prodaja_stanovanje"]["stevilo_poslov"] == 12
+    assert ("obcina", "KOPER") not in index.general
+    assert ("katastrska_obcina", "LJUBLJANA") not in index.documents
+
+
+def test_statistics_index_cene_m2_weighted():
+    """Test tehtanega povprečja cen na m² stanovanj in hiš za zadnjih 12 mesecev"""
+    index = StatisticsIndex([
+        _row("obcina", "KOPER", "prodaja", "stanovanje", "zadnjih12m", None, 3000, 3),
+        _row("obcina", "KOPER", "prodaja", "hisa", "zadnjih12m", None, 2000, 1),
+        _row("obcina", "KOPER", "najem", "hisa", "zadnjih12m", None, None, 4),
+    ])
+
+    koper = index.cene_m2_12m["obcina"]["KOPER"]
+    assert koper["prodaja"]["skupna_povprecna_cena_m2"] == 2750.0
+    assert koper["prodaja"]["skupaj_poslov"] == 4
+    assert koper["najem"]["skupaj_poslov"] == 0
+    assert index.posli_12m["obcina"]["KOPER"]["skupaj_vsi_posli"] == 8
+    assert index.posli_12m["katastrska_obcina"] == {}
+
+
+def test_statistics_index_choropleth():
+    """Test vzporednih stolpcev zemljevida v JSON in Arrow IPC"""
+    index = StatisticsIndex([
+        _row("obcina", "KOPER", "prodaja", "stanovanje", "zadnjih12m", None, 3000, 3),
+        _row("obcina", "KOPER", "prodaja", "hisa", "zadnjih12m", None, 2000, 1),
+        _row("obcina", "BLED", "najem", "hisa", "zadnjih12m", None, None, 4),
+        _row("katastrska_obcina", "2605", "prodaja", "stanovanje", "zadnjih12m", None, 3100, 2),
+    ], verzija=5)
+
+    dokument = json.loads(index.choropleth[("json", True)])
+    obcine = dokument["obcina"]
+    assert obcine["regija"] == ["BLED", "KOPER"]
+    assert obcine["posli_prodaja"] == [0, 4]
+    assert obcine["posli_najem_hisa"] == [4, 0]
+    assert obcine["cena_m2_prodaja"] == [None, 2750.0]
+    assert dokument["katastrska_obcina"]["regija"] == ["2605"]
+    assert "katastrska_obcina" not in json.loads(index.choropleth[("json", False)])
+
+    tabela = pa.ipc.open_stream(index.choropleth[("arrow", True)]).read_all()
+    assert tabela.num_rows == 3
+    assert tabela.column("regija").to_pylist() == ["BLED", "KOPER", "2605"]
+    assert tabela.column("posli_prodaja_stanovanje").to_pylist() == [0, 3, 2]
+    assert tabela.schema.metadata[b"verzija"] == b"5"
+
+
+def test_build_batch_statistics():
+    """Test kompaktnih statistik regije z izbranimi metrikami in obdobji"""
+    rows = [
+        _row("obcina", "KOPER", "prodaja", "stanovanje", "letno", 2024, 3500, 10),
+        _row("obcina", "KOPER", "prodaja", "stanovanje", "letno", 2023, 3300, 9),
+        _row("obcina", "KOPER", "prodaja", "stanovanje", "zadnjih12m", None, 3600, 11),
+    ]
+
+    statistike = build_batch_statistics(rows, ["povprecna_cena_m2", "stevilo_poslov"], {"zadnjih12m", "2024"})
+
+    assert statistike == {"prodaja": {"stanovanje": {
+        "2024": {"povprecna_cena_m2": 3500.0, "stevilo_poslov": 10},
+        "zadnjih12m": {"povprecna_cena_m2": 3600.0, "stevilo_poslov": 11},
+    }}}
+    assert list(build_batch_statistics(rows, ["stevilo_poslov"])["prodaja"]["stanovanje"]) == ["2024", "2023", "zadnjih12m"]
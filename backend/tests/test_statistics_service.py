@@ -0,0 +1,112 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.statistics_service import (
+    needs_12m_refresh, resolve_period, build_period_statistics, grid_cell_range, polygon_bounds, build_area_statistics,
+    parse_batch_request
+)
+
+
+def test_needs_12m_refresh():
+    """Test preračuna zadnjih 12 mesecev samo ob premiku okna ali spremembi let v oknu"""
+    danes = date(2025, 6, 1)
+
+    assert needs_12m_refresh(None, danes, [])
+    assert needs_12m_refresh(date(2025, 5, 31), danes, [])
+    assert not needs_12m_refresh(danes, danes, [2019, 2023])
+    assert needs_12m_refresh(danes, danes, [2024])
+
+
+def test_resolve_period():
+    """Test obdobja iz od/do ali drsečega števila mesecev"""
+    danes = date(2025, 3, 15)
+
+    assert resolve_period("2023-01", "2024-06", None, danes) == (date(2023, 1, 1), date(2024, 6, 1))
+    assert resolve_period("2024-11", None, None, danes) == (date(2024, 11, 1), date(2025, 3, 1))
+    assert resolve_period(None, None, 12, danes) == (date(2024, 4, 1), date(2025, 3, 1))
+
+    for od, do, zadnjih in [(None, None, None), ("2024-13", None, None), ("2025-01", "2024-01", None), ("2024-01", None, 6), (None, None, 0)]:
+        with pytest.raises(ValueError):
+            resolve_period(od, do, zadnjih, danes)
+
+
+def test_build_period_statistics():
+    """Test povprečij obdobja iz vsot in števcev mesečne kocke"""
+    rows = [SimpleNamespace(
+        tip_posla="prodaja", vrsta_nepremicnine="stanovanje", stevilo_poslov=3,
+        vsota_cena_m2=9000.0, cena_m2_count=3, vsota_skupna_cena=450000.0, skupna_cena_count=3,
+        vsota_velikost_m2=150.4, velikost_m2_count=2, vsota_starost_stavbe=None, starost_stavbe_count=0
+    )]
+
+    statistike = build_period_statistics(rows)
+
+    stanovanje = statistike["prodaja"]["stanovanje"]
+    assert stanovanje["cene"]["povprecna_cena_m2"] == 3000.0
+    assert stanovanje["aktivnost"]["stevilo_poslov"] == 3
+    assert stanovanje["lastnosti"] == {"povprecna_velikost_m2": 75.0, "povprecna_starost_stavbe": None}
+    assert statistike["najem"]["hisa"] is None
+
+
+def test_grid_cell_range_and_polygon_bounds():
+    """Test celic mreže, ki prekrivajo bbox, in bbox-a poligona"""
+    assert grid_cell_range(14.5, 46.0, 14.51, 46.012, velikost=0.005) == (2900, 9200, 2902, 9202)
+    with pytest.raises(ValueError):
+        grid_cell_range(15, 46, 14, 47)
+
+    multipoligon = {"type": "MultiPolygon", "coordinates": [
+        [[[14.0, 46.0], [14.2, 46.0], [14.2, 46.1], [14.0, 46.0]]],
+        [[[15.0, 45.5], [15.1, 45.5], [15.1, 45.6], [15.0, 45.5]]],
+    ]}
+    assert polygon_bounds(multipoligon) == (14.0, 45.5, 15.1, 46.1)
+    with pytest.raises(ValueError):
+        polygon_bounds({"type": "Point", "coordinates": [14.0, 46.0]})
+
+    # Napačne koordinate morajo vrniti ValueError (400), ne TypeError ali IndexError
+    for koordinate in (None, 14.0, [14.0, 46.0], [[[14.0, 46.0]]], [[["a", "b"], [1, 2], [3, 4], [1, 2]]],
+                       [[[14.0], [14.2, 46.0], [14.2, 46.1], [14.0, 46.0]]], [[[True, 46.0], [14.2, 46.0], [14.2, 46.1], [14.0, 46.0]]]):
+        with pytest.raises(ValueError):
+            polygon_bounds({"type": "Polygon", "coordinates": koordinate})
+
+
+def test_build_area_statistics():
+    """Test statistik območja iz vsot celic in združenih veder skic"""
+    rows = [SimpleNamespace(
+        tip_posla="najem", vrsta_nepremicnine="stanovanje", stevilo_poslov=4,
+        vsota_cena_m2=50.0, cena_m2_count=4, vsota_velikost_m2=210.0, velikost_m2_count=3
+    )]
+    bucket_rows = [
+        SimpleNamespace(tip_posla="najem", vrsta_nepremicnine="stanovanje", vedro=124, stevilo=3),
+        SimpleNamespace(tip_posla="najem", vrsta_nepremicnine="stanovanje", vedro=150, stevilo=1),
+    ]
+
+    statistike = build_area_statistics(rows, bucket_rows)
+
+    stanovanje = statistike["najem"]["stanovanje"]
+    assert stanovanje["stevilo_poslov"] == 4
+    assert stanovanje["povprecna_cena_m2"] == 12.5
+    assert stanovanje["povprecna_velikost_m2"] == 70
+    assert stanovanje["mediana_cena_m2"] == pytest.approx(11.8, rel=0.02)
+    assert statistike["prodaja"]["hisa"] is None
+
+
+def test_parse_batch_request():
+    """Test preverjanja zahteve za statistike več regij"""
+    pari, metrike, obdobja = parse_batch_request(
+        [{"tip_regije": "obcina", "regija": "LJUBLJANA"}, {"tip_regije": "katastrska_obcina", "regija": 2605}],
+        ["stevilo_poslov"], ["zadnjih12m", 2024, "2023"]
+    )
+    assert pari == [("obcina", "LJUBLJANA"), ("katastrska_obcina", "2605")]
+    assert metrike == ["stevilo_poslov"]
+    assert obdobja == {"zadnjih12m", "2024", "2023"}
+    assert parse_batch_request([{"tip_regije": "slovenija", "regija": "SLOVENIJA"}])[2] is None
+
+    for regije, metrike, obdobja in [
+        ([], None, None),
+        ([{"tip_regije": "drzava", "regija": "X"}], None, None),
+        ([{"tip_regije": "obcina", "regija": "KOPER"}], ["neznana"], None),
+        ([{"tip_regije": "obcina", "regija": "KOPER"}], None, ["lani"]),
+    ]:
+        with pytest.raises(ValueError):
+            parse_batch_request(regije, metrike, obdobja)
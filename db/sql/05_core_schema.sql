@@ -1,9 +1,12 @@
 CREATE SCHEMA IF NOT EXISTS core;
 
+-- posel in del_stavbe tabele so particionirane po letu (LIST (leto)).
+-- Particije (npr. core.np_posel_2024) ustvari vnos podatkov (DataIngestionService),
+-- ponovni vnos leta pa zamenja celotno particijo namesto DELETE + INSERT.
 
 DROP TABLE IF EXISTS core.np_posel CASCADE;
 CREATE TABLE core.np_posel (
-  posel_id                     INTEGER         PRIMARY KEY,
+  posel_id                     INTEGER         NOT NULL,
   vrsta_posla                  SMALLINT,
 
   datum_uveljavitve            DATE,
@@ -25,13 +28,15 @@ CREATE TABLE core.np_posel (
   vrsta_akta                   SMALLINT, -- samo za najemne
   trznost_posla                SMALLINT, --od 2015 dalje
 
-  leto                         SMALLINT
-);
+  leto                         SMALLINT        NOT NULL,
+
+  PRIMARY KEY (posel_id, leto)
+) PARTITION BY LIST (leto);
 
 
 DROP TABLE IF EXISTS core.kpp_posel CASCADE;
 CREATE TABLE core.kpp_posel (
-    posel_id                INTEGER         PRIMARY KEY,
+    posel_id                INTEGER         NOT NULL,
     vrsta_posla             SMALLINT,
 
     datum_uveljavitve       DATE,
@@ -44,14 +49,16 @@ CREATE TABLE core.kpp_posel (
     datum_zadnje_spremembe  DATE,
     datum_zadnje_uveljavitve DATE,
     trznost_posla           SMALLINT, --od 2015 dalje
-    leto                    SMALLINT
-);
+    leto                    SMALLINT        NOT NULL,
+
+    PRIMARY KEY (posel_id, leto)
+) PARTITION BY LIST (leto);
 
 
 
 DROP TABLE IF EXISTS core.np_del_stavbe CASCADE;
 CREATE TABLE core.np_del_stavbe (
-  del_stavbe_id         SERIAL          PRIMARY KEY,
+  del_stavbe_id         SERIAL,
   posel_id              INTEGER         NOT NULL,
   sifra_ko              SMALLINT        NOT NULL,
   ime_ko                VARCHAR(101),
@@ -78,15 +85,16 @@ CREATE TABLE core.np_del_stavbe (
 
   -- podatki so pretvorjeni iz slovenskega sistema (SRID 3794) v WGS84
   coordinates           GEOMETRY(Point, 4326),
-  leto                  SMALLINT,
+  leto                  SMALLINT        NOT NULL,
 
-  CONSTRAINT fk_np_del_stavbe_posel FOREIGN KEY (posel_id) REFERENCES core.np_posel(posel_id)
-);
+  PRIMARY KEY (del_stavbe_id, leto),
+  CONSTRAINT fk_np_del_stavbe_posel FOREIGN KEY (posel_id, leto) REFERENCES core.np_posel(posel_id, leto)
+) PARTITION BY LIST (leto);
 
 
 DROP TABLE IF EXISTS core.kpp_del_stavbe CASCADE;
 CREATE TABLE core.kpp_del_stavbe (
-    del_stavbe_id                           SERIAL          PRIMARY KEY,
+    del_stavbe_id                           SERIAL,
     posel_id                                INTEGER         NOT NULL,
     sifra_ko                                SMALLINT        NOT NULL,
     ime_ko                                  VARCHAR(101),
@@ -117,10 +125,11 @@ CREATE TABLE core.kpp_del_stavbe (
     pogodbena_cena                          NUMERIC(20,2),
     stopnja_ddv                             NUMERIC(5,2),
     coordinates                             GEOMETRY(Point, 4326),  -- podatki so pretvorjeni iz slovenskega sistema (SRID 3794) v WGS84
-    leto                                    SMALLINT,
+    leto                                    SMALLINT        NOT NULL,
 
-    CONSTRAINT fk_kpp_del_stavbe_posel FOREIGN KEY (posel_id) REFERENCES core.kpp_posel(posel_id)
-);
+    PRIMARY KEY (del_stavbe_id, leto),
+    CONSTRAINT fk_kpp_del_stavbe_posel FOREIGN KEY (posel_id, leto) REFERENCES core.kpp_posel(posel_id, leto)
+) PARTITION BY LIST (leto);
 
 
 
@@ -156,8 +165,7 @@ CREATE TABLE core.np_del_stavbe_deduplicated (
     zadnje_leto                 SMALLINT,
     zadnje_stevilo_delov_stavb  SMALLINT,
 
-    povezani_del_stavbe_ids     INTEGER[]       NOT NULL,
-    povezani_posel_ids          INTEGER[]       NOT NULL,
+    stevilo_poslov              INTEGER         NOT NULL,   -- povezani posli in deli stavb so v <prefix>_del_stavbe_posel
     najnovejsi_del_stavbe_id    INTEGER         NOT NULL,
     energetske_izkaznice        INTEGER[],
     energijski_razred           VARCHAR(3),
@@ -200,8 +208,7 @@ CREATE TABLE core.kpp_del_stavbe_deduplicated (
     zadnje_leto                 SMALLINT,
     zadnje_stevilo_delov_stavb  SMALLINT,
 
-    povezani_del_stavbe_ids     INTEGER[]       NOT NULL,
-    povezani_posel_ids          INTEGER[]       NOT NULL,
+    stevilo_poslov              INTEGER         NOT NULL,   -- povezani posli in deli stavb so v <prefix>_del_stavbe_posel
     najnovejsi_del_stavbe_id    INTEGER         NOT NULL,
     energetske_izkaznice        INTEGER[],
     energijski_razred           VARCHAR(3),
@@ -213,6 +220,105 @@ CREATE TABLE core.kpp_del_stavbe_deduplicated (
 
 
 
+-- Nepremičnine, ki jih je spremenil vnos podatkov in še niso bile ponovno deduplicirane
+-- (polni jih DataIngestionService, prazni inkrementalno dedupliciranje)
+DROP TABLE IF EXISTS core.np_spremenjene_nepremicnine;
+CREATE TABLE core.np_spremenjene_nepremicnine (
+    sifra_ko                    SMALLINT        NOT NULL,
+    stevilka_stavbe             INTEGER         NOT NULL,
+    stevilka_dela_stavbe        INTEGER         NOT NULL,
+
+    PRIMARY KEY (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
+);
+
+
+DROP TABLE IF EXISTS core.kpp_spremenjene_nepremicnine;
+CREATE TABLE core.kpp_spremenjene_nepremicnine (
+    sifra_ko                    SMALLINT        NOT NULL,
+    stevilka_stavbe             INTEGER         NOT NULL,
+    stevilka_dela_stavbe        INTEGER         NOT NULL,
+
+    PRIMARY KEY (sifra_ko, stevilka_stavbe, stevilka_dela_stavbe)
+);
+
+
+
+-- Povezave deduplicirane nepremičnine z vsemi deli stavb njenih poslov (namesto tabel povezanih id-jev)
+-- (polni jih dedupliciranje; dedup_id je del_stavbe_id v <prefix>_del_stavbe_deduplicated)
+DROP TABLE IF EXISTS core.np_del_stavbe_posel;
+CREATE TABLE core.np_del_stavbe_posel (
+    dedup_id                    INTEGER         NOT NULL,
+    del_stavbe_id               INTEGER         NOT NULL,
+    posel_id                    INTEGER         NOT NULL,
+    datum                       DATE,           -- datum_sklenitve posla
+    cena                        NUMERIC(20,2),  -- najemnina posla
+
+    CONSTRAINT pk_np_del_stavbe_posel PRIMARY KEY (dedup_id, del_stavbe_id)
+);
+
+
+DROP TABLE IF EXISTS core.kpp_del_stavbe_posel;
+CREATE TABLE core.kpp_del_stavbe_posel (
+    dedup_id                    INTEGER         NOT NULL,
+    del_stavbe_id               INTEGER         NOT NULL,
+    posel_id                    INTEGER         NOT NULL,
+    datum                       DATE,           -- datum_sklenitve posla
+    cena                        NUMERIC(20,2),  -- cena posla
+
+    CONSTRAINT pk_kpp_del_stavbe_posel PRIMARY KEY (dedup_id, del_stavbe_id)
+);
+
+
+
+-- Povzetek stavb za zemljevid: ena vrstica na stavbo in leto zadnjega posla (filter_leto se tako
+-- uporabi brez branja posameznih delov stavb); polni jih dedupliciranje iz <prefix>_del_stavbe_deduplicated
+DROP TABLE IF EXISTS core.np_stavba;
+CREATE TABLE core.np_stavba (
+    obcina                      VARCHAR(102),
+    sifra_ko                    SMALLINT        NOT NULL,
+    stevilka_stavbe             INTEGER         NOT NULL,
+    zadnje_leto                 SMALLINT        NOT NULL,
+
+    stevilo_enot                INTEGER         NOT NULL,
+    del_stavbe_id               INTEGER         NOT NULL,   -- najmanjši del_stavbe_id enot (edina enota, če je stevilo_enot = 1)
+
+    min_cena                    NUMERIC(20,2),  -- zadnja_najemnina
+    max_cena                    NUMERIC(20,2),
+    povprecna_cena              NUMERIC(20,2),
+    stevilo_cen                 INTEGER         NOT NULL,   -- enote z znano ceno (utež povprečja pri združevanju let)
+    min_povrsina                NUMERIC(10,2),  -- povrsina_uradna
+    max_povrsina                NUMERIC(10,2),
+    povprecna_povrsina          NUMERIC(10,2),
+    stevilo_povrsin             INTEGER         NOT NULL,
+
+    centroid                    GEOMETRY(Point, 4326) NOT NULL
+);
+
+
+DROP TABLE IF EXISTS core.kpp_stavba;
+CREATE TABLE core.kpp_stavba (
+    obcina                      VARCHAR(102),
+    sifra_ko                    SMALLINT        NOT NULL,
+    stevilka_stavbe             INTEGER         NOT NULL,
+    zadnje_leto                 SMALLINT        NOT NULL,
+
+    stevilo_enot                INTEGER         NOT NULL,
+    del_stavbe_id               INTEGER         NOT NULL,   -- najmanjši del_stavbe_id enot (edina enota, če je stevilo_enot = 1)
+
+    min_cena                    NUMERIC(20,2),  -- zadnja_cena
+    max_cena                    NUMERIC(20,2),
+    povprecna_cena              NUMERIC(20,2),
+    stevilo_cen                 INTEGER         NOT NULL,   -- enote z znano ceno (utež povprečja pri združevanju let)
+    min_povrsina                NUMERIC(10,2),  -- povrsina_uradna
+    max_povrsina                NUMERIC(10,2),
+    povprecna_povrsina          NUMERIC(10,2),
+    stevilo_povrsin             INTEGER         NOT NULL,
+
+    centroid                    GEOMETRY(Point, 4326) NOT NULL
+);
+
+
+
 DROP TABLE IF EXISTS core.energetska_izkaznica;
 CREATE TABLE core.energetska_izkaznica (
     id SERIAL PRIMARY KEY,
@@ -288,7 +394,6 @@ DROP INDEX IF EXISTS core.idx_np_del_stavbe_deduplicated_leto_desc;
 
 CREATE INDEX idx_np_del_stavbe_deduplicated_building        ON core.np_del_stavbe_deduplicated (obcina, sifra_ko, stevilka_stavbe);
 CREATE INDEX idx_np_del_stavbe_deduplicated_coords          ON core.np_del_stavbe_deduplicated USING GIST (coordinates);
-CREATE INDEX idx_np_del_stavbe_deduplicated_related_ids     ON core.np_del_stavbe_deduplicated USING GIN (povezani_del_stavbe_ids);
 CREATE INDEX idx_np_del_stavbe_deduplicated_obcina          ON core.np_del_stavbe_deduplicated (obcina);
 CREATE INDEX idx_np_del_stavbe_deduplicated_filters         ON core.np_del_stavbe_deduplicated (zadnje_leto DESC, zadnja_najemnina DESC, povrsina_uradna);
 CREATE INDEX idx_np_del_stavbe_deduplicated_leto_desc       ON core.np_del_stavbe_deduplicated (zadnje_leto DESC);
@@ -303,12 +408,34 @@ DROP INDEX IF EXISTS core.idx_np_del_stavbe_deduplicated_leto_desc;
 
 CREATE INDEX idx_kpp_del_stavbe_deduplicated_building       ON core.kpp_del_stavbe_deduplicated (obcina, sifra_ko, stevilka_stavbe);
 CREATE INDEX idx_kpp_del_stavbe_deduplicated_coords         ON core.kpp_del_stavbe_deduplicated USING GIST (coordinates);
-CREATE INDEX idx_kpp_del_stavbe_deduplicated_related_ids    ON core.kpp_del_stavbe_deduplicated USING GIN (povezani_del_stavbe_ids);
 CREATE INDEX idx_kpp_del_stavbe_deduplicated_obcina         ON core.kpp_del_stavbe_deduplicated (obcina);
 CREATE INDEX idx_kpp_del_stavbe_deduplicated_filters        ON core.kpp_del_stavbe_deduplicated (zadnje_leto DESC, zadnja_cena DESC, povrsina_uradna);
 CREATE INDEX idx_np_del_stavbe_deduplicated_leto_desc       ON core.np_del_stavbe_deduplicated (zadnje_leto DESC);
 
+-- POVEZAVE DEDUPLICIRANIH NEPREMIČNIN S POSLI
+-- Pokrivni indeks: zgodovina poslov nepremičnine (po datumu) z index-only scan
+DROP INDEX IF EXISTS core.idx_np_del_stavbe_posel_zgodovina;
+DROP INDEX IF EXISTS core.idx_kpp_del_stavbe_posel_zgodovina;
+
+CREATE INDEX idx_np_del_stavbe_posel_zgodovina  ON core.np_del_stavbe_posel (dedup_id, datum DESC) INCLUDE (posel_id, del_stavbe_id, cena);
+CREATE INDEX idx_kpp_del_stavbe_posel_zgodovina ON core.kpp_del_stavbe_posel (dedup_id, datum DESC) INCLUDE (posel_id, del_stavbe_id, cena);
+
+-- POVZETEK STAVB
+DROP INDEX IF EXISTS core.idx_np_stavba_centroid;
+DROP INDEX IF EXISTS core.idx_np_stavba_kljuc;
+DROP INDEX IF EXISTS core.idx_kpp_stavba_centroid;
+DROP INDEX IF EXISTS core.idx_kpp_stavba_kljuc;
+
+CREATE INDEX idx_np_stavba_centroid  ON core.np_stavba USING GIST (centroid);
+CREATE INDEX idx_np_stavba_kljuc     ON core.np_stavba (sifra_ko, stevilka_stavbe);
+CREATE INDEX idx_kpp_stavba_centroid ON core.kpp_stavba USING GIST (centroid);
+CREATE INDEX idx_kpp_stavba_kljuc    ON core.kpp_stavba (sifra_ko, stevilka_stavbe);
+
 -- ENERGETSKE IZKAZNICE
 DROP INDEX IF EXISTS core.idx_energetska_izkaznica_ko_stavba;
 
 CREATE INDEX idx_energetska_izkaznica_ko_stavba ON core.energetska_izkaznica(sifra_ko, stevilka_stavbe, stevilka_dela_stavbe);
+
+DROP INDEX IF EXISTS core.idx_energetska_izkaznica_ei_id;
+
+CREATE INDEX idx_energetska_izkaznica_ei_id ON core.energetska_izkaznica(ei_id);
@@ -1,7 +1,10 @@
 CREATE SCHEMA IF NOT EXISTS stats;
 
+-- Statistike se računajo neposredno v stats.statistike_cache (brez materialized views)
 DROP MATERIALIZED VIEW IF EXISTS stats.mv_najemne_statistike CASCADE;
 DROP MATERIALIZED VIEW IF EXISTS stats.mv_prodajne_statistike CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS stats.mv_najemne_statistike_12m CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS stats.mv_prodajne_statistike_12m CASCADE;
 
 DROP TABLE IF EXISTS stats.statistike_cache CASCADE;
 CREATE TABLE stats.statistike_cache (
@@ -17,6 +20,14 @@ CREATE TABLE stats.statistike_cache (
     -- OSNOVNE CENE/NAJEMNINE
     povprecna_cena_m2 FLOAT,
     povprecna_skupna_cena FLOAT,
+
+    -- KVANTILI CEN/NAJEMNIN (logaritemska vedra, app/quantile_sketch.py; isti posli kot povprečja)
+    mediana_cena_m2 FLOAT,
+    p10_cena_m2 FLOAT,
+    p90_cena_m2 FLOAT,
+    mediana_skupna_cena FLOAT,
+    p10_skupna_cena FLOAT,
+    p90_skupna_cena FLOAT,
     
     -- OSNOVNE STATISTIKE
     stevilo_poslov INTEGER DEFAULT 0,
@@ -37,4 +48,101 @@ CREATE TABLE stats.statistike_cache (
 CREATE INDEX idx_statistike_cache_iskanje ON stats.statistike_cache(tip_regije, ime_regije, vrsta_nepremicnine, tip_posla, tip_obdobja);
 CREATE INDEX idx_statistike_cache_regija ON stats.statistike_cache(ime_regije);
 CREATE INDEX idx_statistike_cache_obdobje ON stats.statistike_cache(tip_obdobja, leto);
-CREATE INDEX idx_statistike_cache_tip_posla ON stats.statistike_cache(tip_posla);
\ No newline at end of file
+CREATE INDEX idx_statistike_cache_tip_posla ON stats.statistike_cache(tip_posla);
+
+-- Mesečna kocka statistik: aditivni seštevki in števci po regiji, mesecu sklenitve, tipu posla in vrsti
+-- nepremičnine; statistike za poljubno obdobje so vsote vrstic mesecev obdobja (povprečje = vsota / število)
+DROP TABLE IF EXISTS stats.statistike_mesecno;
+CREATE TABLE stats.statistike_mesecno (
+    tip_regije VARCHAR(20) NOT NULL,
+    ime_regije VARCHAR(100) NOT NULL,
+    vrsta_nepremicnine VARCHAR(20) NOT NULL,
+    tip_posla VARCHAR(10) NOT NULL,
+    mesec DATE NOT NULL, -- prvi dan meseca
+
+    stevilo_poslov INTEGER NOT NULL DEFAULT 0,
+
+    vsota_cena_m2 DOUBLE PRECISION,
+    cena_m2_count INTEGER NOT NULL DEFAULT 0,
+    vsota_skupna_cena DOUBLE PRECISION,
+    skupna_cena_count INTEGER NOT NULL DEFAULT 0,
+    vsota_velikost_m2 DOUBLE PRECISION,
+    velikost_m2_count INTEGER NOT NULL DEFAULT 0,
+    vsota_starost_stavbe DOUBLE PRECISION,
+    starost_stavbe_count INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT pk_statistike_mesecno PRIMARY KEY (tip_regije, ime_regije, tip_posla, vrsta_nepremicnine, mesec)
+);
+
+-- Mesečne skice kvantilov (logaritemska vedra, app/quantile_sketch.py) cene na m² in skupne cene po regiji,
+-- mesecu sklenitve, tipu posla in vrsti nepremičnine; skice se združujejo s seštevanjem števcev istih veder
+DROP TABLE IF EXISTS stats.statistike_mesecno_skica;
+CREATE TABLE stats.statistike_mesecno_skica (
+    tip_regije VARCHAR(20) NOT NULL,
+    ime_regije VARCHAR(100) NOT NULL,
+    vrsta_nepremicnine VARCHAR(20) NOT NULL,
+    tip_posla VARCHAR(10) NOT NULL,
+    mesec DATE NOT NULL, -- prvi dan meseca
+    metrika VARCHAR(20) NOT NULL, -- 'cena_m2', 'skupna_cena'
+
+    vedra INTEGER[] NOT NULL, -- indeksi veder (naraščajoče)
+    stevci INTEGER[] NOT NULL, -- število vrednosti v vedrih
+
+    CONSTRAINT pk_statistike_mesecno_skica PRIMARY KEY (tip_regije, ime_regije, tip_posla, vrsta_nepremicnine, mesec, metrika)
+);
+
+-- Prostorska mreža statistik: aditivni seštevki in skica kvantilov cene na m² po celicah mreže
+-- (STATS_MREZA_VELIKOST stopinj), letu sklenitve, tipu posla in vrsti nepremičnine; statistike poljubnega
+-- območja na zemljevidu so vsote celic območja
+DROP TABLE IF EXISTS stats.statistike_mreza;
+CREATE TABLE stats.statistike_mreza (
+    celica_x INTEGER NOT NULL, -- FLOOR(dolžina / velikost)
+    celica_y INTEGER NOT NULL, -- FLOOR(širina / velikost)
+    tip_posla VARCHAR(10) NOT NULL,
+    vrsta_nepremicnine VARCHAR(20) NOT NULL,
+    leto INTEGER NOT NULL,
+
+    stevilo_poslov INTEGER NOT NULL DEFAULT 0,
+    vsota_cena_m2 DOUBLE PRECISION,
+    cena_m2_count INTEGER NOT NULL DEFAULT 0,
+    vsota_velikost_m2 DOUBLE PRECISION,
+    velikost_m2_count INTEGER NOT NULL DEFAULT 0,
+
+    vedra INTEGER[] NOT NULL, -- skica cene na m² (app/quantile_sketch.py)
+    stevci INTEGER[] NOT NULL,
+
+    CONSTRAINT pk_statistike_mreza PRIMARY KEY (celica_x, celica_y, tip_posla, vrsta_nepremicnine, leto)
+);
+
+-- Kodirani odgovori /api/statistike/vse po regijah (zgradijo se ob polnjenju cache, API jih vrne brez dekodiranja)
+DROP TABLE IF EXISTS stats.statistike_dokument;
+CREATE TABLE stats.statistike_dokument (
+    tip_regije VARCHAR(20) NOT NULL,
+    ime_regije VARCHAR(100) NOT NULL,
+    dokument BYTEA NOT NULL, -- UTF-8 JSON {"status": "success", "statistike": ...}
+
+    CONSTRAINT pk_statistike_dokument PRIMARY KEY (tip_regije, ime_regije)
+);
+
+
+-- Verzija cache statistik: poveča se ob vsakem polnjenju cache (v isti transakciji), API procesi
+-- po njej ugotovijo, da morajo ponovno naložiti indeks statistik v pomnilniku
+DROP TABLE IF EXISTS stats.statistike_verzija;
+CREATE TABLE stats.statistike_verzija (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), -- ena sama vrstica
+    verzija BIGINT NOT NULL DEFAULT 0,
+    posodobljeno TIMESTAMP NOT NULL DEFAULT NOW(),
+    okno_12m DATE -- dan, za katerega so izračunane statistike zadnjih 12 mesecev
+);
+
+INSERT INTO stats.statistike_verzija (id, verzija) VALUES (TRUE, 0);
+
+-- Leta statistik, na katera so vplivale spremembe core tabel od zadnje osvežitve cache (zapiše jih vnos
+-- podatkov, inkrementalna osvežitev statistik preračuna samo ta leta in jih nato izbriše)
+DROP TABLE IF EXISTS stats.spremenjena_leta;
+CREATE TABLE stats.spremenjena_leta (
+    tip_posla VARCHAR(10) NOT NULL, -- 'prodaja', 'najem'
+    leto INTEGER NOT NULL,
+
+    CONSTRAINT pk_spremenjena_leta PRIMARY KEY (tip_posla, leto)
+);
@@ -0,0 +1,65 @@
+CREATE SCHEMA IF NOT EXISTS pipeline;
+
+-- ZAGONI PIPELINE-A (npr. tedenska posodobitev)
+CREATE TABLE IF NOT EXISTS pipeline.zagon (
+    zagon_id            SERIAL          PRIMARY KEY,
+    ime                 VARCHAR(100)    NOT NULL,           -- npr. 'tedenska_posodobitev'
+    status              VARCHAR(20)     NOT NULL,           -- 'v_teku', 'uspesno', 'napaka'
+    zacetek             TIMESTAMP       NOT NULL DEFAULT NOW(),
+    konec               TIMESTAMP,
+    stevilo_nadaljevanj INTEGER         NOT NULL DEFAULT 0  -- kolikokrat je bil neuspešen zagon nadaljevan
+);
+
+-- FAZE ZAGONA
+-- vhodni_odtis je zgoščena vrednost parametrov faze in izhodnih odtisov odvisnih faz;
+-- faza se preskoči, če je enak vhodnemu odtisu zadnje uspešne izvedbe iste faze
+CREATE TABLE IF NOT EXISTS pipeline.faza (
+    zagon_id            INTEGER         NOT NULL REFERENCES pipeline.zagon(zagon_id) ON DELETE CASCADE,
+    faza                VARCHAR(100)    NOT NULL,           -- npr. 'core_np_2024'
+    status              VARCHAR(20)     NOT NULL,           -- 'v_teku', 'uspesno', 'preskoceno', 'napaka', 'blokirano'
+    zacetek             TIMESTAMP,
+    konec               TIMESTAMP,
+    trajanje_s          NUMERIC(12, 3),
+    vhodni_odtis        VARCHAR(64),
+    izhodni_odtis       VARCHAR(64),
+    vrstice_prebrane    BIGINT,                             -- prebrane vrstice (CSV, staging, ključi)
+    vrstice_zapisane    BIGINT,                             -- vstavljene, posodobljene in izbrisane vrstice
+    bajti               BIGINT,                             -- preneseni bajti (faze prenosa)
+    vrstic_na_sekundo   NUMERIC(14, 1),                     -- prepustnost: prebrane (ali zapisane) vrstice / trajanje_s
+    rezultat            JSONB,                              -- rezultat faze, ki ga prejmejo odvisne faze
+    napaka              TEXT,
+
+    PRIMARY KEY (zagon_id, faza)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pipeline_faza_zadnja ON pipeline.faza (faza, konec DESC);
+CREATE INDEX IF NOT EXISTS idx_pipeline_zagon_ime ON pipeline.zagon (ime, zacetek DESC);
+
+-- ŠTEVILO VRSTIC TABEL
+-- Natančno število vrstic iz rowcount stavkov, ki tabelo napolnijo ali spremenijo (namesto COUNT(*)).
+-- Particionirane tabele se beležijo po particijah; za tabele brez zapisa se uporabi ocena pg_class.reltuples.
+CREATE TABLE IF NOT EXISTS pipeline.stevilo_vrstic (
+    tabela              VARCHAR(200)    PRIMARY KEY,        -- shema.tabela, npr. 'core.np_del_stavbe_2024'
+    stevilo             BIGINT          NOT NULL,
+    posodobljeno        TIMESTAMP       NOT NULL DEFAULT NOW()
+);
+
+-- ČAKALNA VRSTA OPRAVIL ZA WORKER PROCES
+-- API in scheduler opravila samo vpišeta; worker (python -m app.worker) jih prevzame s FOR UPDATE SKIP LOCKED
+-- in izvede pod advisory zaklepom, tako da se zagoni, ki uporabljajo skupne staging tabele, nikoli ne prekrivajo
+CREATE TABLE IF NOT EXISTS pipeline.opravilo (
+    opravilo_id         SERIAL          PRIMARY KEY,
+    vrsta               VARCHAR(50)     NOT NULL,           -- 'vnos_podatkov', 'deduplikacija', 'energetske_izkaznice', 'statistike', 'tedenska_posodobitev'
+    parametri           JSONB           NOT NULL DEFAULT '{}',
+    status              VARCHAR(20)     NOT NULL,           -- 'cakajoce', 'v_teku', 'uspesno', 'napaka'
+    ustvarjeno          TIMESTAMP       NOT NULL DEFAULT NOW(),
+    zacetek             TIMESTAMP,
+    konec               TIMESTAMP,
+    zagon_id            INTEGER         REFERENCES pipeline.zagon(zagon_id) ON DELETE SET NULL,
+    rezultat            JSONB,
+    napaka              TEXT
+);
+
+-- Enako čakajoče opravilo (vrsta in parametri) se ne vpiše dvakrat
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pipeline_opravilo_cakajoce ON pipeline.opravilo (vrsta, parametri) WHERE status = 'cakajoce';
+CREATE INDEX IF NOT EXISTS idx_pipeline_opravilo_cakajoce ON pipeline.opravilo (ustvarjeno) WHERE status = 'cakajoce';
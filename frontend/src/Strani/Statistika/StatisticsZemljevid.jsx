@@ -310,34 +310,57 @@ export default function StatisticsZemljevid({
         return PERCENTILE_COLOR_PALETTES[colorType][getPercentileRange(value)];
     };
 
+    // Pretvorba vzporednih stolpcev (regija, posli_*, cena_m2_*) v podatke po regijah
+    const choroplethToRegions = (stolpci) => {
+        const posli = {};
+        const cene = {};
+
+        stolpci.regija.forEach((regija, i) => {
+            posli[regija] = { name: regija };
+            cene[regija] = { name: regija };
+
+            ['prodaja', 'najem'].forEach(tip => {
+                posli[regija][tip] = {
+                    stanovanje: stolpci[`posli_${tip}_stanovanje`][i],
+                    hisa: stolpci[`posli_${tip}_hisa`][i],
+                    skupaj: stolpci[`posli_${tip}`][i]
+                };
+                cene[regija][tip] = {
+                    stanovanje: { cena_m2: stolpci[`cena_m2_${tip}_stanovanje`][i] || 0, stevilo_poslov: stolpci[`posli_${tip}_stanovanje`][i] },
+                    hisa: { cena_m2: stolpci[`cena_m2_${tip}_hisa`][i] || 0, stevilo_poslov: stolpci[`posli_${tip}_hisa`][i] },
+                    skupna_povprecna_cena_m2: stolpci[`cena_m2_${tip}`][i] || 0,
+                    skupaj_poslov: stolpci[`posli_${tip}`][i]
+                };
+            });
+        });
+
+        return { posli, cene };
+    };
+
     // API funkcija
     const fetchAllData = async () => {
         try {
-            const [posliResponse, ceneResponse] = await Promise.all([
-                fetch(`${API_CONFIG.BASE_URL}/api/statistike/vse-obcine-posli-zadnjih-12m?vkljuci_katastrske=true`),
-                fetch(`${API_CONFIG.BASE_URL}/api/statistike/vse-obcine-cene-m2-zadnjih-12m?vkljuci_katastrske=true`)
-            ]);
+            const response = await fetch(`${API_CONFIG.BASE_URL}/api/statistike/choropleth?vkljuci_katastrske=true`);
 
-            if (!posliResponse.ok || !ceneResponse.ok) {
-                throw new Error(`HTTP error - Posli: ${posliResponse.status}, Cene: ${ceneResponse.status}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error - Choropleth: ${response.status}`);
             }
 
-            const [posliData, ceneData] = await Promise.all([
-                posliResponse.json(),
-                ceneResponse.json()
-            ]);
+            const data = await response.json();
 
-            if (posliData.status === 'success') {
-                setObcinePosliData(posliData.obcine_posli);
-                setKatastrskePosliData(posliData.katastrske_obcine_posli || {});
-            }
+            if (data.status === 'success') {
+                const obcine = choroplethToRegions(data.obcina);
+                const katastrske = data.katastrska_obcina
+                    ? choroplethToRegions(data.katastrska_obcina)
+                    : { posli: {}, cene: {} };
 
-            if (ceneData.status === 'success') {
-                setObcineCeneData(ceneData.obcine_cene);
-                setKatastrskeCeneData(ceneData.katastrske_obcine_cene || {});
+                setObcinePosliData(obcine.posli);
+                setKatastrskePosliData(katastrske.posli);
+                setObcineCeneData(obcine.cene);
+                setKatastrskeCeneData(katastrske.cene);
             }
 
-            return { posliData, ceneData };
+            return data;
         } catch (error) {
             console.error('Napaka pri pridobivanju podatkov:', error);
             return null;